@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    import time benchmark of the raddo entry points.
+
+    Every module is imported in a fresh interpreter (`python -X importtime`)
+    several times; the best cumulative import time is reported together
+    with heavy dependencies that were loaded although they are only needed
+    by single stages. With --compare, slow downs against an earlier run are
+    flagged.
+
+    python benchmarks/imports.py -o imports.json
+    python benchmarks/imports.py --compare imports.json
+"""
+
+import argparse
+import datetime
+import json
+import os
+import subprocess
+import sys
+
+
+__author__ = "Thomas Ramsauer"
+__copyright__ = "Thomas Ramsauer"
+__license__ = "gpl3"
+
+
+MODULES = ["raddo", "raddo.raddo", "raddo.sort_tars", "raddo.untar"]
+# only to be imported by the stages needing them
+HEAVY = ["osgeo", "geopandas", "xarray", "netCDF4", "pandas", "scipy",
+         "zarr", "dask", "pkg_resources"]
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir,
+                   "src")
+
+
+def import_time(module, repeat=5):
+    """
+    Best cumulative import time (s) of `module` and the heavy modules it
+    loads.
+    """
+    code = (f"import sys; import {module}; "
+            f"print(','.join(m for m in {HEAVY!r} if m in sys.modules))")
+    env = dict(os.environ, PYTHONPATH=SRC + os.pathsep +
+               os.environ.get("PYTHONPATH", ""))
+    best = None
+    for _ in range(repeat):
+        res = subprocess.run([sys.executable, "-X", "importtime", "-c",
+                              code], env=env, capture_output=True, text=True,
+                             check=True)
+        for line in res.stderr.splitlines():
+            parts = line.split("|")
+            if len(parts) == 3 and parts[2].strip() == module:
+                us = int(parts[1])
+                best = us if best is None else min(best, us)
+        heavy = [m for m in res.stdout.strip().split(",") if m]
+    return best / 1e6, heavy
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Import time benchmark of raddo.", prog="imports.py")
+    parser.add_argument('-r', '--repeat', default=5, type=int,
+                        help='imports per module (Default: 5).')
+    parser.add_argument('-o', '--output', default=None,
+                        help='JSON file to save the results to.')
+    parser.add_argument('-c', '--compare', default=None,
+                        help='JSON results of an earlier run to compare to.')
+    parser.add_argument('-t', '--threshold', default=.5, type=float,
+                        help='relative slow down reported as regression '
+                             '(Default: 0.5).')
+    args = parser.parse_args()
+
+    previous = {}
+    if args.compare:
+        with open(args.compare) as fp:
+            previous = json.load(fp)["modules"]
+    results = {"date": datetime.datetime.now().isoformat(),
+               "python": sys.version.split()[0], "modules": {}}
+    failed = False
+    for module in MODULES:
+        seconds, heavy = import_time(module, args.repeat)
+        results["modules"][module] = {"seconds": seconds, "heavy": heavy}
+        line = f"{module:<18} {seconds * 1000:>8.1f} ms"
+        if module in previous:
+            change = seconds / previous[module]["seconds"] - 1
+            line += f" {change:>+6.0%}"
+            if change > args.threshold:
+                line += " !"
+                failed = True
+        if heavy:
+            line += f"  heavy imports: {', '.join(heavy)}"
+            failed = True
+        sys.stdout.write(line + "\n")
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump(results, fp, indent=1)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    benchmarks of the raddo processing stages on synthetic RADOLAN data.
+
+    For every data size (day: one daily archive, month: one monthly
+    archive, year: twelve monthly archives) the archives are generated once
+    (kept in --data-dir), copied to a fresh working directory and processed
+    stage by stage: sort_tars, untar, get_asc_files, create_geotiffs,
+    create_netcdf and point extraction from the archives. Timings are
+    recorded with `raddo.metrics` and saved as JSON; with --compare the
+    results are checked against an earlier run.
+
+    python benchmarks/run.py --sizes day,month -o results.json
+    python benchmarks/run.py --sizes day,month --compare results.json
+"""
+
+import argparse
+import datetime
+import importlib.util
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, "src"))
+import synthetic  # noqa: E402
+from raddo import sort_tars, untar, __version__  # noqa: E402
+from raddo.metrics import Metrics  # noqa: E402
+
+
+__author__ = "Thomas Ramsauer"
+__copyright__ = "Thomas Ramsauer"
+__license__ = "gpl3"
+
+
+START = datetime.datetime(2020, 1, 1)
+SIZES = {"day": ("daily", 1), "month": ("monthly", 1),
+         "year": ("monthly", 12)}
+STAGES = ["sort", "untar", "get_asc_files", "warp", "netcdf", "points"]
+# stages needing GDAL (GeoTiffs, projection of the points)
+GDAL_STAGES = ["warp", "netcdf", "points"]
+N_POINTS = 100
+
+
+def generate(size, data_dir):
+    "archives of `size` in `data_dir` (generated if not there yet)."
+    kind, n = SIZES[size]
+    outdir = os.path.join(data_dir, size)
+    done = os.path.join(outdir, ".complete")
+    if not os.path.isfile(done):
+        shutil.rmtree(outdir, ignore_errors=True)
+        os.makedirs(outdir)
+        sys.stdout.write(str(datetime.datetime.now())[:-4] +
+                         f'   Generating synthetic data ({size})...\n')
+        if kind == "daily":
+            synthetic.daily_archives(outdir, START, n)
+        else:
+            synthetic.monthly_archives(outdir, START, n)
+        open(done, 'w').close()
+    return sorted(os.path.join(outdir, f) for f in os.listdir(outdir)
+                  if f.startswith("RW-"))
+
+
+def _raddo(rad_dir, start, end):
+    "Raddo instance for the hours from `start` to `end` (days)."
+    from raddo.catalog import HOUR, to_datetime
+    from raddo.raddo import Raddo
+    rd = Raddo()
+    rd.rad_dir = rad_dir
+    rd.yes = True
+    rd.quiet = True
+    rd.start_datetime = start
+    rd.end_datetime = end
+    rd.timestamps64 = np.arange(
+        np.datetime64(start, 'h'),
+        np.datetime64(end + datetime.timedelta(days=1), 'h'), HOUR)
+    rd.timestamps = to_datetime(rd.timestamps64)
+    return rd
+
+
+def run_size(size, data_dir, workdir, stages=STAGES):
+    """
+    metrics of processing the data of `size` and its number of hours
+    (None if the `.asc` files were not listed).
+    """
+    archives = generate(size, data_dir)
+    rad_dir = os.path.join(workdir, size)
+    shutil.rmtree(rad_dir, ignore_errors=True)
+    os.makedirs(rad_dir)
+    files = [shutil.copy(f, rad_dir) for f in archives]
+    nbytes = sum(os.path.getsize(f) for f in files)
+    kind, n = SIZES[size]
+    end = START + datetime.timedelta(days=n - 1) if kind == "daily" else \
+        datetime.datetime(START.year + (START.month + n - 1) // 12,
+                          (START.month + n - 1) % 12 + 1, 1) - \
+        datetime.timedelta(days=1)
+
+    if importlib.util.find_spec("osgeo") is None:
+        skipped = [s for s in GDAL_STAGES if s in stages]
+        if skipped:
+            sys.stderr.write(f"GDAL not found, skipping {skipped}.\n")
+        stages = [s for s in stages if s not in GDAL_STAGES]
+    # stages needed by later ones run, too, but are only measured if asked
+    need_asc = any(s in stages for s in ("get_asc_files", "warp", "netcdf"))
+    need_untar = need_asc or "untar" in stages
+    need_sort = need_untar or "sort" in stages
+
+    metrics = Metrics()
+
+    def stage(name):
+        return (metrics if name in stages else Metrics()).stage(name)
+
+    paths, asc_files = files, None
+    if need_sort:
+        with stage("sort") as m:
+            paths = sort_tars.sort_tars(files=files, quiet=True)
+            m.observe(nbytes=nbytes, items=len(paths))
+    if need_untar:
+        with stage("untar") as m:
+            dirs = untar.untar(files=paths, hist=kind == "monthly",
+                               quiet=True)
+            m.observe(nbytes=nbytes, items=len(dirs))
+
+    rd = _raddo(rad_dir, START, end)
+    rd.metrics = metrics
+
+    if need_asc:
+        with stage("get_asc_files") as m:
+            asc_files = rd.get_asc_files(dirs)
+            m.observe(items=len(asc_files))
+    if "warp" in stages or "netcdf" in stages:
+        tiff_dir = os.path.join(rad_dir, "tiff")
+        os.makedirs(tiff_dir)
+        gtiff_files = rd.create_geotiffs(asc_files, tiff_dir)
+    if "netcdf" in stages:
+        rd.create_netcdf(gtiff_files, rad_dir, "benchmark.nc")
+    if "points" in stages:
+        rng = np.random.RandomState(0)
+        lons = rng.uniform(6, 14, N_POINTS)
+        lats = rng.uniform(48, 54, N_POINTS)
+        rd.extract_points(paths, lons, lats)
+    return metrics, None if asc_files is None else len(asc_files)
+
+
+def compare(results, previous, threshold):
+    """
+    Print wall times of `results` relative to `previous`; returns the
+    (size, stage) pairs slower by more than `threshold` (e.g. 0.2: 20 %).
+    """
+    regressions = []
+    sys.stdout.write(f"\n{'size':<6} {'stage':<14} {'before':>9} "
+                     f"{'now':>9} {'change':>8}\n")
+    for size, res in results["sizes"].items():
+        before = {s["stage"]: s for s in
+                  previous["sizes"].get(size, {}).get("stages", [])}
+        for s in res["stages"]:
+            old = before.get(s["stage"])
+            if old is None or not old["wall_s"]:
+                continue
+            change = s["wall_s"] / old["wall_s"] - 1
+            flag = " !" if change > threshold else ""
+            sys.stdout.write(f"{size:<6} {s['stage']:<14} "
+                             f"{old['wall_s']:>8.2f}s {s['wall_s']:>8.2f}s "
+                             f"{change:>+8.0%}{flag}\n")
+            if change > threshold:
+                regressions.append((size, s["stage"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark raddo stages on synthetic RADOLAN data.",
+        prog="run.py")
+    parser.add_argument('-s', '--sizes', default="day,month",
+                        help=f'comma separated sizes of {list(SIZES)} '
+                             f'(Default: day,month).')
+    parser.add_argument('-S', '--stages', default=",".join(STAGES),
+                        help='comma separated stages (Default: all).')
+    parser.add_argument('-d', '--data-dir',
+                        default=os.path.join(tempfile.gettempdir(),
+                                             "raddo_benchmark_data"),
+                        help='directory to keep the generated data in.')
+    parser.add_argument('-o', '--output', default=None,
+                        help='JSON file to save the results to.')
+    parser.add_argument('-c', '--compare', default=None,
+                        help='JSON results of an earlier run to compare to.')
+    parser.add_argument('-t', '--threshold', default=.2, type=float,
+                        help='relative slow down reported as regression '
+                             '(Default: 0.2).')
+    args = parser.parse_args()
+
+    results = {"raddo": __version__,
+               "date": datetime.datetime.now().isoformat(),
+               "python": platform.python_version(),
+               "platform": platform.platform(),
+               "cpus": os.cpu_count(),
+               "sizes": {}}
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes.split(","):
+            t0 = time.perf_counter()
+            metrics, hours = run_size(size, args.data_dir, workdir,
+                                      args.stages.split(","))
+            results["sizes"][size] = {
+                "hours": hours,
+                "total_s": round(time.perf_counter() - t0, 3),
+                "stages": metrics.report()["stages"]}
+            sys.stdout.write(str(datetime.datetime.now())[:-4] +
+                             f'   {size} done.\n')
+
+    for size, res in results["sizes"].items():
+        for s in res["stages"]:
+            sys.stdout.write(f"{size:<6} {s['stage']:<14} "
+                             f"{s['wall_s']:>8.2f}s {s['cpu_s']:>8.2f}s cpu"
+                             f" {s['items']:>7} items\n")
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump(results, fp, indent=1)
+    if args.compare:
+        with open(args.compare) as fp:
+            previous = json.load(fp)
+        if compare(results, previous, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
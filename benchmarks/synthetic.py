@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    synthetic RADOLAN RW archives for benchmarks.
+
+    Hourly 900 x 900 ESRI ASCII grids like the ones published by DWD
+    (values in 1/10 mm, -1 outside of the radar coverage) with moving rain
+    cells, packed as daily archives (RW-YYYYMMDD.tar.gz, recent data) or
+    monthly archives with nested daily archives (RW-YYYYMM.tar, historical
+    data).
+"""
+
+import datetime
+import io
+import os
+import tarfile
+
+import numpy as np
+
+
+__author__ = "Thomas Ramsauer"
+__copyright__ = "Thomas Ramsauer"
+__license__ = "gpl3"
+
+
+SHAPE = (900, 900)
+# header of the RW product (polar stereographic grid, 1 km cells)
+HEADER = ("ncols {ncols}\nnrows {nrows}\nxllcorner -523462\n"
+          "yllcorner -4658645\ncellsize 1000\nNODATA_value -1\n")
+
+
+class GridGenerator(object):
+
+    def __init__(self, shape=SHAPE, cells=12, seed=0):
+        """
+        shape: tuple
+            (rows, columns) of the grids.
+        cells: integer
+            number of rain cells drifting over the grid.
+        """
+        self.shape = tuple(shape)
+        self.rng = np.random.RandomState(seed)
+        ny, nx = self.shape
+        rows, cols = np.ogrid[:ny, :nx]
+        # cells outside the (roughly circular) radar coverage are invalid
+        self.invalid = ((rows - ny / 2) / (ny / 2)) ** 2 + \
+            ((cols - nx / 2) / (nx / 2)) ** 2 > 1.1
+        self.rows, self.cols = rows, cols
+        self.centers = self.rng.uniform(0, 1, (cells, 2)) * [ny, nx]
+        self.velocity = self.rng.normal(0, .01, (cells, 2)) * [ny, nx]
+        self.radius = self.rng.uniform(.01, .06, cells) * nx
+        self.intensity = self.rng.gamma(2., 15., cells)
+        self.noise = self.rng.lognormal(0, .3, self.shape)
+        self._tokens = np.array([str(v).encode() for v in range(-1, 1000)],
+                                dtype=object)
+
+    def grid(self, hour):
+        "precipitation (int, 1/10 mm) of the `hour`-th hour."
+        ny, nx = self.shape
+        centers = (self.centers + hour * self.velocity) % [ny, nx]
+        # gaussian cells are separable in rows and columns
+        var = 2 * self.radius ** 2
+        gr = np.exp(-(self.rows - centers[:, 0]) ** 2 / var)
+        gc = np.exp(-(self.cols.T - centers[:, 1]) ** 2 / var)
+        a = (gr * self.intensity) @ gc.T
+        a *= np.roll(self.noise, (7 * hour, 13 * hour), axis=(0, 1))
+        a = np.clip(np.round(a), 0, 998).astype(int)
+        a[self.invalid] = -1
+        return a
+
+    def asc(self, hour):
+        "ESRI ASCII grid (bytes) of the `hour`-th hour."
+        a = self.grid(hour)
+        tokens = self._tokens[a + 1]
+        body = b"\n".join(b" ".join(row) for row in tokens)
+        return HEADER.format(nrows=self.shape[0],
+                             ncols=self.shape[1]).encode() + body + b"\n"
+
+
+def _add(tar, name, data):
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mtime = 0
+    tar.addfile(info, io.BytesIO(data))
+
+
+def _day_archive(gen, day, hour0):
+    "daily archive (bytes) of `day`; `hour0`: hour index of its first hour."
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w:gz", compresslevel=6) as tar:
+        for h in range(24):
+            t = day + datetime.timedelta(hours=h, minutes=50)
+            _add(tar, t.strftime("RW-%Y%m%d-%H%M.asc"), gen.asc(hour0 + h))
+    return buf.getvalue()
+
+
+def daily_archives(outdir, start, days, gen=None):
+    "write `days` daily archives from `start` on; returns their paths."
+    gen = gen or GridGenerator()
+    res = []
+    for i in range(days):
+        day = start + datetime.timedelta(days=i)
+        path = os.path.join(outdir, day.strftime("RW-%Y%m%d.tar.gz"))
+        with open(path, "wb") as fp:
+            fp.write(_day_archive(gen, day, 24 * i))
+        res.append(path)
+    return res
+
+
+def monthly_archives(outdir, start, months, gen=None):
+    """
+    write `months` monthly archives (with nested daily archives) from the
+    month of `start` on; returns their paths.
+    """
+    gen = gen or GridGenerator()
+    res = []
+    first = datetime.datetime(start.year, start.month, 1)
+    hour0 = 0
+    for _ in range(months):
+        nxt = datetime.datetime(first.year + first.month // 12,
+                                first.month % 12 + 1, 1)
+        path = os.path.join(outdir, first.strftime("RW-%Y%m.tar"))
+        with tarfile.open(path, "w") as tar:
+            day = first
+            while day < nxt:
+                _add(tar, day.strftime("RW-%Y%m%d.tar.gz"),
+                     _day_archive(gen, day, hour0))
+                day += datetime.timedelta(days=1)
+                hour0 += 24
+        res.append(path)
+        first = nxt
+    return res
@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    streaming temporal aggregation of hourly RADOLAN grids.
+
+    Hours are fed one by one in temporal order. Daily and monthly sums as
+    well as the daily maximum of rolling N-hour sums are returned as soon
+    as a period is complete, so only the running sums of the current day /
+    month and the last N hours are kept in memory.
+"""
+
+import collections
+import datetime
+
+import numpy as np
+
+
+__author__ = "Thomas Ramsauer"
+__copyright__ = "Thomas Ramsauer"
+__license__ = "gpl3"
+
+
+class StreamingAggregator(object):
+
+    def __init__(self, shape, rolling=(), nodata=-9999):
+        """
+        shape: tuple
+            shape of the hourly grids.
+        rolling: list of integers
+            window lengths (hours) of rolling sums whose daily maximum
+            should be computed.
+        nodata: number
+            value of invalid cells in the hourly grids (NaN is always
+            treated as invalid).
+        """
+        self.shape = tuple(shape)
+        self.rolling = sorted(set(int(n) for n in rolling))
+        self.nodata = nodata
+        self._day = None
+        self._month = None
+        self._windows = {n: collections.deque() for n in self.rolling}
+        self._window_sums = {n: np.zeros(self.shape) for n in self.rolling}
+        self._reset_day()
+        self._reset_month()
+
+    def _reset_day(self):
+        self._day_sum = np.zeros(self.shape)
+        self._day_count = np.zeros(self.shape, dtype=np.int16)
+        self._day_max = {n: np.full(self.shape, np.nan) for n in self.rolling}
+
+    def _reset_month(self):
+        self._month_sum = np.zeros(self.shape)
+        self._month_count = np.zeros(self.shape, dtype=np.int16)
+
+    @staticmethod
+    def _period_value(total, count):
+        "sum of a period; NaN if a cell never had a valid value."
+        out = total.copy()
+        out[count == 0] = np.nan
+        return out
+
+    def _finish_day(self):
+        res = [("daily", self._day,
+                self._period_value(self._day_sum, self._day_count))]
+        for n in self.rolling:
+            res.append((f"max_{n}h", self._day, self._day_max[n]))
+        self._reset_day()
+        return res
+
+    def _finish_month(self):
+        res = [("monthly", self._month,
+                self._period_value(self._month_sum, self._month_count))]
+        self._reset_month()
+        return res
+
+    def add(self, tdate, a):
+        """
+        Add hourly grid `a` of time `tdate`.
+
+        Returns a list of finished aggregates as (name, period start, array)
+        tuples; name is "daily", "monthly" or "max_<N>h".
+        """
+        res = []
+        day = datetime.datetime(tdate.year, tdate.month, tdate.day)
+        month = datetime.datetime(tdate.year, tdate.month, 1)
+        if self._day is not None and day != self._day:
+            res += self._finish_day()
+        if self._month is not None and month != self._month:
+            res += self._finish_month()
+        self._day = day
+        self._month = month
+
+        a = np.asarray(a, dtype=float)
+        valid = np.isfinite(a) & (a != self.nodata)
+        v = np.where(valid, a, 0.)
+
+        self._day_sum += v
+        self._day_count += valid
+        self._month_sum += v
+        self._month_count += valid
+
+        for n in self.rolling:
+            window = self._windows[n]
+            window.append(v)
+            self._window_sums[n] += v
+            if len(window) > n:
+                self._window_sums[n] -= window.popleft()
+            if len(window) == n:
+                np.fmax(self._day_max[n], self._window_sums[n],
+                        out=self._day_max[n])
+        return res
+
+    def flush(self):
+        "return aggregates of the last (possibly incomplete) day and month."
+        res = []
+        if self._day is not None:
+            res += self._finish_day()
+        if self._month is not None:
+            res += self._finish_month()
+        self._day = None
+        self._month = None
+        return res
+
+
+def combine(name, old, new):
+    """
+    Combine aggregate `name` of two parts of the same period (e.g. from
+    consecutive runs): sums are added, rolling maxima take the maximum.
+    NaN (no valid value) is ignored unless both parts are NaN.
+    """
+    if name.startswith("max_"):
+        return np.fmax(old, new)
+    both = np.isnan(old) & np.isnan(new)
+    out = np.where(np.isnan(old), 0., old) + np.where(np.isnan(new), 0., new)
+    out[both] = np.nan
+    return out
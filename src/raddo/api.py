@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    path explicit API to run RADOLAN jobs from other programs.
+
+    Every call gets its complete configuration as a `RaddoRequest` and
+    works on its own `Raddo` instance. Nothing changes the working
+    directory or other process wide state, so independent requests can run
+    concurrently in threads of one (service) process.
+"""
+
+import datetime
+import os
+import tempfile
+
+from dateutil.parser import parse
+
+from raddo import sort_tars
+from raddo import untar
+
+
+__author__ = "Thomas Ramsauer"
+__copyright__ = "Thomas Ramsauer"
+__license__ = "gpl3"
+
+
+class RaddoRequest(object):
+
+    def __init__(self, rad_dir, start=None, end=None,
+                 no_time_correction=False, mask=None, buffer=1400,
+                 url=None, errors_allowed=5, force=False, workers=None,
+                 profiler=None):
+        """
+        rad_dir: string
+            local RADOLAN directory (created if necessary).
+        start, end: datetime / string
+            first and last day (default: 14 days ago until yesterday).
+        mask: string
+            mask shapefile for GeoTiffs / NetCDF files.
+        url: string
+            recent RADOLAN data on the DWD server (default: see `Raddo`).
+        profiler: raddo.profiling.Profiler
+            profile the stages of the request (written by the caller).
+        """
+        today = datetime.datetime.today().replace(
+            hour=0, minute=0, second=0, microsecond=0)
+        self.rad_dir = os.path.abspath(rad_dir)
+        self.start = today - datetime.timedelta(days=14) \
+            if start is None else _datetime(start)
+        self.end = today - datetime.timedelta(days=1) \
+            if end is None else _datetime(end)
+        if self.end < self.start:
+            raise ValueError("End date is before start date.")
+        self.no_time_correction = no_time_correction
+        self.mask = mask
+        self.buffer = buffer
+        self.url = url
+        self.errors_allowed = errors_allowed
+        self.force = force
+        self.workers = workers
+        self.profiler = profiler
+
+    def raddo(self):
+        "new `Raddo` instance for this request."
+        from raddo.raddo import Raddo
+        rd = Raddo()
+        rd.rad_dir = self.rad_dir
+        if self.workers is not None:
+            rd.WORKERS = int(self.workers)
+        rd.profiler = self.profiler
+        return rd
+
+    def download_kwargs(self):
+        "keyword arguments of `Raddo.radolan_down`."
+        kwargs = dict(rad_dir=self.rad_dir,
+                      start_date=self.start.strftime("%Y-%m-%d"),
+                      end_date=self.end,
+                      no_time_correction=self.no_time_correction,
+                      errors_allowed=self.errors_allowed,
+                      force=self.force,
+                      buffer=self.buffer,
+                      yes=True)
+        if self.url is not None:
+            kwargs["rad_dir_dwd"] = self.url
+        if self.mask:
+            kwargs["mask"] = self.mask
+        return kwargs
+
+
+def _datetime(d):
+    return d if isinstance(d, datetime.datetime) else parse(str(d))
+
+
+def fetch(request, extract=True):
+    """
+    Download, sort and (optionally) extract the archives of `request`.
+    Returns the `Raddo` instance of the request, the archives and the
+    extracted *.asc files.
+    """
+    rd = request.raddo()
+    archives = rd.radolan_down(**request.download_kwargs())
+    paths = []
+    if len(archives) > 0:
+        paths = sort_tars.sort_tars(
+            files=[os.path.join(request.rad_dir, f) for f in archives])
+    asc_files = []
+    if extract and len(paths) > 0:
+        with rd._profile("untar"):
+            dirs = untar.untar(files=paths) or []
+        asc_files = rd.get_asc_files(dirs)
+    return rd, paths, asc_files
+
+
+def netcdf(request, outdir=None, outf=None, aggregate=False, rolling=()):
+    "NetCDF file (EPSG:4326) of `request`; see `Raddo.create_netcdf`."
+    rd, paths, asc_files = fetch(request)
+    assert len(asc_files) > 0, "No RADOLAN data in the time range."
+    with tempfile.TemporaryDirectory() as tiff_dir:
+        gtiff_files = rd.create_geotiffs(asc_files, tiff_dir)
+        return rd.create_netcdf(gtiff_files, outdir or request.rad_dir, outf,
+                                request.no_time_correction,
+                                workers=request.workers,
+                                aggregate=aggregate, rolling=rolling)
+
+
+def point_series(request, lat, lon, method="nearest"):
+    """
+    Times and precipitation at `lat`, `lon` read directly from the archives
+    of `request`.
+    """
+    rd, paths, _ = fetch(request, extract=False)
+    times, values = rd.extract_points(
+        paths, [lon], [lat], method=method,
+        no_time_correction=request.no_time_correction,
+        workers=request.workers)
+    return times, values[:, 0]
+
+
+def points_table(request, pointfile, outdir=None, outf=None,
+                 method="nearest"):
+    "CSV of the time series of all points in `pointfile` (CSV / GeoJSON)."
+    rd, paths, _ = fetch(request, extract=False)
+    return rd.create_points_from_archives(
+        paths, pointfile, outdir or request.rad_dir, outf, method=method,
+        no_time_correction=request.no_time_correction,
+        workers=request.workers)
@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    reading of RADOLAN RW ASCII grids (ESRI ASCII raster format).
+
+    Grids can be read from extracted *.asc files or directly from the
+    (nested) RADOLAN archives without extracting them. Rows that are not
+    needed are skipped without being parsed.
+"""
+
+import os
+import tarfile
+
+import numpy as np
+
+
+__author__ = "Thomas Ramsauer"
+__copyright__ = "Thomas Ramsauer"
+__license__ = "gpl3"
+
+
+NODATA = -9999
+
+
+def read_header(fp):
+    """
+    Read the header of an ESRI ASCII grid from binary file object `fp`.
+    Returns the header (lower case keys) and the first data line.
+    """
+    header = {}
+    while True:
+        line = fp.readline()
+        parts = line.split()
+        if len(parts) == 0:
+            if line == b"":
+                break
+            continue
+        key = parts[0].decode().lower()
+        if not key[0].isalpha():
+            break
+        header[key] = float(parts[1])
+    return header, line
+
+
+def geotransform(header):
+    "GDAL style geotransform of the grid described by `header`."
+    cs = header["cellsize"]
+    if "xllcenter" in header:
+        xll = header["xllcenter"] - cs / 2
+        yll = header["yllcenter"] - cs / 2
+    else:
+        xll = header["xllcorner"]
+        yll = header["yllcorner"]
+    return (xll, cs, 0., yll + header["nrows"] * cs, 0., -cs)
+
+
+def decode(a, header):
+    "precipitation in mm (1/10 mm in RADOLAN data); invalid cells -> NODATA."
+    nodata = header.get("nodata_value", -1)
+    invalid = (a == nodata) | (a < 0)
+    a = a / 10
+    a[invalid] = NODATA
+    return a
+
+
+def read_raw(fp, rows=None, cols=None):
+    """
+    Header and raw (not decoded) values of the ESRI ASCII grid in binary
+    file object `fp`. With `rows` (sorted, unique row indices) and / or
+    `cols` (slice of columns), only this window is parsed and an array of
+    shape (len(rows), number of columns) is returned: other rows are
+    skipped without parsing, values right of the window are not split and
+    reading stops after the last requested row.
+    """
+    header, line = read_header(fp)
+    nrows, ncols = int(header["nrows"]), int(header["ncols"])
+    if rows is None and cols is None:
+        lines = [line] + fp.readlines()
+        a = np.array(b" ".join(lines).split(), dtype=float)
+        return header, a.reshape(nrows, ncols)
+    if rows is None:
+        rows = range(nrows)
+    c0, c1, _ = (slice(None) if cols is None else cols).indices(ncols)
+    out = np.full((len(rows), c1 - c0), np.nan)
+    k = 0
+    r = 0
+    while line and k < len(rows):
+        if r == rows[k]:
+            out[k] = np.array(line.split(None, c1)[c0:c1], dtype=float)
+            k += 1
+        r += 1
+        line = fp.readline()
+    return header, out
+
+
+def read_rows(fp, rows, cols=None):
+    """
+    Header and decoded values of the grid `rows` (sorted, unique row
+    indices) and columns `cols` (slice, default: all) of the ESRI ASCII
+    grid in `fp`; see `read_raw`.
+    """
+    header, a = read_raw(fp, rows, cols)
+    return header, decode(a, header)
+
+
+def read_grid(fp):
+    "header and decoded values of the complete ESRI ASCII grid in `fp`."
+    header, a = read_raw(fp)
+    return header, decode(a, header)
+
+
+def iter_archive(path, match=None):
+    """
+    Yield (name, file object) of all *.asc grids in the RADOLAN archive
+    `path` (daily .tar.gz or monthly .tar with nested daily .tar.gz)
+    without extracting anything to disk. If `match` is given, only grids
+    and nested archives whose name `match` returns True for are read.
+    """
+    with tarfile.open(path, 'r:*') as tar:
+        for member in tar:
+            if not member.isfile():
+                continue
+            name = os.path.basename(member.name)
+            if match is not None and not match(name):
+                continue
+            if name.endswith(".asc"):
+                yield name, tar.extractfile(member)
+            elif name.endswith(".tar.gz"):
+                inner_fp = tar.extractfile(member)
+                with tarfile.open(fileobj=inner_fp, mode='r:gz') as inner:
+                    for inner_member in inner:
+                        inner_name = os.path.basename(inner_member.name)
+                        if inner_member.isfile() and \
+                                inner_name.endswith(".asc") and \
+                                (match is None or match(inner_name)):
+                            yield inner_name, inner.extractfile(inner_member)
+
+
+def iter_sources(sources):
+    """
+    Yield (name, file object) of all *.asc grids in `sources`, which may be
+    *.asc files or RADOLAN archives.
+    """
+    for source in sources:
+        if source.endswith(".asc"):
+            with open(source, 'rb') as fp:
+                yield os.path.basename(source), fp
+        elif source.endswith(".tar") or source.endswith(".tar.gz"):
+            yield from iter_archive(source)
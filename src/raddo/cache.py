@@ -0,0 +1,192 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    content addressed cache of derived RADOLAN products (e.g. NetCDF files).
+
+    Products are stored under a hash of all their inputs (archive
+    checksums, time range, mask, options, ...). Identical requests are
+    served from the cache; least recently used products are evicted once
+    the cache exceeds its size budget. Products are copied into and out of
+    the cache (no hard links), so outputs appended to in place later do
+    not change the cached products.
+"""
+
+import filecmp
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+
+__author__ = "Thomas Ramsauer"
+__copyright__ = "Thomas Ramsauer"
+__license__ = "gpl3"
+
+
+def _size(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(root, f))
+                   for root, _, files in os.walk(path) for f in files)
+    return os.path.getsize(path)
+
+
+def _remove(path):
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def _write_json(path, obj):
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, 'w') as fp:
+        json.dump(obj, fp, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def _read_json(path):
+    try:
+        with open(path) as fp:
+            return json.load(fp)
+    except (OSError, ValueError):
+        return {}
+
+
+def copy_product(src, dst):
+    "copy product file / directory `src` to `dst`."
+    if os.path.isdir(src):
+        shutil.copytree(src, dst)
+    else:
+        shutil.copy2(src, dst)
+    return dst
+
+
+def same_product(a, b):
+    "True if the product files `a` and `b` have the same content."
+    return os.path.isfile(a) and os.path.isfile(b) and \
+        filecmp.cmp(a, b, shallow=False)
+
+
+class ProductCache(object):
+
+    INDEX = "index.json"
+    CHECKSUMS = "checksums.json"
+
+    def __init__(self, cache_dir, max_bytes=None):
+        """
+        cache_dir: string
+            directory of the cache (created if necessary).
+        max_bytes: integer
+            size budget of the cache; None for no limit.
+        """
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._checksums = None
+        self._checksums_changed = False
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(inputs):
+        "hash of `inputs` (JSON serializable, str() for everything else)."
+        text = json.dumps(inputs, sort_keys=True, default=str)
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def checksum(self, path):
+        """
+        SHA256 of file `path`. Checksums are remembered per path, size and
+        modification time, so unchanged archives are only hashed once; new
+        checksums are stored with `save_checksums`.
+        """
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        stamp = [st.st_size, st.st_mtime_ns]
+        with self._lock:
+            if self._checksums is None:
+                self._checksums = _read_json(
+                    os.path.join(self.cache_dir, self.CHECKSUMS))
+            memo = self._checksums.get(path)
+        if memo is not None and memo[:2] == stamp:
+            return memo[2]
+        sha = hashlib.sha256()
+        with open(path, 'rb') as fp:
+            for block in iter(lambda: fp.read(1 << 20), b""):
+                sha.update(block)
+        with self._lock:
+            self._checksums[path] = stamp + [sha.hexdigest()]
+            self._checksums_changed = True
+        return sha.hexdigest()
+
+    def save_checksums(self):
+        "store the checksums computed since the last call (one write)."
+        with self._lock:
+            if not self._checksums_changed:
+                return
+            memo_file = os.path.join(self.cache_dir, self.CHECKSUMS)
+            memo = _read_json(memo_file)
+            memo.update(self._checksums)
+            _write_json(memo_file, memo)
+            self._checksums_changed = False
+
+    def _index(self):
+        return _read_json(os.path.join(self.cache_dir, self.INDEX))
+
+    def _write_index(self, index):
+        _write_json(os.path.join(self.cache_dir, self.INDEX), index)
+
+    def get(self, key):
+        "path of the cached product of `key` or None."
+        with self._lock:
+            index = self._index()
+            entry = index.get(key)
+            if entry is None:
+                return None
+            path = os.path.join(self.cache_dir, entry["file"])
+            if not os.path.exists(path):
+                del index[key]
+                self._write_index(index)
+                return None
+            entry["atime"] = time.time()
+            self._write_index(index)
+            return path
+
+    def put(self, key, path):
+        "add product `path` under `key`; returns the path in the cache."
+        name = key + os.path.splitext(path.rstrip(os.sep))[1]
+        cached = os.path.join(self.cache_dir, name)
+        with self._lock:
+            _remove(cached)
+            copy_product(path, cached)
+            index = self._index()
+            index[key] = {"file": name, "size": _size(cached),
+                          "atime": time.time(),
+                          "source": os.path.abspath(path)}
+            self._write_index(index)
+            self._evict(index, keep=key)
+        return cached
+
+    def size(self):
+        "total size of all cached products in bytes."
+        return sum(e["size"] for e in self._index().values())
+
+    def _evict(self, index, keep=None):
+        if self.max_bytes is None:
+            return
+        total = sum(e["size"] for e in index.values())
+        for key in sorted(index, key=lambda k: index[k]["atime"]):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            _remove(os.path.join(self.cache_dir, index[key]["file"]))
+            total -= index[key]["size"]
+            del index[key]
+        self._write_index(index)
+
+    def evict(self):
+        "remove least recently used products until within size budget."
+        with self._lock:
+            self._evict(self._index())
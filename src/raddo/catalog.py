@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    in-memory catalog of hourly RADOLAN products.
+
+    Product times and paths are kept in NumPy arrays sorted by time, so
+    range, gap and completeness queries are vectorized (binary search)
+    instead of list scans.
+"""
+
+import datetime
+import glob
+import os
+
+import numpy as np
+
+
+__author__ = "Thomas Ramsauer"
+__copyright__ = "Thomas Ramsauer"
+__license__ = "gpl3"
+
+
+HOUR = np.timedelta64(1, "h")
+
+
+def parse_times(filenames):
+    """
+    Hours of RADOLAN products from their file names (RW-YYYYMMDD-HHMM*)
+    as datetime64. RADOLAN sum up times (HH:50) are corrected to the full
+    hour, like `Raddo._get_date` does by default.
+    """
+    names = [os.path.basename(f) for f in filenames]
+    iso = [f"{n[3:7]}-{n[7:9]}-{n[9:11]}T{n[12:14]}:{n[14:16]}"
+           for n in names]
+    return np.array(iso, dtype="datetime64[m]").astype("datetime64[h]")
+
+
+def to_datetime64(timestamps):
+    "hourly datetime64 array of `timestamps` (datetimes or datetime64)."
+    return np.atleast_1d(np.asarray(timestamps, dtype="datetime64[h]"))
+
+
+def to_datetime(timestamps):
+    "list of datetime.datetime of datetime64 `timestamps`."
+    return to_datetime64(timestamps).astype(datetime.datetime).tolist()
+
+
+class Catalog(object):
+
+    def __init__(self, paths, times):
+        """
+        paths: list of strings
+            paths of the hourly products.
+        times: array of datetime64
+            hours of the products. If there are multiple products for an
+            hour, only the first one (by path) is kept.
+        """
+        paths = np.array(list(paths), dtype=object)
+        times = np.asarray(times, dtype="datetime64[h]").ravel()
+        order = np.lexsort((paths.astype(str), times))
+        paths, times = paths[order], times[order]
+        times, first = np.unique(times, return_index=True)
+        self.times = times
+        self.paths = paths[first]
+
+    @classmethod
+    def from_paths(cls, paths):
+        paths = list(paths)
+        return cls(paths, parse_times(paths))
+
+    @classmethod
+    def from_directories(cls, directories, pattern="**/*asc"):
+        "catalog of all products matching `pattern` in `directories`."
+        paths = []
+        for d in sorted(set(directories)):
+            paths += glob.glob(os.path.join(d, pattern), recursive=True)
+        return cls.from_paths(paths)
+
+    def __len__(self):
+        return len(self.times)
+
+    def __iter__(self):
+        return zip(self.times, self.paths)
+
+    def _subset(self, mask_or_index):
+        cat = Catalog([], [])
+        cat.times = self.times[mask_or_index]
+        cat.paths = self.paths[mask_or_index]
+        return cat
+
+    def range(self, start, end):
+        "sub catalog of products from `start` to `end` (inclusive)."
+        i0 = np.searchsorted(self.times, to_datetime64(start)[0], "left")
+        i1 = np.searchsorted(self.times, to_datetime64(end)[0], "right")
+        return self._subset(slice(i0, i1))
+
+    def contains(self, timestamps):
+        "boolean array: is there a product for each of `timestamps`?"
+        ts = to_datetime64(timestamps)
+        if len(self.times) == 0:
+            return np.zeros(len(ts), dtype=bool)
+        idx = np.searchsorted(self.times, ts)
+        idx[idx == len(self.times)] = len(self.times) - 1
+        return self.times[idx] == ts
+
+    def select(self, timestamps):
+        "sub catalog of the products at `timestamps`."
+        ts = np.unique(to_datetime64(timestamps))
+        if len(ts) == 0 or len(self.times) == 0:
+            return self._subset(slice(0, 0))
+        idx = np.searchsorted(ts, self.times)
+        idx[idx == len(ts)] = len(ts) - 1
+        return self._subset(ts[idx] == self.times)
+
+    def missing(self, timestamps):
+        "datetime64 array of `timestamps` without product."
+        ts = to_datetime64(timestamps)
+        return ts[~self.contains(ts)]
+
+    def completeness(self, timestamps):
+        "fraction of `timestamps` with product."
+        ts = to_datetime64(timestamps)
+        return float(self.contains(ts).mean()) if len(ts) > 0 else 1.
+
+    def gaps(self, start, end):
+        """
+        List of (first, last) missing hour of all runs of missing hours
+        from `start` to `end` (inclusive).
+        """
+        ts = np.arange(to_datetime64(start)[0], to_datetime64(end)[0] + HOUR,
+                       HOUR)
+        missing = self.missing(ts)
+        if len(missing) == 0:
+            return []
+        breaks = np.nonzero(np.diff(missing) != HOUR)[0]
+        firsts = np.concatenate([missing[:1], missing[breaks + 1]])
+        lasts = np.concatenate([missing[breaks], missing[-1:]])
+        return list(zip(firsts, lasts))
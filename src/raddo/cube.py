@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    memory-mapped hourly cube store of RADOLAN grids.
+
+    A cube is a directory (*.cube) with the raw precipitation of
+    consecutive hours as one fixed layout int16 array (time x y x x, C
+    order, 1/10 mm, -1 where invalid or missing) in `data.i16`, the hours
+    (int64, hours since 1970-01-01) in `time.i8` and a small JSON sidecar
+    `meta.json` (grid, projection, number of hours). Hours are appended at
+    the end; readers memory-map the files and get zero-copy NumPy views of
+    any time slice, without decompression.
+"""
+
+import json
+import os
+
+import numpy as np
+
+from raddo.catalog import HOUR, to_datetime64
+from raddo.grid import DWD_PROJ
+
+
+__author__ = "Thomas Ramsauer"
+__copyright__ = "Thomas Ramsauer"
+__license__ = "gpl3"
+
+
+DATA = "data.i16"
+TIME = "time.i8"
+META = "meta.json"
+NODATA = -1
+SCALE = .1
+DTYPE = np.dtype("<i2")
+
+
+def encode(a):
+    "int16 raw values (1/10 mm, NODATA where invalid) of grid `a` (mm)."
+    a = np.asarray(a, dtype=float)
+    invalid = ~np.isfinite(a) | (a < 0)
+    raw = np.round(np.where(invalid, 0, a) / SCALE)
+    raw = np.clip(raw, 0, np.iinfo(DTYPE).max).astype(DTYPE)
+    raw[invalid] = NODATA
+    return raw
+
+
+def decode(raw):
+    "precipitation (mm, float32, NaN where invalid) of int16 `raw` values."
+    a = raw.astype("f4") * np.float32(SCALE)
+    a[raw == NODATA] = np.nan
+    return a
+
+
+def is_cube(path):
+    return os.path.isfile(os.path.join(path, META))
+
+
+class CubeStore(object):
+
+    def __init__(self, path):
+        "open the existing cube at `path`."
+        self.path = os.path.abspath(path)
+        with open(os.path.join(self.path, META)) as fp:
+            self.meta = json.load(fp)
+        self.shape = tuple(self.meta["shape"])
+        self.geotransform = tuple(self.meta["geotransform"])
+        self.proj = self.meta["proj"]
+        self._data = None
+        self._times = None
+
+    @classmethod
+    def create(cls, path, geotransform, shape, proj=DWD_PROJ):
+        "empty cube at `path` for grids of `shape` / `geotransform`."
+        os.makedirs(path, exist_ok=True)
+        for name in (DATA, TIME):
+            open(os.path.join(path, name), 'wb').close()
+        meta = {"version": 1, "shape": [int(n) for n in shape],
+                "geotransform": [float(v) for v in geotransform],
+                "proj": proj, "dtype": DTYPE.str, "scale": SCALE,
+                "nodata": NODATA, "units": "mm/h", "n_times": 0}
+        _write_meta(path, meta)
+        return cls(path)
+
+    def __len__(self):
+        return int(self.meta["n_times"])
+
+    @property
+    def data(self):
+        "read-only memory map (time x y x x) of the raw int16 values."
+        if self._data is None or len(self._data) != len(self):
+            if len(self) == 0:
+                return np.empty((0,) + self.shape, dtype=DTYPE)
+            self._data = np.memmap(os.path.join(self.path, DATA),
+                                   dtype=DTYPE, mode='r',
+                                   shape=(len(self),) + self.shape)
+        return self._data
+
+    @property
+    def times(self):
+        "hours (datetime64) of the cube."
+        if self._times is None or len(self._times) != len(self):
+            t = np.fromfile(os.path.join(self.path, TIME), dtype="<i8",
+                            count=len(self))
+            self._times = t.astype("datetime64[h]")
+        return self._times
+
+    def index(self, t):
+        "position of hour `t` (-1 if not in the cube)."
+        times = self.times
+        if len(times) == 0:
+            return -1
+        i = int((to_datetime64(t)[0] - times[0]) / HOUR)
+        return i if 0 <= i < len(times) else -1
+
+    def slice(self, start=None, end=None):
+        """
+        Zero-copy view (time x y x x, raw int16) and hours of `start` to
+        `end` (inclusive; default: all hours).
+        """
+        times = self.times
+        i0 = 0 if start is None else \
+            int(np.searchsorted(times, to_datetime64(start)[0]))
+        i1 = len(times) if end is None else \
+            int(np.searchsorted(times, to_datetime64(end)[0], side="right"))
+        return self.data[i0:i1], times[i0:i1]
+
+    def precipitation(self, start=None, end=None):
+        "precipitation (mm, NaN where invalid) and hours of `start` to `end`."
+        raw, times = self.slice(start, end)
+        return decode(raw), times
+
+    def append(self, times, grids):
+        """
+        Append `grids` (mm; NaN / negative values are invalid) of hours
+        `times` after the last hour of the cube. Hours skipped in between
+        are filled with NODATA. Returns the number of hours written.
+        """
+        times = to_datetime64(times)
+        if len(times) == 0:
+            return 0
+        assert (np.diff(times) > np.timedelta64(0, "h")).all(), \
+            "Hours to append need to be sorted and unique."
+        last = self.times[-1] if len(self) else times[0] - HOUR
+        assert times[0] > last, \
+            f"Hours up to {last} are already in {self.path}."
+        n = int((times[-1] - last) / HOUR)
+        missing = np.full(self.shape, NODATA, dtype=DTYPE)
+        pos = ((times - last) / HOUR).astype(int) - 1
+        grids = iter(grids)
+        with open(os.path.join(self.path, DATA), 'r+b') as fp:
+            fp.seek(len(self) * missing.nbytes)
+            k = 0
+            for i in range(n):
+                if k < len(pos) and pos[k] == i:
+                    a = next(grids)
+                    assert np.shape(a) == self.shape, \
+                        f"Grid does not match the cube ({self.shape})."
+                    fp.write(encode(a).tobytes())
+                    k += 1
+                else:
+                    fp.write(missing.tobytes())
+        hours = last + HOUR * np.arange(1, n + 1)
+        with open(os.path.join(self.path, TIME), 'r+b') as fp:
+            fp.seek(len(self) * 8)
+            fp.write(hours.astype("int64").astype("<i8").tobytes())
+        # the sidecar is written last: an interrupted append is ignored
+        self.meta["n_times"] = len(self) + n
+        _write_meta(self.path, self.meta)
+        return n
+
+
+def _write_meta(path, meta):
+    tmp = os.path.join(path, META + f".{os.getpid()}.tmp")
+    with open(tmp, 'w') as fp:
+        json.dump(meta, fp, indent=1)
+    os.replace(tmp, os.path.join(path, META))
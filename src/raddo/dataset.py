@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    lazy xarray / dask access to local RADOLAN data.
+
+    `open_radolan` returns an `xarray.Dataset` whose precipitation is a dask
+    array with one chunk per hour or per day. Chunks are only read when
+    computed, directly from extracted *.asc files or from the daily /
+    monthly archives, so data can be sliced, aggregated and computed in
+    parallel without writing a NetCDF file first.
+"""
+
+import collections
+import glob
+import os
+import re
+
+import numpy as np
+
+from raddo import asc
+from raddo import repack
+from raddo.catalog import Catalog, HOUR, parse_times, to_datetime64
+from raddo.grid import GridIndex, DWD_PROJ
+
+
+__author__ = "Thomas Ramsauer"
+__copyright__ = "Thomas Ramsauer"
+__license__ = "gpl3"
+
+
+CHUNKS = ["hour", "day"]
+
+
+def find_sources(paths):
+    """
+    Catalog of *.asc files and dicts of daily (YYYYMMDD -> path; archive
+    or repacked day) and monthly (YYYYMM -> path) archives in `paths`
+    (files or directories, searched recursively).
+    """
+    if isinstance(paths, str):
+        paths = [paths]
+    files = []
+    for p in paths:
+        if os.path.isdir(p):
+            files += glob.glob(os.path.join(p, "**", "RW-*"), recursive=True)
+        else:
+            files.append(p)
+    asc_files, daily, monthly, repacked = [], {}, {}, {}
+    for f in sorted(files):
+        name = os.path.basename(f)
+        if re.match(r"RW-\d{8}-\d{4}\.asc$", name):
+            asc_files.append(f)
+        elif re.match(r"RW-\d{8}\.tar\.gz$", name):
+            daily.setdefault(name[3:11], f)
+        elif repack.is_repacked(f):
+            repacked.setdefault(name[3:11], f)
+        elif re.match(r"RW-\d{6}\.tar$", name):
+            monthly.setdefault(name[3:9], f)
+    # repacked days are preferred to the archives
+    daily.update(repacked)
+    return Catalog.from_paths(asc_files), daily, monthly
+
+
+def _source_hours(catalog, daily, monthly, times):
+    """
+    Source of each of `times`: the *.asc file if extracted, the daily or
+    the monthly archive otherwise (None if there is no source).
+    """
+    files = dict(zip(catalog.times, catalog.paths))
+    days = times.astype("datetime64[D]").astype(str)
+    res = []
+    for t, day in zip(times, days):
+        key = day.replace("-", "")
+        res.append(files.get(t) or daily.get(key) or monthly.get(key[:6]))
+    return res
+
+
+def _coverage(catalog, daily, monthly):
+    "first and last hour covered by *.asc files and archives."
+    days = [np.datetime64(f"{d[:4]}-{d[4:6]}-{d[6:]}", "D") for d in daily]
+    months = [np.datetime64(f"{m[:4]}-{m[4:]}", "M") for m in monthly]
+    firsts = list(catalog.times[:1]) + \
+        [d.astype("datetime64[h]") for d in days] + \
+        [m.astype("datetime64[h]") for m in months]
+    lasts = list(catalog.times[-1:]) + \
+        [(d + 1).astype("datetime64[h]") - HOUR for d in days] + \
+        [(m + 1).astype("datetime64[h]") - HOUR for m in months]
+    assert len(firsts) > 0, "No RADOLAN data found."
+    return min(firsts), max(lasts)
+
+
+def _read_header(source):
+    if repack.is_repacked(source):
+        return repack.read_meta(source)["header"]
+    if source.endswith(".asc"):
+        with open(source, 'rb') as fp:
+            return asc.read_header(fp)[0]
+    for name, fp in asc.iter_archive(source):
+        return asc.read_header(fp)[0]
+    raise ValueError(f"No RADOLAN grid in {source}.")
+
+
+def _read_block(times, sources, shape):
+    """
+    Precipitation (times x rows x columns, NaN where invalid / missing) of
+    `times` read from `sources`; every source is opened once.
+    """
+    out = np.full((len(times),) + tuple(shape), np.nan, dtype="f4")
+    index = {t: i for i, t in enumerate(times)}
+    by_source = collections.defaultdict(list)
+    for t, source in zip(times, sources):
+        if source is not None:
+            by_source[source].append(t)
+
+    def store(name, fp):
+        header, a = asc.read_grid(fp)
+        a[a == asc.NODATA] = np.nan
+        out[index[parse_times([name])[0]]] = a
+
+    for source, ts in by_source.items():
+        if source.endswith(".asc"):
+            with open(source, 'rb') as fp:
+                store(source, fp)
+            continue
+        if repack.is_repacked(source):
+            for name, header, a in repack.iter_grids(
+                    source, lambda n: parse_times([n])[0] in index):
+                a[a == asc.NODATA] = np.nan
+                out[index[parse_times([name])[0]]] = a
+            continue
+        days = set(np.array(ts).astype("datetime64[D]").astype(str))
+        days = {d.replace("-", "") for d in days}
+
+        def match(name):
+            if name.endswith(".tar.gz"):
+                return name[3:11] in days
+            return name[3:11] in days and parse_times([name])[0] in index
+
+        for name, fp in asc.iter_archive(source, match):
+            store(name, fp)
+    return out
+
+
+def open_radolan(paths, start=None, end=None, chunks="day", lonlat=False):
+    """
+    Lazily evaluated RADOLAN RW precipitation as `xarray.Dataset`.
+
+    paths: string or list of strings
+        RADOLAN directory, *.asc files and / or archives.
+    start, end: datetime / string
+        first and last hour (default: all hours of the sources).
+    chunks: string
+        "hour" or "day": one dask chunk (and task) per hour / day. Archives
+        are read once per chunk, so use "day" for archives.
+    lonlat: bool
+        add longitude / latitude of the cell centers as coordinates
+        (needs GDAL).
+
+    Variable `prc` (mm/h, NaN where invalid or missing) has the dimensions
+    time, y, x; x / y are the cell centers in the RADOLAN projection
+    (attribute `crs`). Hours without source are listed in the attribute
+    `missing_dates`.
+    """
+    import dask
+    import dask.array as da
+    import xarray as xr
+
+    assert chunks in CHUNKS, f"chunks must be one of {CHUNKS}."
+    catalog, daily, monthly = find_sources(paths)
+    if start is None or end is None:
+        first, last = _coverage(catalog, daily, monthly)
+        start = first if start is None else start
+        end = last if end is None else end
+    start = to_datetime64(start)[0]
+    end = to_datetime64(end)[0]
+    times = np.arange(start, end + HOUR, HOUR)
+    sources = _source_hours(catalog, daily, monthly, times)
+    available = [s for s in sources if s is not None]
+    assert len(available) > 0, "No RADOLAN data in the time range."
+
+    header = _read_header(available[0])
+    shape = (int(header["nrows"]), int(header["ncols"]))
+    gt = asc.geotransform(header)
+
+    if chunks == "day":
+        keys = times.astype("datetime64[D]")
+    else:
+        keys = times
+    edges = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1], True])
+    read = dask.delayed(_read_block, pure=True)
+    blocks = [da.from_delayed(read(times[i0:i1], sources[i0:i1], shape),
+                              shape=(i1 - i0,) + shape, dtype="f4")
+              for i0, i1 in zip(edges[:-1], edges[1:])]
+    prc = da.concatenate(blocks, axis=0)
+
+    x = gt[0] + (np.arange(shape[1]) + .5) * gt[1]
+    y = gt[3] + (np.arange(shape[0]) + .5) * gt[5]
+    ds = xr.Dataset(
+        {"prc": (("time", "y", "x"), prc, {
+            "units": "mm/h",
+            "long_name": ("precipitation data from RADOLAN RW Weather "
+                          "Radar Data (DWD)"),
+            "standard_name": "precipitation"})},
+        coords={"time": times.astype("datetime64[ns]"),
+                "y": ("y", y, {"units": "m"}),
+                "x": ("x", x, {"units": "m"})},
+        attrs={"crs": DWD_PROJ,
+               "missing_dates": [str(t) for t, s in zip(times, sources)
+                                 if s is None]})
+    if lonlat:
+        lon, lat = GridIndex(gt, shape, proj=DWD_PROJ).lonlat()
+        ds = ds.assign_coords(lon=(("y", "x"), lon), lat=(("y", "x"), lat))
+    return ds
@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    spatial index of a regular (RADOLAN) grid.
+
+    As the grid is regular in its projection, cell lookups are done
+    analytically from the geotransform: coordinates are projected once and
+    nearest cell, k nearest cells and cells within a radius are computed
+    for whole batches of coordinates with NumPy. Longitudes / latitudes of
+    the cell centers are cached on disk per grid definition.
+"""
+
+import hashlib
+import os
+
+import numpy as np
+
+
+__author__ = "Thomas Ramsauer"
+__copyright__ = "Thomas Ramsauer"
+__license__ = "gpl3"
+
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "raddo")
+
+# projection of the RADOLAN grid (polar stereographic)
+DWD_PROJ = ("+proj=stere +lon_0=10.0 +lat_0=90.0 +lat_ts=60.0 "
+            "+a=6370040 +b=6370040 +units=m")
+
+
+class GridIndex(object):
+
+    def __init__(self, geotransform, shape, proj=None, cache_dir=None):
+        """
+        geotransform: tuple
+            GDAL style geotransform of the (north up) grid.
+        shape: tuple
+            (rows, columns) of the grid.
+        proj: string
+            proj4 string of the grid projection (needed for lon/lat).
+        cache_dir: string
+            directory to cache cell center coordinates in
+            (default: ~/.cache/raddo).
+        """
+        self.geotransform = tuple(float(v) for v in geotransform)
+        self.shape = tuple(int(n) for n in shape)
+        self.proj = proj
+        self.cache_dir = CACHE_DIR if cache_dir is None else cache_dir
+        self._lonlat = None
+
+    @classmethod
+    def from_header(cls, header, proj=None, cache_dir=None):
+        "grid index of an ESRI ASCII grid header (see `raddo.asc`)."
+        from raddo import asc
+        return cls(asc.geotransform(header),
+                   (header["nrows"], header["ncols"]), proj, cache_dir)
+
+    @property
+    def key(self):
+        "hash of the grid definition."
+        definition = repr((self.geotransform, self.shape, self.proj))
+        return hashlib.sha1(definition.encode()).hexdigest()[:16]
+
+    def __eq__(self, other):
+        return isinstance(other, GridIndex) and self.key == other.key
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def _transformation(self, inverse=False):
+        from osgeo import osr
+        assert self.proj is not None, "Projection of grid is unknown."
+        wgs84 = osr.SpatialReference()
+        wgs84.ImportFromEPSG(4326)
+        wgs84.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+        grid = osr.SpatialReference()
+        grid.ImportFromProj4(self.proj)
+        if inverse:
+            return osr.CoordinateTransformation(grid, wgs84)
+        return osr.CoordinateTransformation(wgs84, grid)
+
+    def project(self, lons, lats):
+        "grid coordinates of `lons`, `lats` (EPSG:4326)."
+        lons = np.atleast_1d(np.asarray(lons, dtype=float))
+        lats = np.atleast_1d(np.asarray(lats, dtype=float))
+        if len(lons) == 0:
+            return lons, lats
+        xy = np.array(self._transformation().TransformPoints(
+            np.column_stack([lons, lats]).tolist()))
+        return xy[:, 0], xy[:, 1]
+
+    def fractional(self, x, y):
+        "fractional column / row of grid coordinates `x`, `y`."
+        gt = self.geotransform
+        x = np.atleast_1d(np.asarray(x, dtype=float))
+        y = np.atleast_1d(np.asarray(y, dtype=float))
+        return (x - gt[0]) / gt[1], (y - gt[3]) / gt[5]
+
+    def inside(self, rows, cols):
+        return (rows >= 0) & (rows < self.shape[0]) & \
+            (cols >= 0) & (cols < self.shape[1])
+
+    def centers(self, rows, cols):
+        "grid coordinates of the centers of cells `rows`, `cols`."
+        gt = self.geotransform
+        return gt[0] + (np.asarray(cols) + .5) * gt[1], \
+            gt[3] + (np.asarray(rows) + .5) * gt[5]
+
+    def nearest(self, x, y):
+        """
+        Row and column of the cells containing `x`, `y`; -1 for
+        coordinates outside of the grid.
+        """
+        col, row = self.fractional(x, y)
+        rows = np.floor(row).astype(int)
+        cols = np.floor(col).astype(int)
+        outside = ~self.inside(rows, cols)
+        rows[outside] = -1
+        cols[outside] = -1
+        return rows, cols
+
+    def _window(self, x, y, half):
+        "cells (points x window) of a square window around `x`, `y`."
+        col, row = self.fractional(x, y)
+        off = np.arange(-half, half + 1)
+        dr, dc = [o.ravel() for o in np.meshgrid(off, off, indexing="ij")]
+        rows = np.floor(row).astype(int)[:, None] + dr[None, :]
+        cols = np.floor(col).astype(int)[:, None] + dc[None, :]
+        cx, cy = self.centers(rows, cols)
+        dist = np.hypot(cx - np.atleast_1d(x)[:, None],
+                        cy - np.atleast_1d(y)[:, None])
+        dist[~self.inside(rows, cols)] = np.inf
+        return rows, cols, dist
+
+    def knearest(self, x, y, k):
+        """
+        Rows, columns and distances (points x k) of the `k` cells with
+        centers closest to `x`, `y`, sorted by distance. Cells outside the
+        grid have an infinite distance.
+        """
+        half = int(np.ceil(np.sqrt(k) / 2)) + 1
+        rows, cols, dist = self._window(x, y, half)
+        order = np.argsort(dist, axis=1, kind="stable")[:, :k]
+        return (np.take_along_axis(rows, order, axis=1),
+                np.take_along_axis(cols, order, axis=1),
+                np.take_along_axis(dist, order, axis=1))
+
+    def radius(self, x, y, r):
+        """
+        List of (rows, columns) arrays of the cells with centers within
+        `r` (grid units) of each `x`, `y`.
+        """
+        half = int(np.ceil(r / abs(self.geotransform[1]))) + 1
+        rows, cols, dist = self._window(x, y, half)
+        within = dist <= r
+        return [(rows[i][within[i]], cols[i][within[i]])
+                for i in range(len(rows))]
+
+    def flat(self, rows, cols):
+        "flat (raveled) index of cells `rows`, `cols`."
+        return np.asarray(rows) * self.shape[1] + np.asarray(cols)
+
+    def lonlat(self):
+        """
+        Longitudes and latitudes of all cell centers (rows x columns),
+        cached on disk per grid definition.
+        """
+        if self._lonlat is not None:
+            return self._lonlat
+        cache = os.path.join(self.cache_dir, f"grid_{self.key}.npz")
+        if os.path.isfile(cache):
+            with np.load(cache) as npz:
+                self._lonlat = npz["lon"], npz["lat"]
+            return self._lonlat
+        rows, cols = np.indices(self.shape)
+        x, y = self.centers(rows.ravel(), cols.ravel())
+        ll = np.array(self._transformation(inverse=True).TransformPoints(
+            np.column_stack([x, y]).tolist()))
+        self._lonlat = (ll[:, 0].reshape(self.shape),
+                        ll[:, 1].reshape(self.shape))
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp = cache + f".{os.getpid()}.npz"
+            np.savez(tmp, lon=self._lonlat[0], lat=self._lonlat[1])
+            os.replace(tmp, cache)
+        except OSError:
+            pass
+        return self._lonlat
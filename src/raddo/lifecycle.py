@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    storage lifecycle of local RADOLAN data.
+
+    Archives (RW-YYYYMMDD.tar.gz / RW-YYYYMM.tar) are the canonical source.
+    Extracted *.asc directories (and optionally GeoTiffs) are pruned once
+    all their hours are contained in a NetCDF / Zarr output and are
+    re-extracted from the archives on demand. Outputs, their hours and
+    pruned directories are recorded in a state file in the RADOLAN
+    directory.
+"""
+
+import glob
+import json
+import os
+import re
+import shutil
+import sys
+from datetime import datetime
+
+import numpy as np
+
+from raddo.catalog import Catalog, HOUR, parse_times, to_datetime64
+from raddo import untar
+
+
+__author__ = "Thomas Ramsauer"
+__copyright__ = "Thomas Ramsauer"
+__license__ = "gpl3"
+
+
+STATE_FILE = ".raddo_lifecycle.json"
+
+
+def _runs(hours):
+    "[first, last] (ISO strings) of all runs of consecutive `hours`."
+    hours = np.unique(to_datetime64(hours)) if len(hours) else []
+    if len(hours) == 0:
+        return []
+    breaks = np.nonzero(np.diff(hours) != HOUR)[0]
+    firsts = np.concatenate([hours[:1], hours[breaks + 1]])
+    lasts = np.concatenate([hours[breaks], hours[-1:]])
+    return [[str(f), str(la)] for f, la in zip(firsts, lasts)]
+
+
+def _expand(runs):
+    "hours (datetime64) of `runs`."
+    if len(runs) == 0:
+        return np.array([], dtype="datetime64[h]")
+    return np.concatenate([
+        np.arange(np.datetime64(f, "h"), np.datetime64(la, "h") + HOUR, HOUR)
+        for f, la in runs])
+
+
+def _archive_of(day_dir):
+    """
+    Canonical archive of an extracted day directory (RW-YYYYMMDD): the
+    daily archive next to it or the monthly archive of its parent.
+    """
+    day_dir = os.path.abspath(day_dir)
+    daily = day_dir + ".tar.gz"
+    if os.path.isfile(daily):
+        return daily
+    parent = os.path.dirname(day_dir)
+    monthly = os.path.join(os.path.dirname(parent),
+                           os.path.basename(parent) + ".tar")
+    if os.path.isfile(monthly):
+        return monthly
+    return None
+
+
+class LifecyclePolicy(object):
+
+    def __init__(self, rad_dir, prune_asc=True, prune_tiffs=False,
+                 tiff_dir=None):
+        """
+        rad_dir: string
+            local RADOLAN directory (the state file is kept here).
+        prune_asc: bool
+            remove extracted *.asc directories covered by outputs.
+        prune_tiffs: bool
+            remove GeoTiffs in `tiff_dir` covered by outputs.
+        """
+        self.rad_dir = os.path.abspath(rad_dir)
+        self.prune_asc = prune_asc
+        self.prune_tiffs = prune_tiffs
+        self.tiff_dir = tiff_dir
+        self.state_file = os.path.join(self.rad_dir, STATE_FILE)
+
+    def _read_state(self):
+        try:
+            with open(self.state_file) as fp:
+                state = json.load(fp)
+        except (OSError, ValueError):
+            state = {}
+        state.setdefault("outputs", {})
+        state.setdefault("pruned", {})
+        return state
+
+    def _write_state(self, state):
+        tmp = self.state_file + f".{os.getpid()}.tmp"
+        with open(tmp, 'w') as fp:
+            json.dump(state, fp, indent=1, sort_keys=True)
+        os.replace(tmp, self.state_file)
+
+    def record_output(self, output, hours):
+        "record that `output` (NetCDF file / Zarr store) contains `hours`."
+        state = self._read_state()
+        output = os.path.abspath(output)
+        known = _expand(state["outputs"].get(output, []))
+        state["outputs"][output] = _runs(
+            np.concatenate([known, to_datetime64(hours)])
+            if len(hours) else known)
+        self._write_state(state)
+
+    def covered(self):
+        "hours contained in recorded outputs that still exist."
+        state = self._read_state()
+        hours = [_expand(runs) for output, runs in state["outputs"].items()
+                 if os.path.exists(output)]
+        if len(hours) == 0:
+            return Catalog([], [])
+        hours = np.unique(np.concatenate(hours))
+        return Catalog(np.full(len(hours), ""), hours)
+
+    def run(self):
+        """
+        Apply the policy: prune extracted directories (and GeoTiffs) whose
+        hours are all contained in outputs. Returns the removed paths.
+        """
+        covered = self.covered()
+        state = self._read_state()
+        removed = []
+        # forget pruned directories that were extracted again
+        state["pruned"] = {d: a for d, a in state["pruned"].items()
+                           if not os.path.isdir(d)}
+
+        if self.prune_asc:
+            pattern = os.path.join(self.rad_dir, "**", "RW-????????")
+            for day_dir in sorted(glob.glob(pattern, recursive=True)):
+                if not (os.path.isdir(day_dir) and re.match(
+                        r"RW-\d{8}$", os.path.basename(day_dir))):
+                    continue
+                archive = _archive_of(day_dir)
+                asc_files = glob.glob(os.path.join(day_dir, "*.asc"))
+                if archive is None or len(asc_files) == 0:
+                    continue
+                if not covered.contains(parse_times(asc_files)).all():
+                    continue
+                shutil.rmtree(day_dir)
+                state["pruned"][day_dir] = archive
+                removed.append(day_dir)
+
+        if self.prune_tiffs and self.tiff_dir is not None:
+            tiffs = sorted(glob.glob(os.path.join(self.tiff_dir, "*.tiff")))
+            if len(tiffs) > 0:
+                keep = covered.contains(parse_times(tiffs))
+                for tiff, is_covered in zip(tiffs, keep):
+                    if is_covered:
+                        os.remove(tiff)
+                        removed.append(tiff)
+
+        self._write_state(state)
+        if len(removed) > 0:
+            sys.stdout.write("\n" + str(datetime.now())[:-4] +
+                             f"   Lifecycle: removed {len(removed)} "
+                             f"extracted directories / files.\n")
+        return removed
+
+    def restore(self, start=None, end=None):
+        """
+        Re-extract pruned directories (of days from `start` to `end`) from
+        their archives. Returns the extracted directories.
+        """
+        state = self._read_state()
+        archives = set()
+        for day_dir, archive in state["pruned"].items():
+            day = datetime.strptime(os.path.basename(day_dir)[3:11],
+                                    "%Y%m%d")
+            if (start is None or day >= start) and \
+                    (end is None or day <= end) and os.path.isfile(archive):
+                archives.add(archive)
+        if len(archives) == 0:
+            return []
+        monthly = any(a.endswith(".tar") for a in archives)
+        return untar.untar(files=sorted(archives), hist=monthly)
@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    per stage timing and throughput metrics of a raddo run.
+
+    Stages (download, sort, untar, warp, netcdf, ...) record their wall
+    and CPU time; single items (archives, grids, files) record their
+    latency in a histogram and the bytes processed. At the end of a run the
+    metrics are written as JSON or CSV report.
+"""
+
+import collections
+import contextlib
+import csv
+import functools
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+
+__author__ = "Thomas Ramsauer"
+__copyright__ = "Thomas Ramsauer"
+__license__ = "gpl3"
+
+
+# upper bounds (seconds) of the latency histogram buckets; last: overflow
+BUCKETS = (.001, .002, .005, .01, .02, .05, .1, .2, .5, 1., 2., 5., 10.,
+           20., 50., 100., float("inf"))
+
+CSV_FIELDS = ["stage", "calls", "wall_s", "cpu_s", "items", "bytes",
+              "items_per_s", "mb_per_s", "latency_mean_s", "latency_p50_s",
+              "latency_p95_s", "latency_max_s"]
+
+
+def timed(name):
+    "decorator recording every call of a method as stage `name`."
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.metrics.stage(name):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class StageMetrics(object):
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.wall = 0.
+        self.cpu = 0.
+        self.items = 0
+        self.bytes = 0
+        self.latency_sum = 0.
+        self.latency_max = 0.
+        self.histogram = [0] * len(BUCKETS)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds=None, nbytes=0, items=1):
+        "record `items` processed item(s) of `nbytes` taking `seconds`."
+        with self._lock:
+            self.items += items
+            self.bytes += int(nbytes)
+            if seconds is None:
+                return
+            self.latency_sum += seconds
+            self.latency_max = max(self.latency_max, seconds)
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    self.histogram[i] += 1
+                    break
+
+    def quantile(self, q):
+        "upper bound of the histogram bucket containing quantile `q`."
+        n = sum(self.histogram)
+        if n == 0:
+            return None
+        count = 0
+        for bound, k in zip(BUCKETS, self.histogram):
+            count += k
+            if count >= q * n:
+                return min(bound, self.latency_max)
+        return self.latency_max
+
+    def as_dict(self):
+        n = sum(self.histogram)
+        wall = self.wall or None
+        return {
+            "stage": self.name,
+            "calls": self.calls,
+            "wall_s": round(self.wall, 4),
+            "cpu_s": round(self.cpu, 4),
+            "items": self.items,
+            "bytes": self.bytes,
+            "items_per_s": round(self.items / wall, 3) if wall else None,
+            "mb_per_s": round(self.bytes / 1e6 / wall, 3) if wall else None,
+            "latency_mean_s": round(self.latency_sum / n, 4) if n else None,
+            "latency_p50_s": self.quantile(.5),
+            "latency_p95_s": self.quantile(.95),
+            "latency_max_s": round(self.latency_max, 4) if n else None,
+            "histogram": {("inf" if b == float("inf") else str(b)): k
+                          for b, k in zip(BUCKETS, self.histogram)}}
+
+
+class Metrics(object):
+
+    def __init__(self):
+        "recorder of the metrics of all stages (in order of first use)."
+        self.started = datetime.now()
+        self.stages = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name):
+        with self._lock:
+            if name not in self.stages:
+                self.stages[name] = StageMetrics(name)
+            return self.stages[name]
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """
+        Context measuring wall and CPU time of a stage; yields its
+        `StageMetrics`. CPU time is that of the whole process, i.e. it
+        includes the worker threads of the stage.
+        """
+        m = self[name]
+        t0, c0 = time.perf_counter(), time.process_time()
+        try:
+            yield m
+        finally:
+            with m._lock:
+                m.calls += 1
+                m.wall += time.perf_counter() - t0
+                m.cpu += time.process_time() - c0
+
+    @contextlib.contextmanager
+    def item(self, name, nbytes=0):
+        """
+        Context measuring the latency of a single item of stage `name`.
+        Yields a dict, whose "bytes" may be set within the context.
+        """
+        info = {"bytes": nbytes}
+        t0 = time.perf_counter()
+        try:
+            yield info
+        finally:
+            self[name].observe(time.perf_counter() - t0, info["bytes"])
+
+    def report(self):
+        "metrics of all stages as dict."
+        return {"started": self.started.isoformat(),
+                "finished": datetime.now().isoformat(),
+                "stages": [m.as_dict() for m in self.stages.values()]}
+
+    def write(self, path):
+        "write the report as CSV (*.csv) or JSON (everything else)."
+        report = self.report()
+        tmp = path + f".{os.getpid()}.tmp"
+        with open(tmp, 'w', newline='') as fp:
+            if os.path.splitext(path)[1].lower() == ".csv":
+                writer = csv.DictWriter(fp, CSV_FIELDS, extrasaction="ignore")
+                writer.writeheader()
+                writer.writerows(report["stages"])
+            else:
+                json.dump(report, fp, indent=1)
+        os.replace(tmp, path)
+        return path
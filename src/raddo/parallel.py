@@ -0,0 +1,376 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    month-partitioned parallel NetCDF builds.
+
+    Long time ranges are split into months. Every month is downloaded,
+    extracted, decoded and written to its own NetCDF part by a worker
+    process (local process pool or a dask distributed cluster, which may
+    span several hosts sharing the RADOLAN directory). The parts are kept
+    as they are (no data is copied once more) and listed in a small JSON
+    index, which `open_parts` opens as one lazy `xarray.Dataset`.
+
+    Months without any data get a part of NODATA hours (listed in
+    `missing_dates`), so the time axis has no gaps. Daily maxima of rolling
+    sums of the first days of a part are computed again with the last
+    hours of the preceding part, so they are the same as in a NetCDF file
+    written in one pass.
+"""
+
+import datetime
+import glob
+import json
+import os
+import re
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from raddo import sort_tars
+from raddo import untar
+from raddo.aggregate import StreamingAggregator
+from raddo.catalog import HOUR, to_datetime
+
+
+__author__ = "Thomas Ramsauer"
+__copyright__ = "Thomas Ramsauer"
+__license__ = "gpl3"
+
+
+BASEDATE = datetime.datetime(2000, 1, 1)
+NODATA = -9999
+
+
+def months(start, end):
+    "(first day, last day) of every month from `start` to `end` (days)."
+    res = []
+    first = datetime.datetime(start.year, start.month, start.day)
+    while first <= end:
+        nxt = datetime.datetime(first.year + first.month // 12,
+                                first.month % 12 + 1, 1)
+        res.append((first, min(nxt - datetime.timedelta(days=1), end)))
+        first = nxt
+    return res
+
+
+def run_partitions(func, partitions, jobs=None, scheduler=None, **kwargs):
+    """
+    Results of `func(partition, **kwargs)` for all `partitions` (in order).
+
+    scheduler: string
+        None: pool of `jobs` local processes; "local": local dask
+        distributed cluster with `jobs` workers; otherwise the address of a
+        dask distributed scheduler (e.g. "tcp://host:8786").
+    """
+    if scheduler is None:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(func, p, **kwargs) for p in partitions]
+            return [f.result() for f in futures]
+
+    from dask.distributed import Client, LocalCluster
+    if scheduler == "local":
+        cluster = LocalCluster(n_workers=jobs, threads_per_worker=1,
+                               processes=True)
+        client = Client(cluster)
+    else:
+        cluster = None
+        client = Client(scheduler)
+    try:
+        futures = client.map(func, partitions, pure=False, **kwargs)
+        return client.gather(futures)
+    finally:
+        client.close()
+        if cluster is not None:
+            cluster.close()
+
+
+def _local_archives(rad_dir, first):
+    "daily and monthly archives of the month of `first` in `rad_dir`."
+    pattern = os.path.join(rad_dir, "**", f"RW-{first.strftime('%Y%m')}*")
+    return sorted(f for f in glob.glob(pattern, recursive=True)
+                  if f.endswith(".tar.gz") or f.endswith(".tar"))
+
+
+def build_month(partition, rad_dir, part_dir, no_time_correction=False,
+                aggregate=False, rolling=(), mask=None, buffer=1400,
+                workers=1):
+    """
+    Download, extract and write the NetCDF part of the month `partition`
+    ((first day, last day)). Returns the part file (None if there is no
+    data) and the names of the downloaded archives.
+    """
+    from raddo.raddo import Raddo
+
+    first, last = partition
+    rd = Raddo()
+    rd.rad_dir = os.path.abspath(rad_dir)
+    rd.yes = True
+    rd.buffer = buffer
+    rd.hist_files = False
+    rd.start_datetime = first
+    rd.end_datetime = last
+    rd.timestamps64 = np.arange(
+        np.datetime64(first, 'h'),
+        np.datetime64(last + datetime.timedelta(days=1), 'h'), HOUR)
+    rd.timestamps = to_datetime(rd.timestamps64)
+
+    # only days without local daily / monthly archive are downloaded
+    archives = _local_archives(rd.rad_dir, first)
+    names = {os.path.basename(f) for f in archives}
+    downloaded = []
+    if first.strftime("RW-%Y%m.tar") not in names:
+        day = first
+        while day <= last:
+            f = day.strftime("RW-%Y%m%d.tar.gz")
+            if f not in names:
+                got = rd.download_file(f, rd.RAD_DIR_DWD,
+                                       rd.RAD_DIR_DWD_HIST,
+                                       rd.ERRORS_ALLOWED)
+                downloaded += got
+                if any(g.endswith(".tar") for g in got):
+                    break  # monthly archive covers all days
+            day += datetime.timedelta(days=1)
+    if len(downloaded) > 0:
+        archives += sort_tars.sort_tars(
+            files=[os.path.join(rd.rad_dir, f) for f in downloaded])
+
+    untarred_dirs = untar.untar(files=archives) if archives else []
+    asc_files = rd.get_asc_files(untarred_dirs or [])
+    if len(asc_files) == 0:
+        return None, downloaded
+
+    if mask:
+        rd.read_mask(mask)
+    part = os.path.join(part_dir, first.strftime("RADOLAN_part_%Y%m.nc"))
+    if os.path.exists(part):
+        os.remove(part)
+    with tempfile.TemporaryDirectory(dir=part_dir) as tiff_dir:
+        gtiff_files = rd.create_geotiffs(asc_files, tiff_dir)
+        rd.create_netcdf(gtiff_files, part_dir, os.path.basename(part),
+                         no_time_correction, workers=workers,
+                         aggregate=aggregate, rolling=rolling)
+    return part, downloaded
+
+
+def _parse_dates(dates_str):
+    "datetimes of the `missing_dates` attribute string `dates_str`."
+    return [datetime.datetime(*(int(v) for v in args.split(",")))
+            for args in re.findall(r"datetime\.datetime\(([^)]*)\)",
+                                   dates_str)]
+
+
+def _month_hours(first, last):
+    "datetimes of the hours from day `first` to the end of day `last`."
+    return to_datetime(np.arange(
+        np.datetime64(first, 'h'),
+        np.datetime64(last + datetime.timedelta(days=1), 'h'), HOUR))
+
+
+def _part_hours(nco):
+    "datetimes of the time steps of the open NetCDF part `nco`."
+    return [BASEDATE + datetime.timedelta(hours=float(t))
+            for t in nco['time'][:]]
+
+
+def _rolling(nco):
+    "window lengths of the rolling sum maxima in the open part `nco`."
+    return sorted(int(v[8:-1]) for v in nco.variables
+                  if re.match(r"prc_max_\d+h$", v))
+
+
+def _write_aggregates(nco, res):
+    """
+    Write the aggregates `res` of a `StreamingAggregator` to the open part
+    `nco` (replacing periods already there); others are ignored.
+    """
+    for name, period, data in res:
+        if f'prc_{name}' not in nco.variables:
+            continue
+        vo = nco[f'prc_{name}']
+        vo.set_auto_maskandscale(False)
+        to = nco[vo.dimensions[0]]
+        value = (period - BASEDATE).total_seconds() / 86400.
+        i = np.flatnonzero(np.isclose(np.asarray(to[:]), value))
+        i = i[0] if len(i) > 0 else len(to)
+        to[i] = value
+        vo[i, :, :] = np.where(np.isnan(data), NODATA, data)
+
+
+def write_gap(template, first, last, outf):
+    """
+    Write the NetCDF part `outf` of the month `first` to `last` (days)
+    without any data: variables and grid of part `template`, all hours
+    NODATA and listed in `missing_dates`, aggregates computed from them.
+    """
+    import netCDF4
+    hours = _month_hours(first, last)
+    with netCDF4.Dataset(template) as src, \
+            netCDF4.Dataset(outf, 'w') as dst:
+        for name, dim in src.dimensions.items():
+            dst.createDimension(name, None if dim.isunlimited() else len(dim))
+        for name, var in src.variables.items():
+            attrs = {k: var.getncattr(k) for k in var.ncattrs()}
+            out = dst.createVariable(name, var.dtype, var.dimensions,
+                                     zlib=var.filters().get('zlib', False),
+                                     fill_value=attrs.pop('_FillValue', None))
+            out.setncatts(attrs)
+            if len(var.dimensions) == 0 or \
+                    not src.dimensions[var.dimensions[0]].isunlimited():
+                out[...] = var[...]
+        dst.setncatts({k: src.getncattr(k) for k in src.ncattrs()})
+
+        prco = dst['prc']
+        prco.set_auto_maskandscale(False)
+        shape = prco.shape[1:]
+        nodata = np.full(shape, NODATA, dtype='f4')
+        dst['time'][:] = [(t - BASEDATE).total_seconds() / 3600.
+                          for t in hours]
+        for i in range(0, len(hours), 24):
+            n = min(24, len(hours) - i)
+            prco[i:i + n, :, :] = np.broadcast_to(nodata, (n,) + shape)
+        if 'prc_daily' in dst.variables or _rolling(dst):
+            agg = StreamingAggregator(shape, rolling=_rolling(dst),
+                                      nodata=NODATA)
+            for t in hours:
+                _write_aggregates(dst, agg.add(t, nodata))
+            _write_aggregates(dst, agg.flush())
+        dst.missing_dates = str(hours)
+    return outf
+
+
+def continue_rolling(previous, part):
+    """
+    Compute the daily maxima of rolling sums of the first days of `part`
+    again, with windows reaching back into the last hours of the preceding
+    part `previous`, as if both were written in one pass.
+    """
+    import netCDF4
+    with netCDF4.Dataset(previous) as src, \
+            netCDF4.Dataset(part, 'a') as dst:
+        rolling = _rolling(dst)
+        if len(rolling) == 0 or max(rolling) < 2:
+            return part
+        n = max(rolling)
+        prev = src['prc']
+        prev.set_auto_maskandscale(False)
+        prco = dst['prc']
+        prco.set_auto_maskandscale(False)
+        lead = min(n - 1, prev.shape[0])
+        lead_hours = _part_hours(src)[prev.shape[0] - lead:]
+        hours = _part_hours(dst)
+        if len(hours) == 0:
+            return part
+
+        # all hours of the days with windows reaching into `previous`
+        first_day = hours[0].replace(hour=0)
+        last_day = hours[min(n - 2, len(hours) - 1)].replace(hour=0)
+        k = len([t for t in hours if t.replace(hour=0) <= last_day])
+
+        agg = StreamingAggregator(prco.shape[1:], rolling=rolling,
+                                  nodata=NODATA)
+        res = []
+        for i, t in enumerate(lead_hours, prev.shape[0] - lead):
+            res += agg.add(t, prev[i, :, :])
+        for i in range(k):
+            res += agg.add(hours[i], prco[i, :, :])
+        res += agg.flush()
+        _write_aggregates(dst, [r for r in res if r[0].startswith("max_")
+                                and r[1] >= first_day])
+    return part
+
+
+def write_index(parts, outf):
+    """
+    Write the JSON index `outf` of the NetCDF `parts` (consecutive in
+    time): part files relative to the index and the missing dates of all
+    parts.
+    """
+    import netCDF4
+    missing = []
+    for part in parts:
+        with netCDF4.Dataset(part) as nco:
+            missing += _parse_dates(getattr(nco, 'missing_dates', '[]'))
+    index = {"parts": [os.path.relpath(p, os.path.dirname(outf))
+                       for p in parts],
+             "missing_dates": [t.isoformat() for t in sorted(missing)]}
+    with open(outf, 'w') as fp:
+        json.dump(index, fp, indent=1)
+    return outf
+
+
+def open_parts(index, chunks=None):
+    """
+    Lazy `xarray.Dataset` of the NetCDF parts listed in the JSON `index`
+    (see `build_netcdf`): hourly and aggregated variables are concatenated
+    along their time dimensions (time, day, month).
+    """
+    import xarray as xr
+    with open(index) as fp:
+        info = json.load(fp)
+    parts = [xr.open_dataset(os.path.join(os.path.dirname(index), p),
+                             chunks={} if chunks is None else chunks)
+             for p in info["parts"]]
+    dims = [d for d in ("time", "day", "month") if d in parts[0].dims]
+    datasets = [parts[0].drop_dims(dims)]
+    for dim in dims:
+        names = [v for v in parts[0].data_vars if dim in parts[0][v].dims]
+        datasets.append(xr.concat([p[names] for p in parts], dim,
+                                  data_vars="minimal", coords="minimal"))
+    ds = xr.merge(datasets)
+    ds.attrs = dict(parts[0].attrs, missing_dates=str(
+        [datetime.datetime.fromisoformat(t) for t in info["missing_dates"]]))
+    return ds
+
+
+def build_netcdf(rad_dir, start, end, outdir, outf=None, jobs=None,
+                 scheduler=None, no_time_correction=False, aggregate=False,
+                 rolling=(), mask=None, buffer=1400, workers=1):
+    """
+    Build the NetCDF parts of `start` to `end` month by month in parallel
+    (see `build_month` and `run_partitions`) in the directory <index>_parts
+    and write their JSON index `outf` (see `write_index`, `open_parts`) in
+    `outdir`. `rad_dir` and `outdir` need to be reachable by all workers.
+    Returns the index file and the names of downloaded archives.
+    """
+    from raddo.raddo import Raddo
+
+    rd = Raddo()
+    rd.start_datetime, rd.end_datetime = start, end
+    if outf is not None:
+        outf = os.path.splitext(outf)[0] + ".json"
+    outf = rd._output_file_name(os.path.abspath(outdir), outf, ".json")
+    part_dir = os.path.splitext(outf)[0] + "_parts"
+    os.makedirs(part_dir, exist_ok=True)
+    rad_dir = os.path.abspath(rad_dir)
+    partitions = months(start, end)
+    sys.stdout.write('\n' + str(datetime.datetime.now())[:-4] +
+                     f'   Building {len(partitions)} month(s) with '
+                     f'{jobs or os.cpu_count()} worker(s)...\n')
+    results = run_partitions(build_month, partitions, jobs=jobs,
+                             scheduler=scheduler, rad_dir=rad_dir,
+                             part_dir=part_dir,
+                             no_time_correction=no_time_correction,
+                             aggregate=aggregate, rolling=rolling,
+                             mask=mask, buffer=buffer, workers=workers)
+    template = next((part for part, downloaded in results
+                     if part is not None), None)
+    assert template is not None, "No RADOLAN data in the time range."
+
+    parts = []
+    for (first, last), (part, downloaded) in zip(partitions, results):
+        if part is None:
+            part = write_gap(template, first, last, os.path.join(
+                part_dir, first.strftime("RADOLAN_part_%Y%m.nc")))
+        if len(parts) > 0:
+            continue_rolling(parts[-1], part)
+        parts.append(part)
+
+    sys.stdout.write('\n' + str(datetime.datetime.now())[:-4] +
+                     f'   Index of {len(parts)} part(s):\n' + 25*" " +
+                     f'{outf}\n')
+    write_index(parts, outf)
+    sys.stdout.write(str(datetime.datetime.now())[:-4] + '   done.\n')
+    return outf, [f for part, downloaded in results for f in downloaded]
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    staged processing pipeline.
+
+    Every stage runs in its own thread and is connected to the next one by
+    a bounded queue, so stages overlap (e.g. day N is written while day N+1
+    is still downloading) and a slow stage throttles the ones before it
+    instead of letting intermediate products pile up. Per stage, the time
+    spent working, waiting for input (starved) and waiting for the next
+    stage (blocked, i.e. backpressure) is recorded.
+"""
+
+import queue
+import sys
+import threading
+import time
+from datetime import datetime
+
+
+__author__ = "Thomas Ramsauer"
+__copyright__ = "Thomas Ramsauer"
+__license__ = "gpl3"
+
+
+_DONE = object()
+
+
+class Stage(object):
+
+    def __init__(self, name, func):
+        """
+        name: string
+            name of the stage in the report.
+        func: callable
+            called with every input item; returns an iterable of output
+            items (e.g. a list, empty to drop the item).
+        """
+        self.name = name
+        self.func = func
+        self.items_in = 0
+        self.items_out = 0
+        self.busy = 0.
+        self.starved = 0.
+        self.blocked = 0.
+
+
+class Pipeline(object):
+
+    def __init__(self, stages, queue_size=2):
+        """
+        stages: list of Stage
+            stages in processing order. Each stage runs in one thread, so
+            items keep their order.
+        queue_size: integer
+            maximum number of items waiting between two stages.
+        """
+        self.stages = stages
+        self.queue_size = max(1, int(queue_size))
+        self.elapsed = 0.
+        self.sink_starved = 0.
+        self._error = None
+        self._stop = threading.Event()
+
+    def _put(self, q, item):
+        "put `item` in `q` unless the pipeline is stopped."
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _get(self, q):
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=.1)
+            except queue.Empty:
+                pass
+        return _DONE
+
+    def _run_stage(self, stage, q_in, q_out):
+        try:
+            while True:
+                t0 = time.perf_counter()
+                item = self._get(q_in)
+                stage.starved += time.perf_counter() - t0
+                if item is _DONE:
+                    break
+                stage.items_in += 1
+                t0 = time.perf_counter()
+                for out in stage.func(item):
+                    stage.busy += time.perf_counter() - t0
+                    t0 = time.perf_counter()
+                    if not self._put(q_out, out):
+                        return
+                    stage.blocked += time.perf_counter() - t0
+                    stage.items_out += 1
+                    t0 = time.perf_counter()
+                stage.busy += time.perf_counter() - t0
+        except BaseException as e:
+            self._error = e
+            self._stop.set()
+        finally:
+            self._put(q_out, _DONE)
+
+    def run(self, items):
+        """
+        Feed `items` through all stages and yield the outputs of the last
+        stage. Errors of a stage are raised here.
+        """
+        queues = [queue.Queue(self.queue_size)
+                  for _ in range(len(self.stages) + 1)]
+
+        def feed():
+            for item in items:
+                if not self._put(queues[0], item):
+                    return
+            self._put(queues[0], _DONE)
+
+        threads = [threading.Thread(target=feed, daemon=True)]
+        threads += [threading.Thread(target=self._run_stage, daemon=True,
+                                     args=(s, queues[i], queues[i+1]))
+                    for i, s in enumerate(self.stages)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        try:
+            while True:
+                t0 = time.perf_counter()
+                item = self._get(queues[-1])
+                self.sink_starved += time.perf_counter() - t0
+                if item is _DONE:
+                    break
+                yield item
+        finally:
+            self._stop.set()
+            for t in threads:
+                t.join()
+            self.elapsed = time.perf_counter() - start
+        if self._error is not None:
+            raise self._error
+
+    def report(self):
+        "per stage throughput and share of time busy / starved / blocked."
+        elapsed = max(self.elapsed, 1e-9)
+        lines = [f"{'stage':<10} {'in':>6} {'out':>6} {'items/s':>8} "
+                 f"{'busy':>6} {'starved':>8} {'blocked':>8}"]
+        for s in self.stages:
+            lines.append(f"{s.name:<10} {s.items_in:>6} {s.items_out:>6} "
+                         f"{s.items_out / elapsed:>8.2f} "
+                         f"{s.busy / elapsed:>6.0%} "
+                         f"{s.starved / elapsed:>8.0%} "
+                         f"{s.blocked / elapsed:>8.0%}")
+        lines.append(f"{'sink':<10} {'':>6} {'':>6} {'':>8} {'':>6} "
+                     f"{self.sink_starved / elapsed:>8.0%}")
+        return "\n".join(lines)
+
+    def write_report(self):
+        sys.stdout.write('\n' + str(datetime.now())[:-4] +
+                         f'   Pipeline finished in {self.elapsed:.1f} s:\n' +
+                         self.report() + '\n')
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    time series extraction of RADOLAN grids for many points at once.
+
+    Points are read from CSV (columns `lon`, `lat` and optionally `id`) or
+    GeoJSON files and resolved to grid indices (and bilinear weights) in
+    one vectorized step. Every grid is then sampled for all points with a
+    single fancy indexing operation.
+"""
+
+import csv
+import json
+import os
+
+import numpy as np
+
+from raddo.grid import GridIndex
+
+__author__ = "Thomas Ramsauer"
+__copyright__ = "Thomas Ramsauer"
+__license__ = "gpl3"
+
+
+METHODS = ["nearest", "bilinear"]
+
+
+def read_points(pointfile):
+    """
+    Read point ids, longitudes and latitudes from a CSV or GeoJSON file.
+    Features / rows without id are numbered consecutively.
+    """
+    ids, lons, lats = [], [], []
+    ext = os.path.splitext(pointfile)[1].lower()
+    if ext in (".json", ".geojson"):
+        with open(pointfile) as fp:
+            features = json.load(fp)["features"]
+        for i, feat in enumerate(features):
+            geom = feat.get("geometry") or {}
+            assert geom.get("type") == "Point", \
+                f"Only Point geometries supported in {pointfile}!"
+            props = feat.get("properties") or {}
+            ids.append(props.get("id", feat.get("id", i)))
+            lons.append(float(geom["coordinates"][0]))
+            lats.append(float(geom["coordinates"][1]))
+    else:
+        with open(pointfile, newline='') as fp:
+            for i, row in enumerate(csv.DictReader(fp)):
+                row = {k.strip().lower(): v for k, v in row.items()}
+                ids.append(row.get("id") or i)
+                lons.append(float(row["lon"]))
+                lats.append(float(row["lat"]))
+    return ids, np.array(lons), np.array(lats)
+
+
+def grid_weights(x, y, geotransform, shape, method="nearest"):
+    """
+    Flat cell indices and weights (both points x neighbours) of the
+    coordinates `x`, `y` on the grid described by `geotransform` and
+    `shape`. Points outside the grid get no valid weight.
+    """
+    assert method in METHODS, f"method needs to be one of {METHODS}"
+    ny, nx = shape
+    col, row = GridIndex(geotransform, shape).fractional(x, y)
+    inside = (col >= 0) & (col < nx) & (row >= 0) & (row < ny)
+
+    if method == "nearest":
+        c = np.clip(np.floor(col).astype(int), 0, nx - 1)
+        r = np.clip(np.floor(row).astype(int), 0, ny - 1)
+        idx = (r * nx + c)[:, None]
+        w = np.ones(idx.shape)
+    else:
+        # relative to cell centers
+        col = col - .5
+        row = row - .5
+        c0 = np.floor(col).astype(int)
+        r0 = np.floor(row).astype(int)
+        fc = col - c0
+        fr = row - r0
+        rs = np.clip(np.stack([r0, r0, r0 + 1, r0 + 1], axis=1), 0, ny - 1)
+        cs = np.clip(np.stack([c0, c0 + 1, c0, c0 + 1], axis=1), 0, nx - 1)
+        idx = rs * nx + cs
+        w = np.stack([(1 - fr) * (1 - fc), (1 - fr) * fc,
+                      fr * (1 - fc), fr * fc], axis=1)
+    w[~inside] = 0
+    return idx, w
+
+
+class PointSampler(object):
+
+    def __init__(self, x, y, geotransform, shape, method="nearest"):
+        self.shape = tuple(shape)
+        self.idx, self.w = grid_weights(x, y, geotransform, shape, method)
+        # grid rows and window of columns needed by the points and cell
+        # indices within them
+        nx = self.shape[1]
+        cols = self.idx % nx
+        self.rows = np.unique(self.idx // nx)
+        self.cols = slice(int(cols.min()), int(cols.max()) + 1) \
+            if cols.size else slice(0, 0)
+        width = self.cols.stop - self.cols.start
+        self._row_idx = np.searchsorted(self.rows, self.idx // nx) * width \
+            + cols - self.cols.start
+
+    def _sample(self, v, nodata):
+        valid = np.isfinite(v) & (v != nodata)
+        w = np.where(valid, self.w, 0.)
+        wsum = w.sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            res = (np.where(valid, v, 0.) * w).sum(axis=1) / wsum
+        res[wsum == 0] = np.nan
+        return res
+
+    def sample(self, a, nodata=-9999):
+        """
+        Values of grid `a` at all points. Invalid neighbours are left out
+        of the bilinear interpolation; NaN if no valid neighbour is left.
+        """
+        return self._sample(np.asarray(a, dtype=float).ravel()[self.idx],
+                            nodata)
+
+    def sample_rows(self, a_rows, nodata=-9999):
+        """
+        like `sample`, but `a_rows` only holds the columns `cols` of the
+        grid rows in `rows`.
+        """
+        return self._sample(
+            np.asarray(a_rows, dtype=float).ravel()[self._row_idx], nodata)
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    optional cProfile / tracemalloc profiling of raddo stages.
+
+    With a `Profiler` set as `Raddo.profiler`, every profiled stage
+    (radolan_down, untar, create_geotiffs, create_netcdf, ...) runs under
+    its own cProfile profile, and the memory allocated in it is traced with
+    tracemalloc. The profiles are written as pstats files together with a
+    summary of the hottest functions and largest allocation sites per
+    stage. Without a profiler, stages run unchanged.
+
+    cProfile only sees the thread that enabled it, and only one profile can
+    be active at a time: work done in worker threads (e.g. the readers of
+    `create_netcdf`) and stages started in other threads while a stage is
+    active are not profiled. Such skipped stages are reported.
+"""
+
+import cProfile
+import contextlib
+import functools
+import io
+import os
+import pstats
+import sys
+import threading
+import tracemalloc
+from datetime import datetime
+
+
+__author__ = "Thomas Ramsauer"
+__copyright__ = "Thomas Ramsauer"
+__license__ = "gpl3"
+
+
+TOP = 25
+
+
+def profiled(name):
+    "decorator profiling every call of a method as stage `name`."
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if self.profiler is None:
+                return method(self, *args, **kwargs)
+            with self.profiler.stage(name):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class Profiler(object):
+
+    def __init__(self, outdir, top=TOP):
+        """
+        outdir: string
+            directory for the pstats files and the summary (created if
+            necessary).
+        top: integer
+            number of functions / allocation sites in the summary.
+        """
+        self.outdir = os.path.abspath(outdir)
+        self.top = int(top)
+        self.profiles = {}
+        self.allocations = {}
+        self.peaks = {}
+        self.skipped = {}
+        self._active = None
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """
+        Context profiling stage `name`; repeated calls are accumulated.
+        Only one stage is profiled at a time: stages nested in the active
+        one are part of its profile, stages started in other threads while
+        it is active are not profiled (counted in `skipped`).
+        """
+        thread = threading.get_ident()
+        with self._lock:
+            active = self._active
+            if active is None:
+                self._active = (name, thread)
+            elif active[1] != thread:
+                self.skipped[name] = self.skipped.get(name, 0) + 1
+                if self.skipped[name] == 1:
+                    sys.stderr.write(
+                        f"\nWARNING: stage {name} started in another thread "
+                        f"while {active[0]} is profiled; not profiled.\n")
+        if active is not None:
+            yield
+            return
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+        profile = self.profiles.setdefault(name, cProfile.Profile())
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            after = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+            self.peaks[name] = max(self.peaks.get(name, 0), peak)
+            sites = self.allocations.setdefault(name, {})
+            for stat in after.compare_to(before, "lineno"):
+                size, count = sites.get(stat.traceback, (0, 0))
+                sites[stat.traceback] = (size + stat.size_diff,
+                                         count + stat.count_diff)
+            with self._lock:
+                self._active = None
+
+    def summary(self):
+        "hottest functions and largest allocation sites of every stage."
+        out = io.StringIO()
+        for name, count in self.skipped.items():
+            out.write(f"{name}: {count} call(s) in other threads not "
+                      f"profiled\n")
+        if self.skipped:
+            out.write("\n")
+        for name, profile in self.profiles.items():
+            out.write(f"{'=' * 79}\n{name}\n{'=' * 79}\n")
+            out.write(f"peak traced memory: "
+                      f"{self.peaks.get(name, 0) / 2**20:.1f} MiB\n\n")
+            stats = pstats.Stats(profile, stream=out)
+            stats.sort_stats("cumulative").print_stats(self.top)
+            out.write(f"top {self.top} allocation sites (size growth):\n")
+            sites = self.allocations.get(name, {})
+            for tb in sorted(sites, key=lambda t: -sites[t][0])[:self.top]:
+                size, count = sites[tb]
+                out.write(f"  {size / 2**20:>9.2f} MiB {count:>+9} blocks"
+                          f"  {tb}\n")
+            out.write("\n")
+        return out.getvalue()
+
+    def write(self):
+        """
+        Write the profile of every stage (raddo_profile_<stage>.pstats)
+        and the summary (raddo_profile.txt). Returns the summary file.
+        """
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        os.makedirs(self.outdir, exist_ok=True)
+        for name, profile in self.profiles.items():
+            profile.dump_stats(os.path.join(
+                self.outdir, f"raddo_profile_{name}.pstats"))
+        summary = os.path.join(self.outdir, "raddo_profile.txt")
+        with open(summary, 'w') as fp:
+            fp.write(self.summary())
+        sys.stdout.write('\n' + str(datetime.now())[:-4] +
+                         f'   Profiles written to {self.outdir}.\n')
+        return summary
@@ -9,18 +9,20 @@
 """
 
 import ast
+import csv
 import os
 import sys
 import re
-import glob
 import datetime
 import argparse
+import atexit
 import tempfile
-from osgeo import gdal
+import collections
+import contextlib
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
-import geopandas as gpd
-import xarray as xr
-import netCDF4
 
 from dateutil.parser import parse
 from urllib.request import urlretrieve
@@ -28,6 +30,22 @@ from urllib.error import HTTPError
 
 from raddo import sort_tars
 from raddo import untar
+from raddo.aggregate import StreamingAggregator, combine
+from raddo.zonal import ZonalStats
+from raddo import zonal
+from raddo import points
+from raddo import asc
+from raddo import repack
+from raddo.grid import GridIndex, DWD_PROJ
+from raddo.catalog import Catalog, HOUR, to_datetime
+from raddo.cache import ProductCache, copy_product, same_product
+from raddo.lifecycle import LifecyclePolicy
+from raddo.pipeline import Pipeline, Stage
+from raddo.watch import Watcher
+from raddo.parallel import build_netcdf
+from raddo import service
+from raddo.metrics import Metrics, timed
+from raddo.profiling import Profiler, profiled
 from raddo import __version__
 
 __author__ = "Thomas Ramsauer"
@@ -55,12 +73,14 @@ class Raddo(object):
     def __init__(self):
         self.FILELIST = ".raddo_local_files.txt"
         self.ERRORS_ALLOWED = 5
+        self.WORKERS = min(4, os.cpu_count() or 1)
         self.RAD_DIR_DWD = ("https://opendata.dwd.de/climate_environment/CDC/"
                             "grids_germany/hourly/radolan/recent/asc/")
         self.RAD_DIR_DWD_HIST = ("https://opendata.dwd.de/climate_environment/CDC/"
                                  "grids_germany/hourly/radolan/historical/asc/")
 
         self.RAD_DIR = os.getcwd()
+        self.rad_dir = self.RAD_DIR
 
         # TODO ($USERCONFIG/.raddo/local_files) ??
         today = datetime.datetime.today()
@@ -72,11 +92,29 @@ class Raddo(object):
         self.END_DATE_STR = datetime.datetime.strftime(self.END_DATE,
                                                        "%Y-%m-%d")
 
-        self.DWD_PROJ = ("+proj=stere +lon_0=10.0 +lat_0=90.0 +lat_ts=60.0 "
-                         "+a=6370040 +b=6370040 +units=m")
+        self.DWD_PROJ = DWD_PROJ
+        self.yes = False
         self.geotiff_mask = None
         self.buffer = 1400
+        self._grid_indices = {}
+        self._mask_windows = {}
+        self.quiet = False
+        self.metrics = Metrics()
+        self.profiler = None
+
+    def _profile(self, name):
+        "profiling context of stage `name` (no-op without profiler)."
+        if self.profiler is None:
+            return contextlib.nullcontext()
+        return self.profiler.stage(name)
+
+    def _progress(self, text):
+        "per item progress line (overwritten by the next one)."
+        if not self.quiet:
+            sys.stdout.write('\r' + str(datetime.datetime.now())[:-4] +
+                             '   ' + text)
 
+    @profiled("radolan_down")
     def radolan_down(self, *args, **kwargs):
         """
         radolan_down()  tries to download all recent RADOLAN ascii files/
@@ -119,6 +157,10 @@ class Raddo(object):
                 .raddo_local_files.txt".
             force_down:
                 Forces download of all files.
+            download: bool
+                Download missing files (default). If not set, missing files
+                are only listed (`self.missing_files`), e.g. to be downloaded
+                by `stream_netcdf`.
             mask:
                 Mask shapefile.
             buffer:
@@ -138,6 +180,7 @@ class Raddo(object):
         self.no_time_correction = kwargs.get('no_time_correction', False)
         force = kwargs.get('force', False)
         force_down = kwargs.get('force_down', False)
+        download = kwargs.get('download', True)
         self.yes = kwargs.get('yes', False)
         mask = kwargs.get('mask', None)
         self.buffer = kwargs.get('buffer', self.buffer)
@@ -181,11 +224,12 @@ class Raddo(object):
                 f"[ERROR]: {e}\n\n")
             sys.exit(1)
 
-        self.timestamps = \
-            np.arange(self.start_datetime,
-                      self.end_datetime+datetime.timedelta(days=1),
-                      datetime.timedelta(hours=1)
-                      ).astype(datetime.datetime).tolist()
+        self.timestamps64 = \
+            np.arange(np.datetime64(self.start_datetime, 'h'),
+                      np.datetime64(self.end_datetime
+                                    + datetime.timedelta(days=1), 'h'),
+                      HOUR)
+        self.timestamps = to_datetime(self.timestamps64)
 
         print(pcol.BOLD+pcol.OKBLUE)
         print("-" * 80)
@@ -213,7 +257,7 @@ class Raddo(object):
                     sys.exit(0)
             else:
                 os.makedirs(rad_dir)
-        os.chdir(rad_dir)
+        self.rad_dir = os.path.abspath(rad_dir)
 
         search = not self.local_file_list_exists()
         if force or search:
@@ -227,7 +271,7 @@ class Raddo(object):
             print(str(datetime.datetime.now())[:-4],
                   "   Getting names of local files in directory:")
 
-            for dir_, _, files in os.walk(rad_dir):
+            for dir_, _, files in os.walk(self.rad_dir):
                 print(f"                          ...{dir_[-30:]}          \r",
                       end="")
                 for fileName in files:
@@ -307,95 +351,133 @@ class Raddo(object):
             print(str(datetime.datetime.now())[:-4], "   No files missing.\n")
 
         self.hist_files = False
+        self.missing_files = missing_files
+        self._download_args = (rad_dir_dwd, rad_dir_dwd_hist, errors_allowed)
         # try to download all missing files
-        for f in missing_files:
-            error_count = 0
-            while error_count < errors_allowed + 1:
+        if download:
+            with self.metrics.stage("download"):
+                for f in missing_files:
+                    files_success += self.download_file(
+                        f, *self._download_args)
+
+        self.update_list_of_available_files(files_success)
+
+        return files_success
 
-                try:
+    def download_file(self, f, rad_dir_dwd, rad_dir_dwd_hist,
+                      errors_allowed):
+        """
+        Download daily archive `f` to the RADOLAN directory; if it is not
+        available, the monthly archive of historical data is used instead.
+        Returns the names of the archives obtained.
+        """
+        t0 = time.perf_counter()
+        files_success = []
+        local_f = os.path.join(self.rad_dir, f)
+        error_count = 0
+        while error_count < errors_allowed + 1:
+
+            try:
+                if not self.quiet:
                     print(str(datetime.datetime.now())[:-4],
                           "    [{}] trying {}{}"
                           .format(error_count, rad_dir_dwd[-22:], f))
-                    urlretrieve(rad_dir_dwd+f, f)
-                    size = os.path.getsize(f)
-                    if size == 0:
-                        print('file size of {}==0! Removing'.format(f))
-                        os.remove(f)
-                        continue
+                urlretrieve(rad_dir_dwd+f, local_f)
+                size = os.path.getsize(local_f)
+                if size == 0:
+                    print('file size of {}==0! Removing'.format(f))
+                    os.remove(local_f)
+                    continue
+                if not self.quiet:
                     print(str(datetime.datetime.now())[:-4],
                           "   [SUCCESS] {} downloaded.\n".format(f))
-                    files_success.append(f)
-                    break
+                files_success.append(f)
+                break
 
-                # except URLError as e:
-                #     sys.stderr.write(f"\nERROR: {e}\n")
-                #     sys.stderr.write("Do you have internet connection?\n")
-                #     sys.exit(1)
-
-                except HTTPError as err:
-                    if err.code == 404:
-                        # try historical data
-                        hist_f = f[:9]+".tar"
-                        hist_y = f[3:7]
-                        # hist_m = f[7:9]
-                        try:
+            # except URLError as e:
+            #     sys.stderr.write(f"\nERROR: {e}\n")
+            #     sys.stderr.write("Do you have internet connection?\n")
+            #     sys.exit(1)
+
+            except HTTPError as err:
+                if err.code == 404:
+                    # try historical data
+                    hist_f = f[:9]+".tar"
+                    hist_y = f[3:7]
+                    local_hist_f = os.path.join(self.rad_dir, hist_f)
+                    # hist_m = f[7:9]
+                    try:
+                        print(str(datetime.datetime.now())[:-4],
+                              pcol.WARNING,
+                              "   [ERROR] {}. "
+                              "Now trying historical data."
+                              .format(f, rad_dir_dwd_hist[-20:]+hist_y+"/"+hist_f),
+                              pcol.ENDC)
+                        # the archive may have been sorted into its year
+                        # directory already (see `stream_netcdf`)
+                        sorted_hist_f = os.path.join(self.rad_dir, hist_y,
+                                                     hist_f)
+                        if not os.path.isfile(local_hist_f) and \
+                                not os.path.isfile(sorted_hist_f):
+                            urlretrieve(rad_dir_dwd_hist+hist_y+"/"+hist_f,
+                                        local_hist_f)
+                            size = os.path.getsize(local_hist_f)
+                            if size == 0:
+                                print(
+                                    pcol.WARNING,
+                                    f'file size of {hist_f}==0! Removing.',
+                                    pcol.WARNING)
+                                os.remove(local_hist_f)
+                                continue
                             print(str(datetime.datetime.now())[:-4],
-                                  pcol.WARNING,
-                                  "   [ERROR] {}. "
-                                  "Now trying historical data."
-                                  .format(f, rad_dir_dwd_hist[-20:]+hist_y+"/"+hist_f),
+                                  pcol.OKGREEN,
+                                  f"   [SUCCESS] {hist_f} downloaded.\n",
                                   pcol.ENDC)
-                            if hist_f not in os.listdir():
-                                urlretrieve(rad_dir_dwd_hist+hist_y+"/"+hist_f,
-                                            hist_f)
-                                size = os.path.getsize(hist_f)
-                                if size == 0:
-                                    print(
-                                        pcol.WARNING,
-                                        f'file size of {hist_f}==0! Removing.',
-                                        pcol.WARNING)
-                                    os.remove(hist_f)
-                                    continue
-                                print(str(datetime.datetime.now())[:-4],
-                                      pcol.OKGREEN,
-                                      f"   [SUCCESS] {hist_f} downloaded.\n",
-                                      pcol.ENDC)
-                                files_success.append(hist_f)
-                                self.hist_files = True
-                            else:
-                                print(str(datetime.datetime.now())[:-4],
-                                      pcol.OKGREEN,
-                                      f"   [SUCCESS] {hist_f} has already "
-                                      f"been downloaded.\n",
-                                      pcol.ENDC)
-                                files_success.append(hist_f)
-                                self.hist_files = True
-                            break
-
-                        except Exception as e:
+                            files_success.append(hist_f)
+                            self.hist_files = True
+                        else:
                             print(str(datetime.datetime.now())[:-4],
-                                  pcol.WARNING,
-                                  f"   [ERROR] {e}\n",
+                                  pcol.OKGREEN,
+                                  f"   [SUCCESS] {hist_f} has already "
+                                  f"been downloaded.\n",
                                   pcol.ENDC)
-                            error_count += 1
-
-                if error_count is errors_allowed+1:
-                    print("\n", str(datetime.datetime.now())[:-4],
-                          pcol.FAIL,
-                          "   [ERROR] Exceeded requests ({}) for {}!"
-                          .format(error_count, f),
-                          pcol.ENDC)
-
-        self.update_list_of_available_files(files_success)
-
+                            files_success.append(hist_f)
+                            self.hist_files = True
+                        break
+
+                    except Exception as e:
+                        print(str(datetime.datetime.now())[:-4],
+                              pcol.WARNING,
+                              f"   [ERROR] {e}\n",
+                              pcol.ENDC)
+                        error_count += 1
+
+            if error_count is errors_allowed+1:
+                print("\n", str(datetime.datetime.now())[:-4],
+                      pcol.FAIL,
+                      "   [ERROR] Exceeded requests ({}) for {}!"
+                      .format(error_count, f),
+                      pcol.ENDC)
+
+        self.metrics["download"].observe(
+            time.perf_counter() - t0,
+            sum(os.path.getsize(os.path.join(self.rad_dir, g))
+                for g in files_success
+                if os.path.isfile(os.path.join(self.rad_dir, g))),
+            items=len(files_success))
         return files_success
 
+    @property
+    def file_list(self):
+        "path of the list of local archives in the RADOLAN directory."
+        return os.path.join(self.rad_dir, self.FILELIST)
+
     def local_file_list_exists(self):
-        return os.path.exists(self.FILELIST)
+        return os.path.exists(self.file_list)
 
     def create_file_list_savely(self, available_files):
         if not self.local_file_list_exists():
-            with open(self.FILELIST, 'a') as fl:
+            with open(self.file_list, 'a') as fl:
                 for f in sorted(available_files):
                     fl.write(f+"\n")
             print(str(datetime.datetime.now())[:-4], "   ", end="")
@@ -408,7 +490,7 @@ class Raddo(object):
         if len(new_files) > 0:
             if self.local_file_list_exists():
                 # TODO add function to prune duplicates..
-                with open(self.FILELIST, "a") as fl:
+                with open(self.file_list, "a") as fl:
                     for nf in new_files:
                         fl.write(nf+"\n")
 
@@ -429,7 +511,7 @@ class Raddo(object):
     @property
     def list_of_available_files(self):
         if self.local_file_list_exists():
-            with open(self.FILELIST, 'r') as fl:
+            with open(self.file_list, 'r') as fl:
                 filelist = fl.read().splitlines()
             return filelist
         return []
@@ -444,19 +526,38 @@ class Raddo(object):
             raise
         return directory
 
+    @timed("repack")
+    def repack_archives(self, archives, outdir, codec="zlib", workers=None):
+        """
+        Repack the RADOLAN `archives` into compact per-day binary files in
+        `outdir` (see `raddo.repack`); days already repacked are kept. Sets
+        the catalog of the repacked hours and returns the days within the
+        timestamps.
+        """
+        sys.stdout.write('\n' + str(datetime.datetime.now())[:-4] +
+                         '   Repacking archives...\n')
+        if workers is None:
+            workers = self.WORKERS
+        self.try_create_directory(outdir)
+        archives = sorted(archives)
+        days = []
+        with ThreadPoolExecutor(max_workers=max(1, int(workers))) as pool:
+            for i, res in enumerate(pool.map(
+                    lambda a: repack.repack_archive(a, outdir, codec),
+                    archives)):
+                self._progress(f'[{i+1} / {len(archives)}]  '
+                               f'{os.path.basename(archives[i])}')
+                days += res
+        sys.stdout.write('\n')
+        self.catalog = repack.catalog(days).select(self.timestamps64)
+        return sorted(set(self.catalog.paths))
+
     def get_asc_files(self, directories):
         sys.stdout.write('\n' + str(datetime.datetime.now())[:-4] +
                          '   Getting available *.asc file names...\n\n')
-        dirs = list(set(list(directories)))
-        fl = []
-        for d in dirs:
-            [fl.append(f) for f in sorted(glob.glob(os.path.join(d, "**/*asc"),
-                                                    recursive=True))
-             if self._get_date(os.path.basename(f),
-                               self.no_time_correction)[1]
-             in self.timestamps]
-
-        return fl
+        self.catalog = Catalog.from_directories(directories).select(
+            self.timestamps64)
+        return list(self.catalog.paths)
 
     def _get_date(self, filename, no_time_correction=False):
         f = os.path.basename(filename)
@@ -470,93 +571,22 @@ class Raddo(object):
         return f, datetime.datetime(year, mon, day,
                                     hour, minu, 0)
 
-    def create_netcdf(self, filelist, outdir, outf=None,
-                      no_time_correction=False):
-        assert type(filelist) == list
-        sys.stdout.write('\n' + str(datetime.datetime.now())[:-4] +
-                         '   Creating NetCDF file:\n' + 25*" ")
-        filelist = sorted(filelist)
-
+    def _output_file_name(self, outdir, outf, ext):
+        "default output name in `outdir`; never overwrite existing output."
         if outf is None:
             outf = (f"RADOLAN_{self.start_datetime.strftime('%Y%m%d')}"
-                    f"_{self.end_datetime.strftime('%Y%m%d')}.nc")
+                    f"_{self.end_datetime.strftime('%Y%m%d')}{ext}")
         outf = os.path.join(outdir, outf)
+        base, ext = os.path.splitext(outf)
         fc = 1
         a_outf = outf
-        while True:
-            if not os.path.isfile(a_outf):
-                break
-            else:
-                a_outf = outf[:-3] + f"_{fc}" + outf[-3:]
+        while os.path.exists(a_outf):
+            a_outf = base + f"_{fc}" + ext
             fc += 1
-        outf = a_outf
-        del a_outf
-        sys.stdout.write(f'{pcol.OKBLUE}{outf}{pcol.ENDC}\n')
-        self.netcdf_file_name = outf
-
-
-        # Initialize netCDF
-        ds = gdal.Open(filelist[0])
-        a = ds.ReadAsArray()
-        b = ds.GetGeoTransform()
-        nlat, nlon = np.shape(a)
-        lon = np.arange(nlon) * b[1] + b[0]
-        lat = np.arange(nlat) * b[5] + b[3]
-
-        nco = netCDF4.Dataset(outf, 'w', clobber=True)
-
-        # create dimensions, variables and attributes:
-        nco.createDimension('lon', nlon)
-        nco.createDimension('lat', nlat)
-        nco.createDimension('time', None)
-
-        lono = nco.createVariable('lon', 'f4', ('lon'))
-        lono.units = 'degrees_east'
-        lono.standard_name = 'longitude'
-        lato = nco.createVariable('lat', 'f4', ('lat'))
-        lato.units = 'degrees_north'
-        lato.standard_name = 'latitude'
-
-        basedate = datetime.datetime(2000, 1, 1, 0, 0, 0)
-        timeo = nco.createVariable('time', 'f4', ('time'))
-        timeo.units = 'hours since 2000-01-01 00:00:00'
-        timeo.standard_name = 'time'
-
-        # create container variable for CRS: lon/lat WGS84 datum
-        crso = nco.createVariable('crs', 'i4')
-        crso.long_name = 'Lon/Lat Coords in WGS84'
-        crso.grid_mapping_name = 'latitude_longitude'
-        crso.longitude_of_prime_meridian = 0.0
-        crso.semi_major_axis = 6378137.0
-        crso.inverse_flattening = 298.257223563
-
-        # create short integer variable for temperature data, with chunking
-        chunk_lon = 16
-        chunk_lat = 16
-        chunk_time = 24
-        prco = nco.createVariable('prc', 'f4',  ('time', 'lat', 'lon'),
-                                  zlib=True,
-                                  # chunksizes=[
-                                      # chunk_time, chunk_lat, chunk_lon],
-                                  fill_value=-9999)
-        prco.units = 'mm/h'
-        # prco.scale_factor = 0.1
-        # prco.add_offset = 0.00
-        prco.long_name = \
-            'precipitation data from RADOLAN RW Weather Radar Data (DWD)'
-        prco.standard_name = \
-            'precipitation'
-        prco.grid_mapping = 'crs'
-        prco.set_auto_maskandscale(False)
-
-        nco.Conventions = 'CF-1.6'
-
-        # write lon,lat
-        lono[:] = lon
-        lato[:] = lat
-
-        itime = 0
+        return a_outf
 
+    def _missing_dates(self, filelist, no_time_correction=False):
+        "timestamps without a file in `filelist`."
         try:
             missingdates = []
             assert len(self.timestamps) == len(filelist), "Missing dates!"
@@ -571,42 +601,356 @@ class Raddo(object):
 
             sys.stdout.write('\r' + str(datetime.datetime.now())[:-4] +
                              f'   Getting missing dates..\n')
-            file_dates = [self._get_date(f, no_time_correction)[1] for f in filelist]
-            missingdates = [t for t in self.timestamps if t not in file_dates]
+            missingdates = to_datetime(
+                Catalog.from_paths(filelist).missing(self.timestamps))
             [sys.stdout.write(f"{d}\n") for d in missingdates]
             sys.stdout.write("\n")
+        return missingdates
 
-        i = 0
+    def _hours(self, filelist):
+        "(timestamp, file) for every timestamp; file is None if missing."
+        catalog = Catalog.from_paths(filelist).select(self.timestamps)
+        files = dict(zip(to_datetime(catalog.times), catalog.paths))
         for tdate in self.timestamps:
-            if tdate in missingdates:
+            yield tdate, files.get(tdate)
+
+    def _hours_stream(self, files):
+        """
+        Like `_hours` for `files` arriving in time order (e.g. from a
+        pipeline); files outside the timestamps are skipped.
+        """
+        files = iter(files)
+        nxt = next(files, None)
+        for tdate in self.timestamps:
+            while nxt is not None and self._get_date(nxt)[1] < tdate:
+                nxt = next(files, None)
+            if nxt is not None and self._get_date(nxt)[1] == tdate:
+                yield tdate, nxt
+                nxt = next(files, None)
+            else:
+                yield tdate, None
+        for _ in files:
+            pass
+
+    def _read_hour(self, filename):
+        "read and decode one hourly grid (1/10 mm in RADOLAN data)."
+        from osgeo import gdal
+        prc = gdal.Open(filename)
+        a = prc.ReadAsArray() / 10  # get data
+        a[a < 0] = -9999
+        return a
+
+    def _iter_grids(self, filenames, workers=None, read=None):
+        """
+        Yield (filename, grid) in order of `filenames` (None -> no grid).
+
+        Grids are decoded ahead by a pool of `workers` threads; at most
+        2 * `workers` decoded grids are held in memory at any time.
+        """
+        if workers is None:
+            workers = self.WORKERS
+        workers = max(1, int(workers))
+        if read is None:
+            read = self._read_hour
+
+        def timed_read(filename):
+            with self.metrics.item("read") as info:
+                a = read(filename)
+                info["bytes"] = getattr(a, "nbytes", 0)
+            return a
+
+        prefetch = 2 * workers
+        pending = collections.deque()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for filename in filenames:
+                while len(pending) >= prefetch:
+                    f, future = pending.popleft()
+                    yield f, (future.result() if future else None)
+                pending.append((filename, pool.submit(timed_read, filename)
+                                if filename is not None else None))
+            while pending:
+                f, future = pending.popleft()
+                yield f, (future.result() if future else None)
+
+    def product_key(self, cache, kind, archives, **options):
+        """
+        Cache key of a derived product of type `kind` made from `archives`:
+        hash of the archive checksums, time range, mask geometry, buffer,
+        projection and the product `options`.
+        """
+        mask = None
+        if self.geotiff_mask is not None:
+            mask = [g.wkb_hex for g in self.mask_bounds.geometry]
+        inputs = {
+            "kind": kind,
+            "version": __version__,
+            "archives": sorted((os.path.basename(a), cache.checksum(a))
+                               for a in archives if os.path.isfile(a)),
+            "start": self.start_datetime,
+            "end": self.end_datetime,
+            "mask": mask,
+            "buffer": self.buffer if mask is not None else None,
+            "proj": self.DWD_PROJ,
+            "options": options}
+        cache.save_checksums()
+        return cache.key(inputs)
+
+    def serve_cached(self, cached, outdir, outf, ext):
+        """
+        Provide a copy of cached product `cached` as output file `outf` in
+        `outdir`; an existing identical output is reused.
+        """
+        if outf is None:
+            outf = (f"RADOLAN_{self.start_datetime.strftime('%Y%m%d')}"
+                    f"_{self.end_datetime.strftime('%Y%m%d')}{ext}")
+        target = os.path.join(outdir, outf)
+        if not same_product(target, cached):
+            target = copy_product(cached,
+                                  self._output_file_name(outdir, outf, ext))
+        sys.stdout.write('\n' + str(datetime.datetime.now())[:-4] +
+                         '   Served from cache:\n' + 25*" " +
+                         f'{pcol.OKBLUE}{target}{pcol.ENDC}\n')
+        return target
+
+    @timed("netcdf")
+    @profiled("create_netcdf")
+    def create_netcdf(self, filelist, outdir, outf=None,
+                      no_time_correction=False, workers=None,
+                      aggregate=False, rolling=(), append=False):
+        """
+        Write hourly grids of `filelist` to a single NetCDF file.
+
+        Reading and decoding of the grids is done by a pool of `workers`
+        threads which run ahead of the (single) NetCDF writer. At most
+        2 * `workers` decoded hours are held in memory at any time.
+
+        If `aggregate` is set, daily and monthly sums are computed while
+        the hours are written and stored as additional variables
+        (`prc_daily`, `prc_monthly`). For every window length N in `rolling`
+        the daily maximum of rolling N-hour sums is stored as `prc_max_Nh`.
+
+        `filelist` may also be an iterator of files arriving in time order;
+        hours are then written as soon as their file is available.
+
+        If `append` is set and `outf` exists, hours after the last time step
+        of the file are appended. Aggregates follow the variables of the
+        file; periods already in the file are continued (rolling windows
+        reaching back into the file are not considered).
+        """
+        import netCDF4
+        from osgeo import gdal
+        sys.stdout.write('\n' + str(datetime.datetime.now())[:-4] +
+                         '   Creating NetCDF file:\n' + 25*" ")
+        if isinstance(filelist, list):
+            filelist = sorted(filelist)
+            self._missing_dates(filelist, no_time_correction)
+            hours = self._hours(filelist)
+        else:
+            hours = self._hours_stream(filelist)
+
+        if append and outf is not None and \
+                os.path.isfile(os.path.join(outdir, outf)):
+            outf = os.path.join(outdir, outf)
+        else:
+            append = False
+            outf = self._output_file_name(outdir, outf, ".nc")
+        sys.stdout.write(f'{pcol.OKBLUE}{outf}{pcol.ENDC}\n')
+        self.netcdf_file_name = outf
+
+        basedate = datetime.datetime(2000, 1, 1, 0, 0, 0)
+
+        if append:
+            nco = netCDF4.Dataset(outf, 'a')
+            timeo = nco['time']
+            prco = nco['prc']
+            prco.set_auto_maskandscale(False)
+            nlat, nlon = prco.shape[1:]
+            a = np.zeros((nlat, nlon))
+            itime = len(timeo)
+            # only hours after the last one in the file
+            if itime > 0:
+                t_last = float(timeo[itime - 1])
+                hours = ((t, f) for t, f in hours
+                         if (t - basedate).total_seconds() / 3600. > t_last)
+            # aggregates follow the variables of the file
+            aggregate = 'prc_daily' in nco.variables
+            rolling = [int(v[8:-1]) for v in nco.variables
+                       if re.match(r"prc_max_\d+h$", v)]
+        else:
+            # hours up to the first file, which defines the grid
+            hours = iter(hours)
+            head = []
+            for tdate, filename in hours:
+                head.append((tdate, filename))
+                if filename is not None:
+                    break
+            assert len(head) > 0 and head[-1][1] is not None, \
+                "No files to create the NetCDF file from."
+            hours = itertools.chain(head, hours)
+
+            # Initialize netCDF
+            ds = gdal.Open(head[-1][1])
+            a = ds.ReadAsArray()
+            b = ds.GetGeoTransform()
+            nlat, nlon = np.shape(a)
+            lon = np.arange(nlon) * b[1] + b[0]
+            lat = np.arange(nlat) * b[5] + b[3]
+
+            nco = netCDF4.Dataset(outf, 'w', clobber=True)
+
+            # create dimensions, variables and attributes:
+            nco.createDimension('lon', nlon)
+            nco.createDimension('lat', nlat)
+            nco.createDimension('time', None)
+
+            lono = nco.createVariable('lon', 'f4', ('lon'))
+            lono.units = 'degrees_east'
+            lono.standard_name = 'longitude'
+            lato = nco.createVariable('lat', 'f4', ('lat'))
+            lato.units = 'degrees_north'
+            lato.standard_name = 'latitude'
+
+            timeo = nco.createVariable('time', 'f4', ('time'))
+            timeo.units = 'hours since 2000-01-01 00:00:00'
+            timeo.standard_name = 'time'
+
+            # create container variable for CRS: lon/lat WGS84 datum
+            crso = nco.createVariable('crs', 'i4')
+            crso.long_name = 'Lon/Lat Coords in WGS84'
+            crso.grid_mapping_name = 'latitude_longitude'
+            crso.longitude_of_prime_meridian = 0.0
+            crso.semi_major_axis = 6378137.0
+            crso.inverse_flattening = 298.257223563
+
+            # create short integer variable for temperature data, with chunking
+            chunk_lon = 16
+            chunk_lat = 16
+            chunk_time = 24
+            prco = nco.createVariable('prc', 'f4',  ('time', 'lat', 'lon'),
+                                      zlib=True,
+                                      # chunksizes=[
+                                          # chunk_time, chunk_lat, chunk_lon],
+                                      fill_value=-9999)
+            prco.units = 'mm/h'
+            # prco.scale_factor = 0.1
+            # prco.add_offset = 0.00
+            prco.long_name = \
+                'precipitation data from RADOLAN RW Weather Radar Data (DWD)'
+            prco.standard_name = \
+                'precipitation'
+            prco.grid_mapping = 'crs'
+            prco.set_auto_maskandscale(False)
+
+            nco.Conventions = 'CF-1.6'
+
+            # write lon,lat
+            lono[:] = lon
+            lato[:] = lat
+
+            itime = 0
+
+        # aggregates have their own (daily / monthly) time dimensions
+        agg = None
+        if aggregate or rolling:
+            agg = StreamingAggregator((nlat, nlon), rolling=rolling)
+            aggo = {}
+            aggt = {}
+            if append:
+                for name in ['daily', 'monthly'] + \
+                        [f'max_{n}h' for n in agg.rolling]:
+                    if f'prc_{name}' not in nco.variables:
+                        continue
+                    vo = nco[f'prc_{name}']
+                    vo.set_auto_maskandscale(False)
+                    dim = vo.dimensions[0]
+                    aggt[dim] = nco[dim]
+                    aggo[name] = (vo, aggt[dim], dim)
+            else:
+                for dim in (('day', 'month') if aggregate else ('day',)):
+                    nco.createDimension(dim, None)
+                    to = nco.createVariable(dim, 'f4', (dim))
+                    to.units = 'days since 2000-01-01 00:00:00'
+                    to.long_name = f'start of {dim}'
+                    aggt[dim] = to
+                variables = [(f'max_{n}h', 'day', f'mm/{n}h',
+                              f'daily maximum of rolling {n}-hour sums')
+                             for n in agg.rolling]
+                if aggregate:
+                    variables += [('daily', 'day', 'mm/d', 'daily sums'),
+                                  ('monthly', 'month', 'mm/month',
+                                   'monthly sums')]
+                for name, dim, units, long_name in variables:
+                    vo = nco.createVariable(f'prc_{name}', 'f4',
+                                            (dim, 'lat', 'lon'),
+                                            zlib=True, fill_value=-9999)
+                    vo.units = units
+                    vo.long_name = \
+                        (f'{long_name} of precipitation from RADOLAN RW '
+                         f'Weather Radar Data (DWD)')
+                    vo.grid_mapping = 'crs'
+                    vo.set_auto_maskandscale(False)
+                    aggo[name] = (vo, aggt[dim], dim)
+            # index of each period along its time dimension; periods already
+            # in the file are continued
+            aggi = {dim: {basedate + datetime.timedelta(days=float(d)): i
+                          for i, d in enumerate(to[:])}
+                    for dim, to in aggt.items()}
+            continued = {dim: len(aggi[dim]) for dim in aggi}
+
+        def write_aggregates(res):
+            for name, period, data in res:
+                if name not in aggo:
+                    continue
+                vo, to, dim = aggo[name]
+                i = aggi[dim].setdefault(period, len(aggi[dim]))
+                to[i] = (period - basedate).total_seconds() / 86400.
+                if i < continued[dim]:
+                    old = vo[i, :, :]
+                    data = combine(name, np.where(old == -9999, np.nan, old),
+                                   data)
+                vo[i, :, :] = np.where(np.isnan(data), -9999, data)
+
+        missingdates = []
+
+        # readers decode hours ahead, the writer consumes them in order
+        hours, ahead = itertools.tee(hours)
+        grids = self._iter_grids((f for t, f in ahead), workers)
+        for (tdate, filename), (f, data) in zip(hours, grids):
+            t0 = time.perf_counter()
+            if filename is None:
+                missingdates.append(tdate)
                 dtime = (tdate-basedate).total_seconds()/3600.
                 timeo[itime] = dtime
                 prco[itime, :, :] = a * np.nan
                 itime = itime + 1
+                if agg is not None:
+                    write_aggregates(agg.add(tdate, a * np.nan))
                 continue
-                assert False, "This should not happen!"
-            else:
-                fi, fdate = self._get_date(filelist[i], no_time_correction)
+            fi, fdate = self._get_date(filename, no_time_correction)
 
             if no_time_correction:
                 # sys.sdterr("Cannot assert time correctnes..")
                 pass
             else:
                 assert fdate == tdate
-            sys.stdout.write('\r' + str(datetime.datetime.now())[:-4] +
-                             f'   [{i+1} / {len(self.timestamps)}]  '
-                             f'{os.path.basename(filelist[i])}')
+            self._progress(f'[{itime+1} / {len(self.timestamps)}]  '
+                           f'{os.path.basename(filename)}')
             dtime = (fdate-basedate).total_seconds()/3600.
             timeo[itime] = dtime
-
-            prc = gdal.Open(filelist[i])
-            a = prc.ReadAsArray() / 10  # get data
-            a[a < 0] = -9999
-            prco[itime, :, :] = a  # 1/10 mm in RADOLAN data
+            prco[itime, :, :] = data  # 1/10 mm in RADOLAN data
             itime = itime + 1
-            i += 1
-
-        nco.missing_dates = str(missingdates)
+            if agg is not None:
+                write_aggregates(agg.add(fdate, data))
+            self.metrics["netcdf"].observe(time.perf_counter() - t0,
+                                           data.nbytes)
+        if agg is not None:
+            write_aggregates(agg.flush())
+
+        if append:
+            nco.missing_dates = _join_dates(
+                getattr(nco, 'missing_dates', '[]'), missingdates)
+        else:
+            nco.missing_dates = str(missingdates)
         nco.close()
 
         sys.stdout.write('\n' + str(datetime.datetime.now())[:-4] +
@@ -614,44 +958,516 @@ class Raddo(object):
         sys.stdout.flush()
         return outf
 
+    def stream_netcdf(self, outdir, outf=None, no_time_correction=False,
+                      workers=None, aggregate=False, rolling=(),
+                      tiff_dir=None, queue_size=2):
+        """
+        Download, sort, extract, warp and write the NetCDF file as
+        overlapping stages of a pipeline (see `raddo.pipeline`): day N is
+        written while day N+1 is still downloading. Archives are processed
+        in time order; at most `queue_size` items wait between two stages.
+
+        Needs `radolan_down(download=False)` to be run first. GeoTiffs are
+        kept in `tiff_dir` (default: temporary directory). Per stage
+        throughput and backpressure are reported at the end.
+        """
+        tmpd = None
+        if tiff_dir is None:
+            tmpd = tempfile.TemporaryDirectory()
+            tiff_dir = tmpd.name
+        start = self.start_datetime.strftime("%Y%m%d")
+        end = self.end_datetime.strftime("%Y%m%d")
+
+        def in_range(f):
+            d = f[3:11] if f.endswith(".tar.gz") else f[3:9]
+            return start[:len(d)] <= d <= end[:len(d)]
+
+        missing = set(self.missing_files)
+        archives = sorted((f for f in set(self.list_of_available_files) |
+                           missing if in_range(f)), key=lambda f: f[3:11])
+        seen_archives = set()
+        seen_hours = set()
+        downloaded = []
+        asc_files = []
+
+        def download(f):
+            if f[:9] + ".tar" in seen_archives:
+                # day of a monthly archive already requested (and possibly
+                # sorted away by now)
+                return
+            got = [f]
+            if f in missing:
+                got = self.download_file(f, *self._download_args)
+                downloaded.extend(got)
+            for g in got:
+                if g not in seen_archives:
+                    seen_archives.add(g)
+                    yield os.path.join(self.rad_dir, g)
+
+        def sort(path):
+            with self.metrics.item("sort", os.path.getsize(path)), \
+                    self._profile("sort_tars"):
+                return sort_tars.sort_tars(files=[path], quiet=self.quiet)
+
+        def extract(path):
+            with self.metrics.item("untar", os.path.getsize(path)), \
+                    self._profile("untar"):
+                return untar.untar(files=[path], quiet=self.quiet) or []
+
+        def warp(directory):
+            # monthly archives are extracted with their days: skip hours
+            # already passed on
+            catalog = Catalog.from_directories([directory]).select(
+                self.timestamps64)
+            paths = [p for t, p in catalog if t not in seen_hours]
+            seen_hours.update(catalog.times)
+            asc_files.extend(paths)
+            return self.create_geotiffs(paths, tiff_dir) if paths else []
+
+        pipeline = Pipeline([Stage("download", download),
+                             Stage("sort", sort),
+                             Stage("extract", extract),
+                             Stage("geotiff", warp)],
+                            queue_size=queue_size)
+        try:
+            outf = self.create_netcdf(pipeline.run(archives), outdir, outf,
+                                      no_time_correction, workers=workers,
+                                      aggregate=aggregate, rolling=rolling)
+        finally:
+            if tmpd is not None:
+                tmpd.cleanup()
+        pipeline.write_report()
+        self.update_list_of_available_files(downloaded)
+        self.catalog = Catalog.from_paths(asc_files)
+        return outf
+
+    @timed("zarr")
+    @profiled("create_zarr")
+    def create_zarr(self, filelist, outdir, outf=None,
+                    no_time_correction=False, workers=None, append=False):
+        """
+        Write hourly grids of `filelist` to a Zarr store.
+
+        Variables, attributes and CRS are the same as in the NetCDF file of
+        `create_netcdf`. Time is chunked by day and every day is decoded and
+        written by one of `workers` threads, so days are written
+        concurrently. If `append` is set and `outf` exists, the store is
+        extended along time with hours after its last time step.
+        The store can be opened lazily with `xarray.open_zarr`.
+        """
+        from osgeo import gdal
+        import zarr
+
+        assert type(filelist) == list
+        if workers is None:
+            workers = self.WORKERS
+        workers = max(1, int(workers))
+        sys.stdout.write('\n' + str(datetime.datetime.now())[:-4] +
+                         '   Creating Zarr store:\n' + 25*" ")
+        filelist = sorted(filelist)
+
+        if append and outf is not None and \
+                os.path.isdir(os.path.join(outdir, outf)):
+            outf = os.path.join(outdir, outf)
+        else:
+            append = False
+            outf = self._output_file_name(outdir, outf, ".zarr")
+        sys.stdout.write(f'{pcol.OKBLUE}{outf}{pcol.ENDC}\n')
+        self.zarr_store_name = outf
+
+        ds = gdal.Open(filelist[0])
+        b = ds.GetGeoTransform()
+        nlat, nlon = ds.RasterYSize, ds.RasterXSize
+        lon = np.arange(nlon) * b[1] + b[0]
+        lat = np.arange(nlat) * b[5] + b[3]
+        del ds
+
+        basedate = datetime.datetime(2000, 1, 1, 0, 0, 0)
+        chunk_time = 24
+
+        def hour_value(tdate, filename):
+            if filename is not None:
+                fi, fdate = self._get_date(filename, no_time_correction)
+                if not no_time_correction:
+                    assert fdate == tdate
+                tdate = fdate
+            return (tdate-basedate).total_seconds()/3600.
+
+        missingdates = self._missing_dates(filelist, no_time_correction)
+        hours = list(self._hours(filelist))
+
+        if append:
+            root = zarr.open_group(outf, mode='a')
+            timeo = root['time']
+            prco = root['prc']
+            assert tuple(prco.shape[1:]) == (nlat, nlon), \
+                f"Grid of {outf} does not match the input files!"
+            if timeo.shape[0] > 0:
+                t_last = timeo[-1]
+                hours = [h for h in hours if hour_value(*h) > t_last]
+            missingdates = [t for t, f in hours if f is None]
+        else:
+            root = zarr.open_group(outf, mode='w')
+
+            lono = root.create_dataset('lon', shape=(nlon,), dtype='f4')
+            lono.attrs.update({'_ARRAY_DIMENSIONS': ['lon'],
+                               'units': 'degrees_east',
+                               'standard_name': 'longitude'})
+            lono[:] = lon
+            lato = root.create_dataset('lat', shape=(nlat,), dtype='f4')
+            lato.attrs.update({'_ARRAY_DIMENSIONS': ['lat'],
+                               'units': 'degrees_north',
+                               'standard_name': 'latitude'})
+            lato[:] = lat
+
+            timeo = root.create_dataset('time', shape=(0,),
+                                        chunks=(chunk_time * 365,),
+                                        dtype='f4')
+            timeo.attrs.update({'_ARRAY_DIMENSIONS': ['time'],
+                                'units': 'hours since 2000-01-01 00:00:00',
+                                'standard_name': 'time'})
+
+            # container variable for CRS: lon/lat WGS84 datum
+            crso = root.create_dataset('crs', shape=(), dtype='i4')
+            crso.attrs.update({
+                '_ARRAY_DIMENSIONS': [],
+                'long_name': 'Lon/Lat Coords in WGS84',
+                'grid_mapping_name': 'latitude_longitude',
+                'longitude_of_prime_meridian': 0.0,
+                'semi_major_axis': 6378137.0,
+                'inverse_flattening': 298.257223563})
+
+            prco = root.create_dataset('prc', shape=(0, nlat, nlon),
+                                       chunks=(chunk_time, nlat, nlon),
+                                       dtype='f4', fill_value=-9999)
+            prco.attrs.update({
+                '_ARRAY_DIMENSIONS': ['time', 'lat', 'lon'],
+                'units': 'mm/h',
+                'long_name': ('precipitation data from RADOLAN RW Weather '
+                              'Radar Data (DWD)'),
+                'standard_name': 'precipitation',
+                'grid_mapping': 'crs'})
+
+            root.attrs['Conventions'] = 'CF-1.6'
+            root.attrs['missing_dates'] = []
+
+        t0 = prco.shape[0]
+        n = t0 + len(hours)
+        timeo.resize((n,))
+        prco.resize((n, nlat, nlon))
+        if len(hours) > 0:
+            timeo[t0:n] = np.array([hour_value(*h) for h in hours],
+                                   dtype='f4')
+
+        # blocks aligned to the time chunks: no chunk is shared by workers
+        edges = [t0] + list(range(chunk_time * (t0 // chunk_time + 1),
+                                  n, chunk_time)) + [n]
+        blocks = [(i0, i1) for i0, i1 in zip(edges[:-1], edges[1:])
+                  if i1 > i0]
+
+        def write_block(block):
+            i0, i1 = block
+            data = np.full((i1-i0, nlat, nlon), np.nan, dtype='f4')
+            for k, (tdate, filename) in enumerate(hours[i0-t0:i1-t0]):
+                if filename is not None:
+                    data[k] = self._read_hour(filename)
+            prco[i0:i1] = data
+            return i1 - i0
+
+        written = 0
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for nh in pool.map(write_block, blocks):
+                written += nh
+                self._progress(f'[{written} / {len(hours)}]  '
+                               f'hours written')
+
+        root.attrs['missing_dates'] = \
+            list(root.attrs.get('missing_dates', [])) + \
+            [str(d) for d in missingdates]
+        zarr.consolidate_metadata(outf)
+
+        sys.stdout.write('\n' + str(datetime.datetime.now())[:-4] +
+                         '   done.\n')
+        sys.stdout.flush()
+        return outf
+
+    @timed("cube")
+    def create_cube(self, filelist, outdir, outf=None, workers=None,
+                    append=False):
+        """
+        Write the hourly RADOLAN grids (*.asc) of `filelist` to a
+        memory-mapped cube store (see `raddo.cube`).
+
+        The grids are decoded directly from the ASCII files (no GDAL) by
+        `workers` threads and appended in time order. If `append` is set and
+        `outf` exists, only hours after the last hour of the store are
+        added. Missing hours are stored as invalid values.
+        """
+        from raddo.cube import CubeStore, is_cube
+
+        assert type(filelist) == list
+        sys.stdout.write('\n' + str(datetime.datetime.now())[:-4] +
+                         '   Creating cube store:\n' + 25*" ")
+        catalog = Catalog.from_paths(filelist).select(self.timestamps64)
+
+        if append and outf is not None and \
+                is_cube(os.path.join(outdir, outf)):
+            store = CubeStore(os.path.join(outdir, outf))
+            if len(store) > 0 and len(catalog) > 0:
+                catalog = catalog.range(store.times[-1] + HOUR,
+                                        catalog.times[-1])
+        else:
+            assert len(catalog) > 0, "No RADOLAN grids for the cube store!"
+            outf = self._output_file_name(outdir, outf, ".cube")
+            with open(catalog.paths[0], 'rb') as fp:
+                header, _ = asc.read_header(fp)
+            store = CubeStore.create(
+                outf, asc.geotransform(header),
+                (int(header["nrows"]), int(header["ncols"])), self.DWD_PROJ)
+        sys.stdout.write(f'{pcol.OKBLUE}{store.path}{pcol.ENDC}\n')
+        self.cube_store_name = store.path
+
+        def read(filename):
+            with open(filename, 'rb') as fp:
+                return asc.read_grid(fp)[1]
+
+        def grids():
+            for k, (f, a) in enumerate(self._iter_grids(
+                    list(catalog.paths), workers, read)):
+                self._progress(f'[{k + 1} / {len(catalog)}]  '
+                               f'hours written')
+                yield a
+
+        store.append(catalog.times, grids())
+
+        sys.stdout.write('\n' + str(datetime.datetime.now())[:-4] +
+                         '   done.\n')
+        sys.stdout.flush()
+        return store.path
+
+    @timed("zonal")
+    def create_zonal_stats(self, filelist, maskfile, outdir, outf=None,
+                           id_field=None, no_time_correction=False,
+                           workers=None):
+        """
+        Write hourly mean, sum and maximum of precipitation per feature of
+        `maskfile` as long table (CSV) from the RADOLAN grids in `filelist`.
+
+        Cell weights of the features are computed once on the native
+        RADOLAN grid; `id_field` names the attribute identifying the
+        features (default: feature index).
+        """
+        from osgeo import gdal
+        assert type(filelist) == list
+        sys.stdout.write('\n' + str(datetime.datetime.now())[:-4] +
+                         '   Creating zonal statistics:\n' + 25*" ")
+        filelist = sorted(filelist)
+        if outf is None:
+            outf = (f"RADOLAN_{self.start_datetime.strftime('%Y%m%d')}"
+                    f"_{self.end_datetime.strftime('%Y%m%d')}_zonal.csv")
+        outf = self._output_file_name(outdir, outf, ".csv")
+        sys.stdout.write(f'{pcol.OKBLUE}{outf}{pcol.ENDC}\n')
+
+        ds = gdal.Open(filelist[0])
+        zs = ZonalStats.from_file(maskfile, self.DWD_PROJ,
+                                  ds.GetGeoTransform(),
+                                  (ds.RasterYSize, ds.RasterXSize),
+                                  id_field=id_field)
+        del ds
+        sys.stdout.write(str(datetime.datetime.now())[:-4] +
+                         f'   {len(zs.ids)} feature(s), '
+                         f'{zs.weights.nnz} weighted cells.\n')
+
+        with open(outf, 'w', newline='') as fo:
+            writer = csv.writer(fo)
+            writer.writerow(["time", "id", "mean", "sum", "max"])
+            for i, (f, a) in enumerate(self._iter_grids(filelist, workers)):
+                self._progress(f'[{i+1} / {len(filelist)}]  '
+                               f'{os.path.basename(f)}')
+                fi, fdate = self._get_date(f, no_time_correction)
+                for row in zip(zs.ids, *zs.compute(a)):
+                    writer.writerow([fdate.isoformat(), row[0]] +
+                                    [_csv_value(v) for v in row[1:]])
+
+        self.zonal_file_name = outf
+        sys.stdout.write('\n' + str(datetime.datetime.now())[:-4] +
+                         '   done.\n')
+        sys.stdout.flush()
+        return outf
+
+    def _repacked_hours(self, filelist):
+        """
+        (name, source) of the hourly grids in `filelist`; repacked days are
+        expanded to their hours within the timestamps.
+        """
+        timestamps = set(self.timestamps)
+        res = []
+        for f in filelist:
+            if repack.is_repacked(f):
+                res += [(name, f) for name in repack.read_meta(f)["names"]
+                        if self._get_date(name)[1] in timestamps]
+            else:
+                res.append((os.path.basename(f), f))
+        return res
+
+    @timed("warp")
+    @profiled("create_geotiffs")
     def create_geotiffs(self, filelist, outdir):
+        """
+        Warp the hourly grids of `filelist` (*.asc files or repacked days)
+        to GeoTiffs (EPSG:4326) in `outdir`; existing GeoTiffs are kept.
+        With a mask (`read_mask`), only the RADOLAN cells below the mask are
+        decoded and warped; GeoTiffs are cropped to the mask window and
+        masked with the mask rasterized once (`mask_window`).
+        """
+        from osgeo import gdal
         assert type(filelist) == list
         sys.stdout.write('\n' + str(datetime.datetime.now())[:-4] +
                          '   Creating geotiffs..\n')
 
+        hours = self._repacked_hours(filelist)
+        day = None
         res = []
-        for i, f in enumerate(filelist):
-            outf = os.path.join(
-                outdir,
-                os.path.splitext(os.path.basename(f))[0] + ".tiff")
+        for i, (name, f) in enumerate(hours):
+            outf = os.path.join(outdir, os.path.splitext(name)[0] + ".tiff")
 
             if not os.path.isfile(outf):
-                sys.stdout.write('\r' + str(datetime.datetime.now())[:-4] +
-                                 f'   [{i+1} / {len(filelist)}]  '
-                                 f'Creating {os.path.basename(f)}')
-                if self.geotiff_mask is not None:
-                    gdal.Warp(outf, f,
-                              dstSRS="EPSG:4326",
-                              srcSRS=self.DWD_PROJ,
-                              cutlineDSName=self.geotiff_mask,
-                              cropToCutline=True,
-                              format='GTiff')
+                self._progress(f'[{i+1} / {len(hours)}]  '
+                               f'Creating {name}')
+                t0 = time.perf_counter()
+                nbytes = os.path.getsize(f)
+                if repack.is_repacked(f):
+                    if day != f:
+                        day = f
+                        header, names, grids = repack.read_day(f)
+                    raw = grids[names.index(name)]
+                    nbytes = raw.nbytes
+                    if self.geotiff_mask is not None:
+                        rows, cols = self.mask_window(header)[:2]
+                        self._warp_masked(outf, raw[rows, cols], header)
+                    else:
+                        gdal.Warp(outf, self._mem_dataset(raw, header),
+                                  dstSRS="EPSG:4326",
+                                  srcSRS=self.DWD_PROJ,
+                                  format='GTiff')
+                elif self.geotiff_mask is not None:
+                    # only the rows / columns below the mask are parsed
+                    with open(f, 'rb') as fp:
+                        header, line = asc.read_header(fp)
+                        rows, cols = self.mask_window(header)[:2]
+                        fp.seek(0)
+                        header, raw = asc.read_raw(
+                            fp, range(rows.start, rows.stop), cols)
+                    self._warp_masked(outf, repack.encode(raw, header),
+                                      header)
                 else:
                     gdal.Warp(outf, f,
                               dstSRS="EPSG:4326",
                               srcSRS=self.DWD_PROJ,
                               format='GTiff')
+                self.metrics["warp"].observe(time.perf_counter() - t0,
+                                             nbytes)
             else:
-                sys.stdout.write('\r' + str(datetime.datetime.now())[:-4] +
-                                 f'   [{i+1} / {len(filelist)}]  '
-                                 f'{os.path.basename(f)} already exists.')
+                self._progress(f'[{i+1} / {len(hours)}]  '
+                               f'{name} already exists.')
             res.append(outf)
         sys.stdout.write('\n' + str(datetime.datetime.now())[:-4] +
                          '   done.\n')
         sys.stdout.flush()
         return res
 
+    def _mem_dataset(self, raw, header, rows=slice(0, None),
+                     cols=slice(0, None)):
+        """
+        In-memory GDAL dataset of the raw int16 values `raw`: window `rows`,
+        `cols` of the grid described by the ASCII grid `header`.
+        """
+        from osgeo import gdal
+        gt = asc.geotransform(header)
+        ds = gdal.GetDriverByName("MEM").Create(
+            "", raw.shape[1], raw.shape[0], 1, gdal.GDT_Int16)
+        ds.SetGeoTransform((gt[0] + cols.start * gt[1], gt[1], 0.,
+                            gt[3] + rows.start * gt[5], 0., gt[5]))
+        ds.GetRasterBand(1).SetNoDataValue(repack.NODATA)
+        ds.GetRasterBand(1).WriteArray(raw)
+        return ds
+
+    def mask_window(self, header):
+        """
+        Windows of the buffered mask for the RADOLAN grid described by the
+        ASCII grid `header`, computed once per grid: rows and columns
+        (slices) of the RADOLAN grid below the mask, geotransform of the
+        cropped GeoTiff grid (EPSG:4326) and boolean array of its cells
+        inside the mask.
+        """
+        from osgeo import gdal
+        index = self.grid_index(header)
+        if index.key not in self._mask_windows:
+            ny, nx = index.shape
+            # grid of the unmasked GeoTiffs
+            src = gdal.GetDriverByName("MEM").Create("", nx, ny, 1,
+                                                     gdal.GDT_Byte)
+            src.SetGeoTransform(index.geotransform)
+            vrt = gdal.Warp('', src, dstSRS="EPSG:4326",
+                            srcSRS=self.DWD_PROJ, format='VRT')
+            gt = vrt.GetGeoTransform()
+            shape = (vrt.RasterYSize, vrt.RasterXSize)
+            del vrt, src
+
+            inside = zonal.rasterize(list(self.mask_bounds.geometry), gt,
+                                     shape)
+            r, c = np.nonzero(inside)
+            assert len(r) > 0, "Mask does not cover any RADOLAN cell!"
+            r0, r1, c0, c1 = r.min(), r.max() + 1, c.min(), c.max() + 1
+            dst_gt = (gt[0] + c0 * gt[1], gt[1], 0.,
+                      gt[3] + r0 * gt[5], 0., gt[5])
+
+            # RADOLAN cells below the outline of the cropped grid
+            t = np.linspace(0, 1, 50)
+            zero, one = np.zeros_like(t), np.ones_like(t)
+            lons = dst_gt[0] + (c1 - c0) * gt[1] * \
+                np.concatenate([t, t, zero, one])
+            lats = dst_gt[3] + (r1 - r0) * gt[5] * \
+                np.concatenate([zero, one, t, t])
+            col, row = index.fractional(*index.project(lons, lats))
+            margin = 2
+            rows = slice(max(0, int(np.floor(row.min())) - margin),
+                         min(ny, int(np.ceil(row.max())) + margin))
+            cols = slice(max(0, int(np.floor(col.min())) - margin),
+                         min(nx, int(np.ceil(col.max())) + margin))
+            self._mask_windows[index.key] = \
+                (rows, cols, dst_gt, inside[r0:r1, c0:c1])
+        return self._mask_windows[index.key]
+
+    def _warp_masked(self, outf, raw, header):
+        """
+        Warp the raw int16 values `raw` of the RADOLAN window of
+        `mask_window` to a GeoTiff of the cropped grid; cells outside the
+        buffered mask are set to NODATA.
+        """
+        from osgeo import gdal
+        rows, cols, gt, inside = self.mask_window(header)
+        height, width = inside.shape
+        src = self._mem_dataset(raw, header, rows, cols)
+        dst = gdal.Warp('', src, dstSRS="EPSG:4326", srcSRS=self.DWD_PROJ,
+                        outputBounds=(gt[0], gt[3] + height * gt[5],
+                                      gt[0] + width * gt[1], gt[3]),
+                        width=width, height=height,
+                        dstNodata=repack.NODATA, format='MEM')
+        a = dst.ReadAsArray()
+        a[~inside] = repack.NODATA
+
+        out = gdal.GetDriverByName("GTiff").Create(outf, width, height, 1,
+                                                   gdal.GDT_Int16)
+        out.SetGeoTransform(gt)
+        out.SetProjection(dst.GetProjection())
+        out.GetRasterBand(1).SetNoDataValue(repack.NODATA)
+        out.GetRasterBand(1).WriteArray(a)
+        out.FlushCache()
+        del out, dst, src
+
     def create_point_from_netcdf(self):
+        import xarray as xr
         sys.stdout.write('\n' + str(datetime.datetime.now())[:-4] +
                          '   Creating CSV file:\n' + 25*" ")
         csv_outf = os.path.splitext(self.netcdf_file_name)[0] + \
@@ -663,8 +1479,157 @@ class Raddo(object):
         da.to_series().to_csv(csv_outf)
         sys.stdout.write(f'{pcol.OKBLUE}{csv_outf}{pcol.ENDC}\n')
 
+    def grid_index(self, header):
+        """
+        `GridIndex` of the native RADOLAN grid described by the ASCII grid
+        `header`; one index is kept per grid definition.
+        """
+        index = GridIndex.from_header(header, self.DWD_PROJ)
+        return self._grid_indices.setdefault(index.key, index)
+
+    @timed("points")
+    @profiled("extract_points")
+    def extract_points(self, sources, lons, lats, method="nearest",
+                       no_time_correction=False, workers=None):
+        """
+        Precipitation time series at `lons`, `lats` read directly from the
+        native RADOLAN grids in `sources` (*.asc files, archives or
+        repacked days).
+
+        The points are projected to `DWD_PROJ` once; of every hourly grid
+        only the window of rows and columns touching the points is parsed.
+        Returns the sorted times and an array of values (times x points).
+        """
+        sources = sorted(sources)
+        repacked = [s for s in sources if repack.is_repacked(s)]
+        if len(repacked) > 0:
+            header = repack.read_meta(repacked[0])["header"]
+        else:
+            for name, fp in asc.iter_sources(sources):
+                header, line = asc.read_header(fp)
+                break
+            else:
+                return [], np.empty((0, len(lons)))
+        index = self.grid_index(header)
+        x, y = index.project(lons, lats)
+        sampler = points.PointSampler(x, y, index.geotransform, index.shape,
+                                      method=method)
+        timestamps = set(self.timestamps)
+
+        def read_source(source):
+            res = []
+            if repack.is_repacked(source):
+                for name, header, rows in repack.iter_grids(
+                        source, lambda n: self._get_date(n)[1] in timestamps,
+                        sampler.rows, sampler.cols):
+                    fi, fdate = self._get_date(name, no_time_correction)
+                    res.append((fdate, sampler.sample_rows(rows)))
+                return res
+            for name, fp in asc.iter_sources([source]):
+                if self._get_date(name)[1] not in timestamps:
+                    continue
+                fi, fdate = self._get_date(name, no_time_correction)
+                header, rows = asc.read_rows(fp, sampler.rows, sampler.cols)
+                res.append((fdate, sampler.sample_rows(rows)))
+            return res
+
+        if workers is None:
+            workers = self.WORKERS
+        values = {}
+        with ThreadPoolExecutor(max_workers=max(1, int(workers))) as pool:
+            for i, res in enumerate(pool.map(read_source, sources)):
+                self._progress(f'[{i+1} / {len(sources)}]  '
+                               f'{os.path.basename(sources[i])}')
+                values.update(res)
+        sys.stdout.write('\n')
+        times = sorted(values)
+        return times, np.array([values[t] for t in times]).reshape(
+            len(times), len(lons))
+
+    def create_point_from_archives(self, sources, outdir, outf=None,
+                                   no_time_correction=False, workers=None,
+                                   append=False):
+        """
+        Write the precipitation time series of the point set with
+        `read_coords` as CSV, read directly from the RADOLAN grids in
+        `sources` (*.asc files or archives). If `append` is set and `outf`
+        exists, hours after its last row are appended.
+        """
+        sys.stdout.write('\n' + str(datetime.datetime.now())[:-4] +
+                         '   Creating CSV file:\n' + 25*" ")
+        if outf is None:
+            outf = (f"RADOLAN_{self.start_datetime.strftime('%Y%m%d')}"
+                    f"_{self.end_datetime.strftime('%Y%m%d')}" +
+                    f"_{self.lon}__{self.lat}".replace(".", "_") + ".csv")
+        outf, last = self._csv_output(outdir, outf, append)
+        sys.stdout.write(f'{pcol.OKBLUE}{outf}{pcol.ENDC}\n')
+
+        times, values = self.extract_points(
+            sources, [self.lon], [self.lat],
+            no_time_correction=no_time_correction, workers=workers)
+        with open(outf, 'a' if last else 'w', newline='') as fo:
+            writer = csv.writer(fo)
+            if not last:
+                writer.writerow(["time", "precipitation"])
+            for t, v in zip(times, values[:, 0]):
+                if last and t <= last:
+                    continue
+                writer.writerow([t, _csv_value(v)])
+        return outf
+
+    def create_points_from_archives(self, sources, pointfile, outdir,
+                                    outf=None, method="nearest",
+                                    no_time_correction=False, workers=None,
+                                    append=False):
+        """
+        Write precipitation time series of all points in `pointfile`
+        (CSV or GeoJSON) as long table (CSV), read directly from the native
+        RADOLAN grids in `sources` (*.asc files, archives or repacked days)
+        without GeoTiff or NetCDF intermediates. `method` is either
+        "nearest" (cell containing the point) or "bilinear" (interpolation
+        between the four nearest cell centers). If `append` is set and
+        `outf` exists, hours after its last row are appended.
+        """
+        sys.stdout.write('\n' + str(datetime.datetime.now())[:-4] +
+                         '   Creating point time series:\n' + 25*" ")
+        if outf is None:
+            outf = (f"RADOLAN_{self.start_datetime.strftime('%Y%m%d')}"
+                    f"_{self.end_datetime.strftime('%Y%m%d')}_points.csv")
+        outf, last = self._csv_output(outdir, outf, append)
+        sys.stdout.write(f'{pcol.OKBLUE}{outf}{pcol.ENDC}\n')
+
+        ids, lons, lats = points.read_points(pointfile)
+        times, values = self.extract_points(
+            sources, lons, lats, method=method,
+            no_time_correction=no_time_correction, workers=workers)
+        with open(outf, 'a' if last else 'w', newline='') as fo:
+            writer = csv.writer(fo)
+            if not last:
+                writer.writerow(["time", "id", "lon", "lat",
+                                 "precipitation"])
+            for t, vals in zip(times, values):
+                if last and t <= last:
+                    continue
+                for row in zip(ids, lons, lats, vals):
+                    writer.writerow([t.isoformat(), *row[:3],
+                                     _csv_value(row[3])])
+        self.points_file_name = outf
+        return outf
+
+    def _csv_output(self, outdir, outf, append):
+        """
+        Output CSV file and time of its last row if rows should be appended
+        to it (`append` set and `outf` has rows), otherwise a new file name
+        and None.
+        """
+        if append and os.path.isfile(os.path.join(outdir, outf)):
+            last = _last_csv_time(os.path.join(outdir, outf))
+            if last is not None:
+                return os.path.join(outdir, outf), last
+        return self._output_file_name(outdir, outf, ".csv"), None
 
     def read_mask(self, maskfile):
+        import geopandas as gpd
         mf = gpd.read_file(maskfile)
         mf = mf.to_crs({'init': 'epsg:32632'})
         gtypes = list(set(mf.geometry.geom_type))
@@ -675,18 +1640,12 @@ class Raddo(object):
         # if mf.geom_type == 'Polygon' and len(mf) > 1:
         #     mf = mf.centroids()
 
-        with tempfile.NamedTemporaryFile(suffix=".shp") as tmpf:
-            self.geotiff_mask = tmpf.name
-
-            # self.mask_bounds = gpd.GeoDataFrame(
-            #     crs=mf.crs,
-            #     geometry=mf.unary_union.buffer(self.buffer))
-
         # unary_union?
         if gtypes == "Polygon":
             mf['diss'] = 1
             mf = mf.dissolve(by="diss")
-        if gtypes == "Point" and len(mf) == 1 and self.buffer < 1400:
+        if gtypes == "Point" and len(mf) == 1 and self.buffer < 1400 \
+                and not self.yes:
             if user_check("This buffer might not cath any RADOLAN cells. "
                           "Do you want to increase the size to 1400m?"):
                 self.buffer = 1400
@@ -695,7 +1654,9 @@ class Raddo(object):
         self.mask_bounds = buff.to_crs({'init': 'epsg:4326'})
 
         mf = mf.to_crs({'init': 'epsg:4326'})
-        self.mask_bounds.to_file(self.geotiff_mask)
+        # rasterized on the grid of the GeoTiffs by `mask_window`
+        self.geotiff_mask = maskfile
+        self._mask_windows = {}
 
         self.mask_total_bounds = mf.total_bounds
         self.mask_gdf = mf
@@ -717,6 +1678,34 @@ class Raddo(object):
             sys.stderr.write("\"-p 12.2,48.5\"  [lon,lat].\n")
             sys.exit()
 
+
+def _join_dates(dates_str, dates):
+    "string of list `dates_str` extended by `dates`."
+    if len(dates) == 0:
+        return dates_str
+    if dates_str.strip() in ("", "[]"):
+        return str(dates)
+    return dates_str.rstrip()[:-1] + ", " + str(dates)[1:]
+
+
+def _last_csv_time(csvfile):
+    "time (first column) of the last row of `csvfile`; None if no rows."
+    with open(csvfile, 'rb') as fp:
+        fp.seek(0, os.SEEK_END)
+        fp.seek(max(0, fp.tell() - 4096))
+        lines = [line for line in fp.read().decode().splitlines()
+                 if line.strip()]
+    try:
+        return parse(lines[-1].split(",")[0])
+    except (IndexError, ValueError):
+        return None
+
+
+def _csv_value(v):
+    "CSV representation of a precipitation value; empty if missing."
+    return "" if np.isnan(v) else f"{v:.3f}"
+
+
 def user_check(question):
     sys.stdout.write(question+" ")
     do = input("[y/N] ")
@@ -808,6 +1797,114 @@ def main():
                         action='store', dest='outfile',
                         help=(f'Name of the output NetCDF file.'))
 
+    parser.add_argument('-A', '--aggregate',
+                        required=False,
+                        default=False,
+                        action='store_true', dest='aggregate',
+                        help=(f'Add daily and monthly sums to the NetCDF '
+                              f'file.'))
+
+    parser.add_argument('-R', '--rolling',
+                        required=False,
+                        default="",
+                        action='store', dest='rolling',
+                        help=(f'Comma separated window lengths in hours '
+                              f'(e.g. "3,6") of rolling sums whose daily '
+                              f'maximum is added to the NetCDF file.'))
+
+    parser.add_argument('-k', '--zonal',
+                        required=False,
+                        default=False,
+                        action='store', dest='zonal',
+                        help=(f'Shapefile with features (e.g. catchments) to '
+                              f'compute hourly zonal statistics for (CSV).'))
+
+    parser.add_argument('-i', '--zonal-id',
+                        required=False,
+                        default=None,
+                        action='store', dest='zonal_id',
+                        help=(f'Attribute identifying the features of the '
+                              f'zonal statistics shapefile.'))
+
+    parser.add_argument('-z', '--zarr',
+                        required=False,
+                        default=False,
+                        action='store_true', dest='zarr',
+                        help=(f'Create a Zarr store from GeoTiffs?'))
+
+    parser.add_argument('-Z', '--zarr-store',
+                        required=False,
+                        default=None,
+                        action='store', dest='zarrfile',
+                        help=(f'Name of the output Zarr store.'))
+
+    parser.add_argument('-U', '--repack',
+                        required=False,
+                        default=None,
+                        action='store', dest='repack',
+                        help=(f'Repack the archives into compact per-day '
+                              f'binary files (*.rwp) compressed with REPACK '
+                              f'(zlib or zstd) and create GeoTiffs, NetCDF '
+                              f'/ Zarr and point time series from them '
+                              f'instead of *.asc files.'))
+
+    parser.add_argument('-K', '--cube',
+                        required=False,
+                        default=None,
+                        action='store', dest='cube',
+                        help=(f'Memory-mapped cube store (*.cube) to write '
+                              f'the hourly grids to; new hours are appended '
+                              f'if it exists.'))
+
+    parser.add_argument('-a', '--append',
+                        required=False,
+                        default=False,
+                        action='store_true', dest='append',
+                        help=(f'Append new hours to the existing Zarr store '
+                              f'given with -Z.'))
+
+    parser.add_argument('-S', '--stream',
+                        required=False,
+                        default=False,
+                        action='store_true', dest='stream',
+                        help=(f'Create the NetCDF file in a pipeline: '
+                              f'download, extraction, GeoTiff and NetCDF '
+                              f'creation of consecutive days overlap.'))
+
+    parser.add_argument('-W', '--watch',
+                        required=False,
+                        default=None,
+                        action='store', dest='watch',
+                        help=(f'Keep running and poll for newly published '
+                              f'days every WATCH seconds. New hours are '
+                              f'appended to the NetCDF file (-n, -N) and '
+                              f'point time series (-p, -P).'))
+
+    parser.add_argument('-Q', '--serve',
+                        required=False,
+                        default=None,
+                        action='store', dest='serve',
+                        help=(f'Run a local HTTP query service on port SERVE '
+                              f'answering point, bbox and polygon time '
+                              f'series queries from the local data.'))
+
+    parser.add_argument('-j', '--jobs',
+                        required=False,
+                        default=None,
+                        action='store', dest='jobs',
+                        help=(f'Build the NetCDF file month by month with '
+                              f'JOBS parallel worker processes as monthly '
+                              f'parts with a JSON index (see '
+                              f'raddo.parallel.open_parts).'))
+
+    parser.add_argument('-X', '--scheduler',
+                        required=False,
+                        default=None,
+                        action='store', dest='scheduler',
+                        help=(f'Run the monthly builds (-j) on a dask '
+                              f'distributed cluster: "local" or the address '
+                              f'of a scheduler (e.g. tcp://host:8786).'))
+
     parser.add_argument('-m', '--mask',
                         required=False,
                         default=False,
@@ -821,6 +1918,20 @@ def main():
                         help=(f'Extract precipitation for specific '
                               f'point coordinates.'))
 
+    parser.add_argument('-P', '--points',
+                        required=False,
+                        default=False,
+                        action='store', dest='points',
+                        help=(f'Extract precipitation for all points in a '
+                              f'CSV (lon,lat[,id]) or GeoJSON file.'))
+
+    parser.add_argument('-I', '--interpolation',
+                        required=False,
+                        default="nearest",
+                        choices=points.METHODS,
+                        action='store', dest='interpolation',
+                        help=(f'Point sampling method (Default: nearest).'))
+
     parser.add_argument('-b', '--buffer',
                         required=False,
                         default=1400,
@@ -828,11 +1939,53 @@ def main():
                         help=(f'Buffer in meter around mask shapefile'
                               ' (Default 1400m).'))
 
-    # parser.add_argument('-q', '--quiet',
-    #                     required=False,
-    #                     default=False,
-    #                     action='store_true', dest='quiet',
-    #                     help=(f'Be quiet.'))
+    parser.add_argument('-q', '--quiet',
+                        required=False,
+                        default=False,
+                        action='store_true', dest='quiet',
+                        help=(f'Be quiet: no per file progress output.'))
+
+    parser.add_argument('-M', '--metrics',
+                        required=False,
+                        default=None,
+                        action='store', dest='metrics',
+                        help=(f'Write per stage timings and throughput to '
+                              f'this JSON (or *.csv) file at the end of '
+                              f'the run.'))
+
+    parser.add_argument('-O', '--profile',
+                        required=False,
+                        default=None,
+                        action='store', dest='profile',
+                        help=(f'Profile the stages (download, sorting, '
+                              f'extraction, GeoTiff and NetCDF creation) '
+                              f'with cProfile and tracemalloc; pstats files '
+                              f'and a summary are written to this '
+                              f'directory.'))
+
+    parser.add_argument('-c', '--cache-dir',
+                        required=False,
+                        default=None,
+                        action='store', dest='cache_dir',
+                        help=(f'Directory of a cache for derived products '
+                              f'(NetCDF). Identical requests are served from '
+                              f'the cache.'))
+
+    parser.add_argument('-G', '--cache-size',
+                        required=False,
+                        default=10,
+                        action='store', dest='cache_size',
+                        help=(f'Size budget of the cache in GB; least '
+                              f'recently used products are removed first.'
+                              f'\nDefault: 10'))
+
+    parser.add_argument('-L', '--lifecycle',
+                        required=False,
+                        default=False,
+                        action='store_true', dest='lifecycle',
+                        help=(f'Remove extracted *.asc files once their '
+                              f'hours are in the NetCDF / Zarr output. '
+                              f'They are extracted again when needed.'))
 
     parser.add_argument('-F', '--force',
                         required=False,
@@ -882,6 +2035,13 @@ def main():
                               f'netCDF file creation and just use RADOLANs '
                               f'sum up time HH:50 (Default: false).'))
 
+    parser.add_argument('-w', '--workers',
+                        required=False,
+                        default=rd.WORKERS,
+                        action='store', dest='workers',
+                        help=(f'Number of parallel readers decoding hourly '
+                              f'grids for the NetCDF file.'
+                              f'\nDefault: {rd.WORKERS}'))
 
     args = parser.parse_args()
     if args.complete:
@@ -890,20 +2050,41 @@ def main():
         args.extract = True
         args.sort = True
 
-    if (args.geotiff or args.netcdf or args.point):
-        args.extract = True
+    if args.stream:
+        args.netcdf = True
+    if (args.geotiff or args.netcdf or args.zarr or args.zonal or
+            args.cube):
+        # repacked days replace the *.asc files, except for zonal / cube
+        args.extract = (args.extract or not args.repack or
+                        bool(args.zonal or args.cube))
+        args.sort = True
+    if args.repack:
         args.sort = True
+    # points are read directly from the archives
+    if (args.point or args.points):
+        args.sort = True
+
+    if args.point and args.mask:
+        sys.stderr.write("Only specify mask or point coordinates!")
+        sys.exit()
 
     # print version
     if args.version:
         sys.stdout.write(f"raddo {__version__}\n")
         sys.exit()
 
-    # if not args.quiet:
-    sys.stdout.write(
-        pcol.HEADER + 59*'=' + '\n' +
-        parser.description + "\n" +
-        59*"=" + pcol.ENDC + "\n\n")
+    rd.quiet = args.quiet
+    if args.metrics:
+        atexit.register(rd.metrics.write, os.path.abspath(args.metrics))
+    if args.profile:
+        rd.profiler = Profiler(args.profile)
+        atexit.register(rd.profiler.write)
+
+    if not args.quiet:
+        sys.stdout.write(
+            pcol.HEADER + 59*'=' + '\n' +
+            parser.description + "\n" +
+            59*"=" + pcol.ENDC + "\n\n")
 
     # if no -d flag:
     if args.directory == os.getcwd():
@@ -917,15 +2098,62 @@ def main():
                 sys.exit()
     args.directory = os.path.abspath(args.directory)
 
+    if args.serve:
+        service.serve(args.directory, port=int(args.serve))
+        sys.exit()
+
     if args.start == rd.START_DATE:
         if not args.yes:
             if not user_check(f"Do you really want to download RADOLAN data from "
                               f"{rd.START_DATE} on?"):
                 sys.stderr.write(f"User Interruption.\n")
                 sys.exit()
+    try:
+        rolling = [int(n) for n in args.rolling.split(",") if n.strip()]
+        assert all(n > 0 for n in rolling)
+    except (ValueError, AssertionError):
+        sys.stderr.write(f"{pcol.WARNING}Rolling windows need to be "
+                         f"specified like so: \"-R 3,6\"  [hours].\n")
+        sys.exit(2)
+
     assert args.errors < 21, \
         "Error value too high. Please be respectful with the data provider."
 
+    if args.jobs or args.scheduler:
+        start = parse(args.start)
+        end = args.end if isinstance(args.end, datetime.datetime) \
+            else parse(args.end)
+        outf, downloaded = build_netcdf(
+            args.directory, start, end, args.directory,
+            outf=args.outfile,
+            jobs=int(args.jobs) if args.jobs else None,
+            scheduler=args.scheduler,
+            no_time_correction=args.tcorr,
+            aggregate=args.aggregate,
+            rolling=rolling,
+            mask=args.mask or None,
+            buffer=float(args.buffersize))
+        rd.rad_dir = args.directory
+        rd.update_list_of_available_files(downloaded)
+        sys.exit()
+
+    if args.watch:
+        watcher = Watcher(rd, args.directory,
+                          interval=float(args.watch),
+                          start_date=args.start,
+                          netcdf=((args.outfile or "RADOLAN.nc")
+                                  if args.netcdf else None),
+                          aggregate=args.aggregate,
+                          rolling=rolling,
+                          point=args.point or None,
+                          points=args.points or None,
+                          interpolation=args.interpolation,
+                          mask=args.mask or None,
+                          no_time_correction=args.tcorr,
+                          workers=int(args.workers))
+        watcher.run()
+        sys.exit()
+
     successfull_down = rd.radolan_down(rad_dir_dwd=args.url,
                                        rad_dir=args.directory,
                                        errors_allowed=int(args.errors),
@@ -935,72 +2163,180 @@ def main():
                                        force=args.force,
                                        force_down=args.force_down,
                                        yes=args.yes,
-                                       buffer=args.buffersize)
-    if len(successfull_down) > 0:
+                                       buffer=args.buffersize,
+                                       download=not args.stream)
+    lifecycle = None
+    if args.lifecycle:
+        lifecycle = LifecyclePolicy(args.directory)
+
+    if args.stream:
+        if args.mask:
+            rd.read_mask(args.mask)
+        tiff_dir = None
+        if args.geotiff:
+            tiff_dir = rd.try_create_directory(
+                os.path.join(os.path.abspath(args.directory), "tiff"))
+        rd.stream_netcdf(args.directory,
+                         args.outfile,
+                         args.tcorr,
+                         workers=int(args.workers),
+                         aggregate=args.aggregate,
+                         rolling=rolling,
+                         tiff_dir=tiff_dir)
+        if lifecycle is not None:
+            lifecycle.record_output(rd.netcdf_file_name, rd.catalog.times)
+            lifecycle.run()
+
+    elif len(successfull_down) > 0:
         new_paths = []
         untarred_dirs = []
         if args.sort:
-            new_paths = sort_tars.sort_tars(files=successfull_down)
-        if args.extract:
-            untarred_dirs = untar.untar(files=new_paths, hist=rd.hist_files)
-
-        if (args.geotiff or args.netcdf or args.point):
-            if len(untarred_dirs) > 0:
-                asc_files = rd.get_asc_files(untarred_dirs)
+            with rd.metrics.stage("sort") as m, rd._profile("sort_tars"):
+                new_paths = sort_tars.sort_tars(
+                    files=[os.path.join(args.directory, f)
+                           for f in successfull_down],
+                    quiet=args.quiet)
+                m.observe(nbytes=sum(os.path.getsize(f) for f in new_paths),
+                          items=len(new_paths))
+        # serve NetCDF file from cache if it was created from the same inputs;
+        # nothing is extracted if no other product needs the grids
+        netcdf_key = None
+        netcdf_cached = False
+        if args.cache_dir and args.netcdf:
+            cache = ProductCache(args.cache_dir,
+                                 int(float(args.cache_size) * 1024**3))
+            if args.mask:
+                rd.read_mask(args.mask)
+            netcdf_key = rd.product_key(cache, "netcdf", new_paths,
+                                        no_time_correction=args.tcorr,
+                                        aggregate=args.aggregate,
+                                        rolling=rolling)
+            cached = cache.get(netcdf_key)
+            if cached is not None:
+                rd.netcdf_file_name = rd.serve_cached(
+                    cached, args.directory, args.outfile, ".nc")
+                netcdf_cached = True
+
+        grids_needed = not netcdf_cached or \
+            args.geotiff or args.zarr or args.zonal or args.cube
+        if args.extract and grids_needed:
+            with rd.metrics.stage("untar") as m, rd._profile("untar"):
+                untarred_dirs = untar.untar(files=new_paths,
+                                            hist=rd.hist_files,
+                                            quiet=args.quiet)
+                m.observe(nbytes=sum(os.path.getsize(f) for f in new_paths),
+                          items=len(untarred_dirs or []))
+        repacked = []
+        if args.repack:
+            with rd._profile("repack"):
+                repacked = rd.repack_archives(
+                    new_paths, os.path.join(args.directory, "repack"),
+                    codec=args.repack, workers=int(args.workers))
+
+        # point time series directly from the archives
+        if args.point and not args.netcdf:
+            rd.read_coords(args.point)
+            rd.create_point_from_archives(repacked or new_paths,
+                                          args.directory,
+                                          no_time_correction=args.tcorr,
+                                          workers=int(args.workers))
+        if args.points:
+            rd.create_points_from_archives(repacked or new_paths,
+                                           args.points,
+                                           args.directory,
+                                           method=args.interpolation,
+                                           no_time_correction=args.tcorr,
+                                           workers=int(args.workers))
+
+        if (args.geotiff or args.netcdf or args.zarr or args.zonal or
+                args.cube):
+            if len(untarred_dirs) > 0 or len(repacked) > 0:
+                if len(untarred_dirs) > 0:
+                    asc_files = rd.get_asc_files(untarred_dirs)
+                # hourly grids for GeoTiffs: repacked days if available
+                grid_files = repacked or asc_files
 
                 if args.mask:
                     rd.read_mask(args.mask)
-                if args.point:
-                    try:
-                        assert args.mask is False, \
-                            "Only specify mask or point coordinates!"
-                    except AssertionError as e:
-                        sys.stderr.write(f"{e}")
-                        sys.exit()
-                    rd.read_coords(args.point)
+            if args.point:
+                rd.read_coords(args.point)
+
+            # zonal statistics directly from the RADOLAN grids
+            if args.zonal:
+                rd.create_zonal_stats(asc_files,
+                                      args.zonal,
+                                      args.directory,
+                                      id_field=args.zonal_id,
+                                      no_time_correction=args.tcorr,
+                                      workers=int(args.workers))
+
+            # cube store directly from the RADOLAN grids
+            if args.cube:
+                rd.create_cube(asc_files,
+                               args.directory,
+                               args.cube,
+                               workers=int(args.workers),
+                               append=True)
+                if lifecycle is not None:
+                    lifecycle.record_output(rd.cube_store_name,
+                                            rd.catalog.times)
 
             # create tiff directory
             if args.geotiff:
                 tiff_dir = rd.try_create_directory(
                     os.path.join(os.path.abspath(args.directory), "tiff"))
                 if not args.yes:
-                    if len(asc_files) > 7 * 24:
+                    n_hours = len(rd._repacked_hours(grid_files))
+                    if n_hours > 7 * 24:
                         if not user_check("Do you really want to create "
-                                          f"{len(asc_files)} geotiffs?\n[These"
+                                          f"{n_hours} geotiffs?\n[These"
                                           " files are only created if not "
                                           "already available.]"):
                             sys.exit("\nExiting.")
                 # create geotiffs
-                gtiff_files = rd.create_geotiffs(asc_files, tiff_dir)
+                gtiff_files = rd.create_geotiffs(grid_files, tiff_dir)
 
             # create temporary directory if geotiffs are not wanted:
-            else:
+            elif ((args.netcdf and not netcdf_cached) or args.zarr):
                 args.yes = True
                 # TODO change to current dir (avoid /tmp overflow?)
                 tmpd = tempfile.TemporaryDirectory()
                 tiff_dir = tmpd.name
                 # create temporary geotiffs
-                gtiff_files = rd.create_geotiffs(asc_files, tiff_dir)
+                gtiff_files = rd.create_geotiffs(grid_files, tiff_dir)
             # create netcdf file
-            if args.netcdf:
+            if args.netcdf and not netcdf_cached:
                 rd.create_netcdf(gtiff_files,
                                  args.directory,
                                  args.outfile,
-                                 args.tcorr)
-            if args.point:
-                if not args.netcdf:
-                    if args.outfile is None:
-                        netcdf_outf = tempfile.NamedTemporaryFile(
-                            prefix="RADOLAN_TEMP_").name
-                    else:
-                        netcdf_outf = args.outfile
-                    rd.create_netcdf(gtiff_files,
-                                     args.directory,
-                                     netcdf_outf,
-                                     args.tcorr)
+                                 args.tcorr,
+                                 workers=int(args.workers),
+                                 aggregate=args.aggregate,
+                                 rolling=rolling)
+                if netcdf_key is not None:
+                    cache.put(netcdf_key, rd.netcdf_file_name)
+                if lifecycle is not None:
+                    lifecycle.record_output(rd.netcdf_file_name,
+                                            rd.catalog.times)
+            # create zarr store
+            if args.zarr:
+                rd.create_zarr(gtiff_files,
+                               args.directory,
+                               args.zarrfile,
+                               args.tcorr,
+                               workers=int(args.workers),
+                               append=args.append)
+                if lifecycle is not None:
+                    lifecycle.record_output(rd.zarr_store_name,
+                                            rd.catalog.times)
+            # point from the NetCDF file, as it is created anyways
+            if args.point and args.netcdf:
                 rd.create_point_from_netcdf()
+            # prune only after all products read the extracted grids
+            if lifecycle is not None:
+                lifecycle.run()
 
-        else:
+        elif not (args.point or args.points):
             print("Cannot create GeoTiffs - no newly extracted *.asc files.")
 
         try:
@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    compact per-day binary repacking of RADOLAN RW ASCII grids.
+
+    All hours of a day are stored in one file RW-YYYYMMDD.rwp: a magic
+    number, the length of a JSON header (grid header, hourly file names,
+    codec, CRC32 checksum of the data) and the raw values (1/10 mm, -1
+    where invalid) as compressed int16 array (hours x rows x columns).
+    Reading a day is a decompression and a reshape instead of parsing 24
+    ASCII grids. Data is compressed with zlib (deflate) or with zstd if
+    the `zstandard` package is installed (extra `repack`).
+"""
+
+import itertools
+import json
+import os
+import re
+import struct
+import tarfile
+import zlib
+
+import numpy as np
+
+from raddo import asc
+from raddo.catalog import Catalog, parse_times
+
+
+__author__ = "Thomas Ramsauer"
+__copyright__ = "Thomas Ramsauer"
+__license__ = "gpl3"
+
+
+MAGIC = b"RADDORWP"
+VERSION = 1
+EXT = ".rwp"
+CODECS = ["zlib", "zstd"]
+NODATA = -1
+DTYPE = np.dtype("<i2")
+
+
+def is_repacked(path):
+    return re.match(r"RW-\d{8}\.rwp$", os.path.basename(path)) is not None
+
+
+def _compress(data, codec, level):
+    if codec == "zstd":
+        import zstandard
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    assert codec == "zlib", f"Unknown codec {codec} (use one of {CODECS})."
+    return zlib.compress(data, level)
+
+
+def _decompress(data, codec):
+    if codec == "zstd":
+        import zstandard
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+def encode(a, header):
+    "int16 raw values (-1 where invalid) of the raw ASCII grid values `a`."
+    nodata = header.get("nodata_value", -1)
+    invalid = (a == nodata) | (a < 0) | ~np.isfinite(a)
+    raw = np.clip(np.rint(np.where(invalid, 0, a)), 0,
+                  np.iinfo(DTYPE).max).astype(DTYPE)
+    raw[invalid] = NODATA
+    return raw
+
+
+def write_day(path, names, header, grids, codec="zlib", level=6):
+    """
+    Write the raw grids (hours x rows x columns) of the *.asc files `names`
+    with ASCII grid `header` to `path`.
+    """
+    data = np.ascontiguousarray(grids, dtype=DTYPE).tobytes()
+    meta = {"version": VERSION, "codec": codec, "names": list(names),
+            "shape": [len(names), int(header["nrows"]),
+                      int(header["ncols"])],
+            "header": dict(header, nodata_value=NODATA),
+            "crc32": zlib.crc32(data)}
+    meta = json.dumps(meta).encode()
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as fp:
+        fp.write(MAGIC + struct.pack("<I", len(meta)) + meta)
+        fp.write(_compress(data, codec, level))
+    os.replace(tmp, path)
+    return path
+
+
+def _read_meta(fp, path):
+    if fp.read(len(MAGIC)) != MAGIC:
+        raise ValueError(f"{path} is no repacked RADOLAN file.")
+    n, = struct.unpack("<I", fp.read(4))
+    return json.loads(fp.read(n).decode())
+
+
+def read_meta(path):
+    "JSON header of the repacked day `path` (grid header, names, ...)."
+    with open(path, 'rb') as fp:
+        return _read_meta(fp, path)
+
+
+def read_day(path, verify=True):
+    """
+    Header, hourly file names and raw int16 grids (hours x rows x columns)
+    of the repacked day `path`. Raises ValueError if the data does not
+    match its checksum.
+    """
+    with open(path, 'rb') as fp:
+        meta = _read_meta(fp, path)
+        data = _decompress(fp.read(), meta["codec"])
+    if verify and zlib.crc32(data) != meta["crc32"]:
+        raise ValueError(f"Checksum mismatch in {path}.")
+    grids = np.frombuffer(data, dtype=DTYPE).reshape(meta["shape"])
+    return meta["header"], meta["names"], grids
+
+
+def iter_grids(path, match=None, rows=None, cols=None):
+    """
+    Yield (name, header, values) of the hours of the repacked day `path`,
+    decoded like `asc.read_grid`. If `match` is given, only hours whose
+    file name `match` returns True for are decoded; with `rows` / `cols`,
+    only this window (like `asc.read_rows`).
+    """
+    header, names, grids = read_day(path)
+    for name, raw in zip(names, grids):
+        if match is not None and not match(name):
+            continue
+        if rows is not None:
+            raw = raw[rows]
+        if cols is not None:
+            raw = raw[:, cols]
+        yield name, header, asc.decode(raw.astype(float), header)
+
+
+def catalog(paths):
+    "`Catalog` of the hours in the repacked days `paths` (paths: day files)."
+    days, times = [], []
+    for path in paths:
+        names = read_meta(path)["names"]
+        days += [path] * len(names)
+        times.append(parse_times(names))
+    return Catalog(days, np.concatenate(times) if times else [])
+
+
+def repack_archive(path, outdir, codec="zlib", level=6, overwrite=False):
+    """
+    Repack the daily / monthly RADOLAN archive `path` into one file per day
+    in `outdir`. Existing days are kept unless `overwrite` is set. Returns
+    the paths of the days of the archive.
+    """
+    def outfile(day):
+        return os.path.join(outdir, f"RW-{day}{EXT}")
+
+    name = os.path.basename(path)
+    if name.endswith(".tar.gz"):
+        days = [name[3:11]]
+    else:
+        with tarfile.open(path, 'r:') as tar:
+            days = sorted(os.path.basename(n)[3:11] for n in tar.getnames()
+                          if n.endswith(".tar.gz"))
+    todo = {d for d in days if overwrite or not os.path.isfile(outfile(d))}
+
+    if len(todo) > 0:
+        grids = asc.iter_archive(path, lambda n: n[3:11] in todo)
+        for day, hours in itertools.groupby(grids, key=lambda g: g[0][3:11]):
+            names, raws = [], []
+            for name, fp in hours:
+                header, a = asc.read_raw(fp)
+                names.append(name)
+                raws.append(encode(a, header))
+            order = np.argsort(names)
+            write_day(outfile(day), [names[i] for i in order], header,
+                      np.stack(raws)[order], codec, level)
+    return [outfile(d) for d in days if os.path.isfile(outfile(d))]
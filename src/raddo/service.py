@@ -0,0 +1,386 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    local HTTP query service for precipitation time series.
+
+    Point, bounding box and polygon time series are answered directly from
+    the local cube stores (see `raddo.cube`), RADOLAN archives and
+    extracted *.asc files (native grid, see `raddo.dataset`); hours in a
+    cube store are read from its memory map. NetCDF / Zarr outputs are not
+    used as sources (they are on a warped grid). Recently used hourly grids and the cell lookups of
+    query geometries are kept in bounded in-memory LRU caches, so repeated
+    queries over recent weeks are served without reading any file. Cache
+    hit rates are reported at /stats.
+
+    Endpoints (GET, JSON responses):
+
+        /series?point=lon,lat[&method=bilinear]
+        /series?bbox=minx,miny,maxx,maxy[&stat=mean|sum|max]
+        /series?polygon=x1,y1,x2,y2,...[&stat=mean|sum|max]
+            optional: start, end (ISO hours; default: last 7 days of data),
+            crs ("EPSG:4326" (default) or "grid": RADOLAN projection, m)
+        /stats
+
+    Series are limited to `max_hours` hours (default: one year) and read in
+    day-sized chunks, so memory use does not depend on the requested range.
+"""
+
+import collections
+import datetime
+import glob
+import json
+import os
+import socketserver
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from raddo import dataset
+from raddo import points
+from raddo.catalog import HOUR, to_datetime64
+from raddo.cube import CubeStore, decode, is_cube
+from raddo.grid import GridIndex, DWD_PROJ
+
+
+__author__ = "Thomas Ramsauer"
+__copyright__ = "Thomas Ramsauer"
+__license__ = "gpl3"
+
+
+# one native RADOLAN grid (float32) takes 3.2 MB
+MAX_GRIDS = 168
+MAX_LOOKUPS = 1024
+MAX_HOURS = 366 * 24
+CHUNK_HOURS = 24
+KINDS = ["point", "bbox", "polygon"]
+STATS = ["mean", "sum", "max"]
+CRS = ["EPSG:4326", "grid"]
+
+
+class LRU(object):
+
+    def __init__(self, maxsize):
+        "bounded mapping; the least recently used entries are evicted."
+        self.maxsize = max(1, int(maxsize))
+        self.hits = 0
+        self.misses = 0
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"size": len(self), "maxsize": self.maxsize,
+                "hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / total if total else None}
+
+
+def find_cubes(paths):
+    "cube stores in `paths` (cube stores or directories, recursively)."
+    if isinstance(paths, str):
+        paths = [paths]
+    cubes = []
+    for p in paths:
+        if is_cube(p):
+            cubes.append(p)
+        elif os.path.isdir(p):
+            cubes += [c for c in glob.glob(os.path.join(p, "**", "*.cube"),
+                                           recursive=True) if is_cube(c)]
+    return sorted(set(os.path.abspath(c) for c in cubes))
+
+
+class QueryEngine(object):
+
+    def __init__(self, paths, max_grids=MAX_GRIDS, max_lookups=MAX_LOOKUPS,
+                 max_hours=MAX_HOURS, refresh_interval=300):
+        """
+        paths: string or list of strings
+            RADOLAN directory, *.asc files, archives and / or cube stores.
+        max_grids: integer
+            number of hourly grids kept in memory.
+        max_lookups: integer
+            number of query geometries whose cells are kept in memory.
+        max_hours: integer
+            maximum number of hours of one series query.
+        refresh_interval: number
+            seconds after which the sources are searched again (newly
+            downloaded / extracted data).
+        """
+        self.paths = paths
+        self.refresh_interval = refresh_interval
+        self.grids = LRU(max_grids)
+        self.lookups = LRU(max_lookups)
+        self.max_hours = int(max_hours)
+        self.queries = 0
+        self.index = None
+        self.cubes = []
+        self._scanned = None
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        "search the sources (again)."
+        catalog, daily, monthly = dataset.find_sources(self.paths)
+        cubes = [c for c in map(CubeStore, find_cubes(self.paths))
+                 if len(c) > 0]
+        firsts = [c.times[0] for c in cubes]
+        lasts = [c.times[-1] for c in cubes]
+        if len(catalog) > 0 or daily or monthly:
+            first, last = dataset._coverage(catalog, daily, monthly)
+            firsts.append(first)
+            lasts.append(last)
+        assert len(firsts) > 0, "No RADOLAN data found."
+        if self.index is None:
+            if len(cubes) > 0:
+                self.index = GridIndex(cubes[0].geotransform, cubes[0].shape,
+                                       cubes[0].proj)
+            else:
+                times = catalog.times[:1] if len(catalog) else firsts[:1]
+                source = dataset._source_hours(catalog, daily, monthly,
+                                               to_datetime64(times))[0]
+                header = dataset._read_header(source)
+                self.index = GridIndex.from_header(header, DWD_PROJ)
+        # only cubes on the grid of the other sources
+        self.cubes = [c for c in cubes if GridIndex(
+            c.geotransform, c.shape, c.proj) == self.index]
+        self._sources = catalog, daily, monthly
+        self.first, self.last = min(firsts), max(lasts)
+        self._scanned = time.time()
+
+    def _check_sources(self):
+        with self._lock:
+            if self._scanned is None or \
+                    time.time() - self._scanned > self.refresh_interval:
+                self.refresh()
+
+    def _grid_xy(self, coords, crs):
+        x, y = np.asarray(coords, dtype=float).reshape(-1, 2).T
+        if crs == "EPSG:4326":
+            x, y = self.index.project(x, y)
+        return x, y
+
+    def _cells(self, kind, coords, crs, method):
+        "flat cell indices and weights of a query geometry."
+        index = self.index
+        if kind == "point":
+            x, y = self._grid_xy(coords, crs)
+            idx, w = points.grid_weights(x, y, index.geotransform,
+                                         index.shape, method)
+            return idx[0], w[0]
+        if kind == "bbox":
+            minx, miny, maxx, maxy = coords
+            if crs == "EPSG:4326":
+                cx, cy = index.lonlat()
+            else:
+                rows, cols = np.indices(index.shape)
+                cx, cy = index.centers(rows, cols)
+            inside = (cx >= minx) & (cx <= maxx) & \
+                (cy >= miny) & (cy <= maxy)
+            idx = np.flatnonzero(inside)
+            return idx, np.ones(len(idx))
+        from shapely.geometry import Polygon
+        from raddo.zonal import cell_weights
+        x, y = self._grid_xy(coords, crs)
+        weights = cell_weights([Polygon(zip(x, y))], index.geotransform,
+                               index.shape)
+        return weights.indices, weights.data
+
+    def cells(self, kind, coords, crs="EPSG:4326", method="nearest"):
+        "cells of a query geometry (cached)."
+        assert kind in KINDS, f"kind needs to be one of {KINDS}"
+        assert crs in CRS, f"crs needs to be one of {CRS}"
+        key = (kind, tuple(float(c) for c in coords), crs, method)
+        cells = self.lookups.get(key)
+        if cells is None:
+            cells = self._cells(kind, coords, crs, method)
+            self.lookups.put(key, cells)
+        return cells
+
+    def read_grids(self, times):
+        """
+        Hourly grids (NaN where invalid) of `times`; None for hours without
+        source. Grids not in the cache are read from a cube store if one
+        has the hour, otherwise with one pass over every source, and
+        cached. All missing grids are held in memory at once, so
+        pass day-sized chunks of `times` (see `series`).
+        """
+        res = [self.grids.get(t) for t in times]
+        missing = [t for t, g in zip(times, res) if g is None]
+        if len(missing) == 0:
+            return res
+        new = {}
+        for t in missing:
+            for cube in self.cubes:
+                i = cube.index(t)
+                if i >= 0:
+                    new[t] = decode(cube.data[i])
+                    break
+        missing = [t for t in missing if t not in new]
+        if len(missing) > 0:
+            sources = dataset._source_hours(*self._sources,
+                                            to_datetime64(missing))
+            block = dataset._read_block(missing, sources, self.index.shape)
+            new.update((t, a) for t, a, s in zip(missing, block, sources)
+                       if s is not None)
+        for t, a in new.items():
+            self.grids.put(t, a)
+        return [new.get(t) if g is None else g for t, g in zip(times, res)]
+
+    def series(self, kind, coords, start=None, end=None, crs="EPSG:4326",
+               method="nearest", stat="mean"):
+        """
+        Times (datetime64) and values of the precipitation time series of a
+        point, bbox or polygon from `start` to `end` (default: the last 7
+        days of data). Areas are reduced with `stat` (coverage weighted
+        mean / sum or maximum of the cells). NaN for hours without data.
+        """
+        assert stat in STATS, f"stat needs to be one of {STATS}"
+        self._check_sources()
+        with self._lock:
+            self.queries += 1
+        end = self.last if end is None else to_datetime64(end)[0]
+        start = end - 7 * 24 * HOUR + HOUR if start is None \
+            else to_datetime64(start)[0]
+        times = np.arange(start, end + HOUR, HOUR)
+        if len(times) > self.max_hours:
+            raise ValueError(f"Requested {len(times)} hours; at most "
+                             f"{self.max_hours} hours per query.")
+        idx, w = self.cells(kind, coords, crs, method)
+
+        values = np.full(len(times), np.nan)
+        if len(idx) == 0:
+            return times, values
+        for i, a in self._iter_grids(times):
+            if a is None:
+                continue
+            v = a.ravel()[idx]
+            valid = np.isfinite(v) & (w > 0)
+            if not valid.any():
+                continue
+            if stat == "max":
+                values[i] = v[valid].max()
+            elif stat == "sum":
+                values[i] = (v[valid] * w[valid]).sum()
+            else:
+                values[i] = (v[valid] * w[valid]).sum() / w[valid].sum()
+        return times, values
+
+    def _iter_grids(self, times):
+        "(index, grid) of `times`, read in day-sized chunks."
+        for i0 in range(0, len(times), CHUNK_HOURS):
+            chunk = list(times[i0:i0 + CHUNK_HOURS])
+            for i, a in enumerate(self.read_grids(chunk), i0):
+                yield i, a
+
+    def stats(self):
+        "cache sizes and hit rates."
+        return {"queries": self.queries, "grids": self.grids.stats(),
+                "lookups": self.lookups.stats()}
+
+
+def _floats(text):
+    return [float(v) for v in text.split(",")]
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+
+    def _send(self, status, obj):
+        body = json.dumps(obj).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        engine = self.server.engine
+        url = urlparse(self.path)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        if url.path == "/stats":
+            self._send(200, engine.stats())
+            return
+        if url.path != "/series":
+            self._send(404, {"error": f"Unknown endpoint {url.path}."})
+            return
+        try:
+            kinds = [k for k in KINDS if k in query]
+            if len(kinds) != 1:
+                raise ValueError(f"Specify exactly one of {KINDS}.")
+            times, values = engine.series(
+                kinds[0], _floats(query[kinds[0]]),
+                start=query.get("start"), end=query.get("end"),
+                crs=query.get("crs", "EPSG:4326"),
+                method=query.get("method", "nearest"),
+                stat=query.get("stat", "mean"))
+        except (ValueError, AssertionError) as e:
+            self._send(400, {"error": str(e)})
+            return
+        except FileNotFoundError as e:
+            # sources removed since the last search
+            self._send(404, {"error": f"Data not found: {e}"})
+            return
+        except Exception as e:
+            self.log_error("Query %s failed: %r", self.path, e)
+            self._send(500, {"error": f"Reading data failed: {e}"})
+            return
+        self._send(200, {
+            "times": [str(t) for t in times],
+            "values": [None if np.isnan(v) else round(float(v), 2)
+                       for v in values],
+            "units": "mm/h"})
+
+    def log_message(self, format, *args):
+        sys.stdout.write(str(datetime.datetime.now())[:-4] + '   ' +
+                         (format % args) + '\n')
+
+
+class QueryServer(socketserver.ThreadingMixIn, HTTPServer):
+
+    daemon_threads = True
+
+    def __init__(self, engine, host="127.0.0.1", port=8765):
+        "HTTP server answering queries with `engine` (port 0: any port)."
+        self.engine = engine
+        HTTPServer.__init__(self, (host, int(port)), QueryHandler)
+
+
+def serve(paths, host="127.0.0.1", port=8765, **kwargs):
+    "run the query service on the RADOLAN data in `paths` until stopped."
+    engine = QueryEngine(paths, **kwargs)
+    engine.refresh()
+    server = QueryServer(engine, host, port)
+    sys.stdout.write('\n' + str(datetime.datetime.now())[:-4] +
+                     f'   Serving queries on http://{host}:'
+                     f'{server.server_address[1]}/series (data from '
+                     f'{engine.first} to {engine.last}).\n')
+    sys.stdout.flush()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        sys.stdout.write('\n' + str(datetime.datetime.now())[:-4] +
+                         '   Query service stopped. Cache: ' +
+                         json.dumps(engine.stats()) + '\n')
+    finally:
+        server.server_close()
@@ -7,6 +7,7 @@
 
 import glob
 import os
+import shutil
 import sys
 import argparse
 
@@ -24,40 +25,43 @@ def sort_tars(**kwargs):
 
     path = kwargs.get('path', None)
     files = kwargs.get('files', None)
+    quiet = kwargs.get('quiet', False)
     assert (path is not None) or (files is not None), \
         "Please either specify a path or filelist to untar."
 
     if path:
-        os.chdir(path)
         sys.stdout.write("\n"+str(datetime.now())[:-4] +
-                         "   getting filenames in {path}..\n")
-        fileSet = glob.glob('*.tar*')
+                         f"   getting filenames in {path}..\n")
+        fileSet = glob.glob(os.path.join(path, '*.tar*'))
     else:
         fileSet = files
 
+    new_paths = []
     if len(fileSet) == 0:
         sys.stdout.write('No files found.\n')
     else:
         future_base_path = os.path.dirname(os.path.abspath(fileSet[0]))
-        new_paths = []
         for file in fileSet:
-            year = file[3:7]
-            if not os.path.splitext(file)[-1] == ".tar":
-                month = file[7:9]
-                future_file_path = \
-                    future_base_path + '/{}/RW-{}{}'.format(year, year, month)
+            name = os.path.basename(file)
+            year = name[3:7]
+            if not os.path.splitext(name)[-1] == ".tar":
+                month = name[7:9]
+                future_file_path = os.path.join(
+                    future_base_path, year, f'RW-{year}{month}')
             else:
-                month = ""
-                future_file_path = \
-                    future_base_path + '/{}/'.format(year)
-            # print(future_file_path)
+                future_file_path = os.path.join(future_base_path, year)
+            target = os.path.join(future_file_path, name)
             try:
-                # TODO: replace os.system
-                os.system('mkdir -vp {}'.format(future_file_path))
-                os.system('mv -v {} {}'.format(file, future_file_path))
-                new_paths.append(os.path.join(future_file_path, file))
-            except Exception:
-                sys.stderr.write('ERROR.\n')
+                os.makedirs(future_file_path, exist_ok=True)
+                # already sorted files are only listed
+                if os.path.isfile(file) and \
+                        os.path.abspath(file) != os.path.abspath(target):
+                    shutil.move(file, target)
+                    if not quiet:
+                        sys.stdout.write(f"'{file}' -> '{target}'\n")
+                new_paths.append(target)
+            except OSError as e:
+                sys.stderr.write(f'ERROR: {e}\n')
 
     sys.stdout.write(str(datetime.now())[:-4] + '  Sorting finished.\n')
     return new_paths
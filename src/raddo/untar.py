@@ -10,6 +10,8 @@ Archives (.tar & .tar.gz) are untarred/extracted recursively from entered
 path on into folders with their names.
 If folder to be created exists (regardless of content),
 archive is skipped.
+Daily archives nested in monthly archives (.tar) are extracted directly
+from the stream of the monthly archive; they are not written to disk.
 
 """
 import os
@@ -28,79 +30,89 @@ def untar(**kwargs):
 
     path = kwargs.get('path', None)
     files = kwargs.get('files', None)
+    quiet = kwargs.get('quiet', False)
     assert (path is not None) or (files is not None), \
         "Please either specify a path or filelist to untar."
 
     def save_untar(filename):
         "untar file into directory named after basename of file."
-        f_base = filename.split(".")[0]
+        f_base = os.path.join(os.path.dirname(filename),
+                              os.path.basename(filename).split(".")[0])
         if os.path.exists(f_base):
             dir_is_empty = (len(os.listdir(f_base)) == 0)
         else:
             dir_is_empty = False
         if not os.path.exists(f_base) or dir_is_empty:
             tar = tarfile.open(filename, 'r')
-            sys.stdout.write('\r' + str(datetime.now())[:-4] + "   " +
-                             f"untarring {filename} to {f_base}.")
+            if not quiet:
+                sys.stdout.write('\r' + str(datetime.now())[:-4] + "   " +
+                                 f"untarring {filename} to {f_base}.")
             tar.extractall(path=f_base)
             tar.close()
             del tar
             return f_base
         else:
-            sys.stdout.write('\r' + str(datetime.now())[:-4] +
-                             f"   {f_base} already unpacked.")
+            if not quiet:
+                sys.stdout.write('\r' + str(datetime.now())[:-4] +
+                                 f"   {f_base} already unpacked.")
             return f_base
 
-    count_to_tar = 0
-    if not files:
-        files = glob.glob("**/*.tar*", recursive=True)
+    def stream_untar(filename):
+        """
+        untar monthly archive into directory named after basename of file;
+        nested daily archives are extracted from the stream into their
+        directories (days already unpacked are skipped).
+        """
+        f_base = os.path.join(os.path.dirname(filename),
+                              os.path.basename(filename).split(".")[0])
+        res = [f_base]
+        with tarfile.open(filename, 'r') as tar:
+            for member in tar:
+                name = os.path.basename(member.name)
+                if not (member.isfile() and
+                        re.match(r".+\.tar\.gz$", name) is not None):
+                    tar.extract(member, path=f_base)
+                    continue
+                d_base = os.path.join(f_base, os.path.dirname(member.name),
+                                      name.split(".")[0])
+                res.append(d_base)
+                if os.path.isdir(d_base) and len(os.listdir(d_base)) > 0:
+                    if not quiet:
+                        sys.stdout.write('\r' + str(datetime.now())[:-4] +
+                                         f"   {d_base} already unpacked.")
+                    continue
+                if not quiet:
+                    sys.stdout.write('\r' + str(datetime.now())[:-4] +
+                                     "   " + f"untarring {name} of "
+                                     f"{filename} to {d_base}.")
+                with tarfile.open(fileobj=tar.extractfile(member),
+                                  mode='r:gz') as inner:
+                    inner.extractall(path=d_base)
+        return res
 
+    count_to_tar = 0
     if path:
-        os.chdir(path)
-        files = glob.glob("**/*.tar*", recursive=True)
+        files = glob.glob(os.path.join(path, "**", "*.tar*"), recursive=True)
         sys.stdout.write('\n'+str(datetime.now())[:-4] +
                          '   getting name of files to untar...\n')
+    elif not files:
+        files = glob.glob("**/*.tar*", recursive=True)
 
     ret = []
 
     if any([f is not None for f in files]):
-        for filename in sorted(files):
-            if filename is None:
-                continue
-            curdir = os.getcwd()
-            root = os.path.dirname(os.path.abspath(filename))
-            os.chdir(root)
-            filename = os.path.basename(filename)
-
-            f_base = filename.split(".")[0]
+        for filename in sorted(f for f in files if f is not None):
+            filename = os.path.abspath(filename)
+
             if re.match(r".+\.tar\.gz$", filename) is not None:
-                untarred_file = save_untar(filename)
-                if untarred_file is not None:
-                    ret.append(os.path.join(root, untarred_file))
-                    del untarred_file
-                    count_to_tar += 1
+                ret.append(save_untar(filename))
+                count_to_tar += 1
 
             if re.match(r".+\.tar$", filename) is not None:
-                untarred_file = save_untar(filename)
-                if untarred_file is not None:
-                    ret.append(os.path.join(root, untarred_file))
-                    del untarred_file
-                    count_to_tar += 1
-                # if len(ret) == 0:
-                    for gz_root, gz_dirs, gz_files in os.walk(f_base):
-                        for gz_filename in gz_files:
-                            os.chdir(os.path.join(root, gz_root))
-                            f_base = os.path.splitext(gz_filename)[0]
-                            if re.match(r".+\.tar.gz$",
-                                        gz_filename) is not None:
-                                untarred_file = save_untar(gz_filename)
-                                if untarred_file is not None:
-                                    ret.append(
-                                        os.path.join(root,
-                                                     untarred_file))
-                                    del untarred_file
-                                    count_to_tar += 1
-            os.chdir(curdir)
+                # monthly archives with nested daily archives
+                dirs = stream_untar(filename)
+                ret += dirs
+                count_to_tar += len(dirs)
         sys.stdout.write("\n" + str(datetime.now())[:-4] + "   done.\n")
         return ret
 
@@ -112,7 +124,7 @@ def untar(**kwargs):
 
 def main():
     # TODO add argparse
-    untar(os.getcwd())
+    untar(path=os.getcwd())
 
 
 if __name__ == '__main__':
@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    watch mode: keep local RADOLAN products up to date.
+
+    A long running `Watcher` polls the DWD server (recent/asc/) at a fixed
+    interval, fetches only days published since the last cycle and appends
+    their hours to the configured products (NetCDF file incl. aggregates,
+    point time series). The `Raddo` instance with its mask, point
+    coordinates and grid indices is kept between cycles, so nothing is read
+    or set up twice.
+"""
+
+import datetime
+import os
+import sys
+import tempfile
+import time
+
+from dateutil.parser import parse
+
+from raddo import sort_tars
+from raddo import untar
+from raddo.catalog import HOUR, to_datetime
+
+
+__author__ = "Thomas Ramsauer"
+__copyright__ = "Thomas Ramsauer"
+__license__ = "gpl3"
+
+
+def _day(t):
+    return datetime.datetime(t.year, t.month, t.day)
+
+
+class Watcher(object):
+
+    def __init__(self, rd, rad_dir, interval=3600, start_date=None,
+                 netcdf=None, aggregate=False, rolling=(), point=None,
+                 points=None, interpolation="nearest", mask=None,
+                 no_time_correction=False, workers=None):
+        """
+        rd: Raddo
+            instance used for all cycles.
+        rad_dir: string
+            local RADOLAN directory; products are written here, too.
+        interval: number
+            seconds between two polls.
+        start_date: string
+            first day if no product exists yet (default: 14 days ago).
+        netcdf: string
+            name of the NetCDF file to append to (None: no NetCDF file).
+        point: string
+            coordinates ("(lat,lon)") of a point time series to append to.
+        points: string
+            CSV / GeoJSON file of points whose time series are appended to
+            "RADOLAN_points.csv".
+        """
+        self.rd = rd
+        self.rad_dir = os.path.abspath(rad_dir)
+        self.interval = float(interval)
+        self.start_date = start_date or rd.START_DATE
+        self.netcdf = netcdf
+        self.aggregate = aggregate
+        self.rolling = rolling
+        self.point = point
+        self.points = points
+        self.interpolation = interpolation
+        self.no_time_correction = no_time_correction
+        self.workers = workers
+        self.next_day = None
+
+        # read once, kept for all cycles
+        if mask:
+            rd.read_mask(mask)
+        if point:
+            rd.read_coords(point)
+            self.point_file = \
+                f"RADOLAN_{rd.lon}__{rd.lat}".replace(".", "_") + ".csv"
+        self.points_file = "RADOLAN_points.csv"
+
+    def _resume_day(self):
+        "first day not yet in the NetCDF file (None if there is none)."
+        import netCDF4
+        ncfile = os.path.join(self.rad_dir, self.netcdf or "")
+        if self.netcdf is None or not os.path.isfile(ncfile):
+            return None
+        with netCDF4.Dataset(ncfile) as nco:
+            timeo = nco['time']
+            if len(timeo) == 0:
+                return None
+            # hours since 2000-01-01, see `Raddo.create_netcdf`
+            last = datetime.datetime(2000, 1, 1) + \
+                datetime.timedelta(hours=float(timeo[-1]))
+        return _day(last + datetime.timedelta(hours=1))
+
+    def cycle(self):
+        """
+        Fetch days published since the last cycle and append them to the
+        products. Returns the number of new hours.
+        """
+        rd = self.rd
+        if self.next_day is None:
+            self.next_day = self._resume_day() or \
+                _day(parse(str(self.start_date)))
+        yesterday = _day(datetime.datetime.today()) - \
+            datetime.timedelta(days=1)
+        if self.next_day > yesterday:
+            sys.stdout.write(str(datetime.datetime.now())[:-4] +
+                             '   No new days published yet.\n')
+            return 0
+
+        archives = rd.radolan_down(rad_dir=self.rad_dir,
+                                   start_date=str(self.next_day.date()),
+                                   end_date=yesterday,
+                                   no_time_correction=self.no_time_correction,
+                                   yes=True)
+        if len(archives) == 0:
+            return 0
+        new_paths = sort_tars.sort_tars(
+            files=[os.path.join(self.rad_dir, f) for f in archives])
+        untarred_dirs = untar.untar(files=new_paths)
+        asc_files = rd.get_asc_files(untarred_dirs or [])
+        if len(asc_files) == 0:
+            return 0
+
+        # hours after the last published one are not written (yet)
+        last = rd.catalog.times[-1]
+        rd.timestamps64 = rd.timestamps64[rd.timestamps64 <= last]
+        rd.timestamps = to_datetime(rd.timestamps64)
+
+        if self.netcdf is not None:
+            with tempfile.TemporaryDirectory() as tiff_dir:
+                gtiff_files = rd.create_geotiffs(asc_files, tiff_dir)
+                rd.create_netcdf(gtiff_files, self.rad_dir, self.netcdf,
+                                 self.no_time_correction,
+                                 workers=self.workers,
+                                 aggregate=self.aggregate,
+                                 rolling=self.rolling, append=True)
+        if self.point:
+            rd.create_point_from_archives(
+                asc_files, self.rad_dir, self.point_file,
+                no_time_correction=self.no_time_correction,
+                workers=self.workers, append=True)
+        if self.points:
+            rd.create_points_from_archives(
+                asc_files, self.points, self.rad_dir, self.points_file,
+                method=self.interpolation,
+                no_time_correction=self.no_time_correction,
+                workers=self.workers, append=True)
+
+        self.next_day = _day(to_datetime(last + HOUR)[0])
+        return len(asc_files)
+
+    def run(self, cycles=None):
+        """
+        poll every `interval` seconds (`cycles` times; forever if None).
+        Errors of a cycle (e.g. network failures) are reported and the
+        days are tried again in the next cycle.
+        """
+        n = 0
+        try:
+            while cycles is None or n < cycles:
+                n += 1
+                try:
+                    new = self.cycle()
+                except Exception as e:
+                    sys.stderr.write('\n' + str(datetime.datetime.now())[:-4]
+                                     + f'   Watch cycle {n} failed: '
+                                     f'{type(e).__name__}: {e}\n')
+                    new = 0
+                sys.stdout.write('\n' + str(datetime.datetime.now())[:-4] +
+                                 f'   Watch cycle {n}: {new} new hour(s). '
+                                 f'Next poll in {self.interval:.0f} s.\n')
+                sys.stdout.flush()
+                if cycles is None or n < cycles:
+                    time.sleep(self.interval)
+        except KeyboardInterrupt:
+            sys.stdout.write('\n' + str(datetime.datetime.now())[:-4] +
+                             '   Watch mode stopped.\n')
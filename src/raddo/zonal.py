@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    zonal statistics of RADOLAN grids per mask feature.
+
+    The fraction of every RADOLAN cell covered by each feature (e.g. a
+    catchment) is computed once and stored in a sparse matrix. Mean, sum
+    and maximum of an hourly grid for all features are then a sparse
+    matrix multiplication / reduction away. `rasterize` gives the plain
+    (boolean) cell mask of the geometries, e.g. to crop and mask grids.
+"""
+
+import numpy as np
+
+
+__author__ = "Thomas Ramsauer"
+__copyright__ = "Thomas Ramsauer"
+__license__ = "gpl3"
+
+
+def cell_weights(geometries, geotransform, shape):
+    """
+    Sparse (features x cells) matrix of the fraction of each grid cell
+    covered by each geometry. Geometries need to be in the grid CRS.
+    Points and lines get a weight of 1 for every cell they touch.
+    """
+    from scipy import sparse
+    from shapely.geometry import box
+    from shapely.prepared import prep
+
+    gt = geotransform
+    ny, nx = shape
+    cell_area = abs(gt[1] * gt[5])
+    rows, cols, vals = [], [], []
+    for i, geom in enumerate(geometries):
+        if geom is None or geom.is_empty:
+            continue
+        minx, miny, maxx, maxy = geom.bounds
+        c0 = max(0, int(np.floor((minx - gt[0]) / gt[1])))
+        c1 = min(nx, int(np.floor((maxx - gt[0]) / gt[1])) + 1)
+        r0 = max(0, int(np.floor((maxy - gt[3]) / gt[5])))
+        r1 = min(ny, int(np.floor((miny - gt[3]) / gt[5])) + 1)
+        pgeom = prep(geom)
+        for r in range(r0, r1):
+            y0 = gt[3] + r * gt[5]
+            for c in range(c0, c1):
+                x0 = gt[0] + c * gt[1]
+                cell = box(x0, y0 + gt[5], x0 + gt[1], y0)
+                if not pgeom.intersects(cell):
+                    continue
+                if geom.area == 0 or pgeom.contains(cell):
+                    w = 1.
+                else:
+                    w = geom.intersection(cell).area / cell_area
+                if w > 0:
+                    rows.append(i)
+                    cols.append(r * nx + c)
+                    vals.append(w)
+    return sparse.csr_matrix((vals, (rows, cols)),
+                             shape=(len(geometries), ny * nx))
+
+
+def rasterize(geometries, geotransform, shape):
+    """
+    Boolean grid of the cells whose center lies inside any of `geometries`;
+    points and lines mark every cell they touch. Geometries need to be in
+    the grid CRS.
+    """
+    import shapely
+
+    gt = geotransform
+    ny, nx = shape
+    inside = np.zeros((ny, nx), dtype=bool)
+    for geom in geometries:
+        if geom is None or geom.is_empty:
+            continue
+        minx, miny, maxx, maxy = geom.bounds
+        c0 = max(0, int(np.floor((minx - gt[0]) / gt[1])))
+        c1 = min(nx, int(np.floor((maxx - gt[0]) / gt[1])) + 1)
+        r0 = max(0, int(np.floor((maxy - gt[3]) / gt[5])))
+        r1 = min(ny, int(np.floor((miny - gt[3]) / gt[5])) + 1)
+        if c0 >= c1 or r0 >= r1:
+            continue
+        # upper left corners of the cells of the window
+        x0, y0 = np.meshgrid(gt[0] + np.arange(c0, c1) * gt[1],
+                             gt[3] + np.arange(r0, r1) * gt[5])
+        shapely.prepare(geom)
+        if geom.area == 0:
+            cells = shapely.box(x0, y0 + gt[5], x0 + gt[1], y0)
+            hit = shapely.intersects(geom, cells)
+        else:
+            hit = shapely.contains_xy(geom, x0 + gt[1] / 2, y0 + gt[5] / 2)
+        inside[r0:r1, c0:c1] |= hit
+    return inside
+
+
+class ZonalStats(object):
+
+    def __init__(self, geometries, ids, geotransform, shape):
+        self.ids = list(ids)
+        self.shape = tuple(shape)
+        self.weights = cell_weights(list(geometries), geotransform, shape)
+        self._indptr = self.weights.indptr
+        self._cells = self.weights.indices
+        self._nonempty = np.diff(self._indptr) > 0
+
+    @classmethod
+    def from_file(cls, maskfile, crs, geotransform, shape, id_field=None):
+        "features of `maskfile` reprojected to the grid `crs`."
+        import geopandas as gpd
+        mf = gpd.read_file(maskfile).to_crs(crs)
+        ids = mf[id_field] if id_field is not None else mf.index
+        return cls(mf.geometry, ids, geotransform, shape)
+
+    def compute(self, a, nodata=-9999):
+        """
+        Coverage weighted mean and sum as well as the maximum of all touched
+        cells of grid `a` for every feature. NaN if no valid cell is
+        touched.
+        """
+        v = np.asarray(a, dtype=float).ravel()
+        valid = np.isfinite(v) & (v != nodata)
+        cover = self.weights @ valid.astype(float)
+        total = self.weights @ np.where(valid, v, 0.)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = total / cover
+        empty = cover == 0
+        mean[empty] = np.nan
+        total[empty] = np.nan
+
+        mx = np.full(len(self.ids), np.nan)
+        if len(self._cells) > 0:
+            vm = np.where(valid, v, -np.inf)[self._cells]
+            mx[self._nonempty] = np.maximum.reduceat(
+                vm, self._indptr[:-1][self._nonempty])
+        mx[~np.isfinite(mx)] = np.nan
+        return mean, total, mx
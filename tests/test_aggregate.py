@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+
+import datetime
+import os
+
+import numpy as np
+
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+from raddo.aggregate import StreamingAggregator, combine
+
+__author__ = "Thomas Ramsauer"
+__copyright__ = "Thomas Ramsauer"
+__license__ = "gpl3"
+
+
+def _hours(start, n):
+    return [start + datetime.timedelta(hours=h) for h in range(n)]
+
+
+def test_daily_monthly_sums():
+    agg = StreamingAggregator((2, 2))
+    res = []
+    # two days across a month boundary
+    for t in _hours(datetime.datetime(2020, 1, 31), 48):
+        res += agg.add(t, np.ones((2, 2)))
+    res += agg.flush()
+    daily = [r for r in res if r[0] == "daily"]
+    monthly = [r for r in res if r[0] == "monthly"]
+    assert [r[1].day for r in daily] == [31, 1]
+    assert all(np.all(r[2] == 24) for r in daily)
+    assert [r[1].month for r in monthly] == [1, 2]
+    assert all(np.all(r[2] == 24) for r in monthly)
+
+
+def test_nodata_and_rolling_max():
+    agg = StreamingAggregator((1, 2), rolling=[2])
+    values = [[0, -9999], [1, -9999], [3, -9999], [0, -9999]]
+    for t, v in zip(_hours(datetime.datetime(2020, 5, 1), 4), values):
+        agg.add(t, np.array([v], dtype=float))
+    res = dict((r[0], r[2]) for r in agg.flush())
+    assert res["daily"][0, 0] == 4
+    assert np.isnan(res["daily"][0, 1])
+    assert res["max_2h"][0, 0] == 4
+
+
+def test_combine_parts():
+    old = np.array([1., np.nan, np.nan])
+    new = np.array([2., 3., np.nan])
+    total = combine("monthly", old, new)
+    assert total[:2].tolist() == [3., 3.] and np.isnan(total[2])
+    assert combine("max_3h", old, new)[:2].tolist() == [2., 3.]
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+import csv
+import io
+import os
+import tarfile
+
+import numpy as np
+import pytest
+
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+from raddo import api
+from raddo.grid import DWD_PROJ
+
+__author__ = "Thomas Ramsauer"
+__copyright__ = "Thomas Ramsauer"
+__license__ = "gpl3"
+
+# 2 x 3 grid of 1 km cells on the RADOLAN grid
+XLL, YLL = -523462., -4658645.
+
+
+def _asc(value):
+    return (b"ncols 3\nnrows 2\nxllcorner %d\nyllcorner %d\ncellsize 1000\n"
+            b"NODATA_value -1\n" % (XLL, YLL) +
+            (b"%d %d -1\n" % (value, value)) * 2)
+
+
+def _add(tar, name, data):
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    tar.addfile(info, io.BytesIO(data))
+
+
+@pytest.fixture
+def request_(tmp_path):
+    "request of two days whose archives are already local (no download)."
+    rad_dir = tmp_path / "radolan"
+    rad_dir.mkdir()
+    for day in ("20200101", "20200102"):
+        with tarfile.open(rad_dir / f"RW-{day}.tar.gz", "w:gz") as tar:
+            for h in range(3):
+                _add(tar, f"RW-{day}-{h:02d}50.asc", _asc(10 * (h + 1)))
+    return api.RaddoRequest(str(rad_dir), start="2020-01-01",
+                            end="2020-01-02", workers=2)
+
+
+def _lonlat():
+    "longitude / latitude of the center of the upper left cell."
+    pyproj = pytest.importorskip("pyproj")
+    tf = pyproj.Transformer.from_crs(DWD_PROJ, "EPSG:4326", always_xy=True)
+    return tf.transform(XLL + 500., YLL + 1500.)
+
+
+def test_request(tmp_path):
+    req = api.RaddoRequest(str(tmp_path), start="2020-01-01",
+                           end="2020-01-02")
+    assert req.download_kwargs()["start_date"] == "2020-01-01"
+    assert req.raddo().rad_dir == str(tmp_path)
+    with pytest.raises(ValueError):
+        api.RaddoRequest(str(tmp_path), start="2020-01-02", end="2020-01-01")
+
+
+def test_fetch(request_):
+    rd, paths, asc_files = api.fetch(request_)
+    assert [os.path.relpath(p, request_.rad_dir) for p in paths] == [
+        os.path.join("2020", "RW-202001", f"RW-2020010{d}.tar.gz")
+        for d in (1, 2)]
+    assert len(asc_files) == 6
+    assert os.path.basename(asc_files[0]) == "RW-20200101-0050.asc"
+
+    rd, paths, asc_files = api.fetch(request_, extract=False)
+    assert len(paths) == 2 and asc_files == []
+
+
+def test_point_series(request_):
+    pytest.importorskip("osgeo")
+    lon, lat = _lonlat()
+    times, values = api.point_series(request_, lat, lon)
+    assert len(times) == 6
+    assert np.allclose(values[:3], [1., 2., 3.])
+
+
+def test_points_table(request_, tmp_path):
+    pytest.importorskip("osgeo")
+    lon, lat = _lonlat()
+    pointfile = tmp_path / "points.csv"
+    pointfile.write_text(f"id,lon,lat\na,{lon},{lat}\n")
+    outf = api.points_table(request_, str(pointfile), str(tmp_path))
+    with open(outf) as fp:
+        rows = list(csv.DictReader(fp))
+    assert len(rows) == 6 and rows[0]["id"] == "a"
+    assert float(rows[2]["precipitation"]) == 3.
+
+
+def test_netcdf(request_, tmp_path):
+    pytest.importorskip("osgeo")
+    netCDF4 = pytest.importorskip("netCDF4")
+    outf = api.netcdf(request_, str(tmp_path), "test.nc")
+    with netCDF4.Dataset(outf) as ds:
+        assert ds["prc"].shape[0] == 48
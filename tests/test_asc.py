@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+
+import io
+import os
+import tarfile
+import tempfile
+
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+from raddo import asc
+
+__author__ = "Thomas Ramsauer"
+__copyright__ = "Thomas Ramsauer"
+__license__ = "gpl3"
+
+ASC = (b"ncols 3\nnrows 2\nxllcorner -10\nyllcorner 20\ncellsize 5\n"
+       b"NODATA_value -1\n0 10 -1\n25 30 5\n")
+
+
+def _add(tar, name, data):
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    tar.addfile(info, io.BytesIO(data))
+
+
+def test_read_grid():
+    header, a = asc.read_grid(io.BytesIO(ASC))
+    assert asc.geotransform(header) == (-10, 5, 0., 30, 0., -5)
+    assert a.tolist() == [[0., 1., asc.NODATA], [2.5, 3., .5]]
+
+
+def test_read_rows():
+    header, a = asc.read_rows(io.BytesIO(ASC), [1])
+    assert a.tolist() == [[2.5, 3., .5]]
+    header, a = asc.read_rows(io.BytesIO(ASC), [0, 1], slice(1, 2))
+    assert a.tolist() == [[1.], [3.]]
+
+
+def test_iter_nested_archive():
+    with tempfile.TemporaryDirectory() as tdir:
+        daily = io.BytesIO()
+        with tarfile.open(fileobj=daily, mode="w:gz") as tar:
+            _add(tar, "RW-20200101-0050.asc", ASC)
+            _add(tar, "RW-20200101-0150.asc", ASC)
+        monthly = os.path.join(tdir, "RW-202001.tar")
+        with tarfile.open(monthly, "w") as tar:
+            _add(tar, "RW-20200101.tar.gz", daily.getvalue())
+        names = [name for name, fp in asc.iter_sources([monthly])]
+    assert names == ["RW-20200101-0050.asc", "RW-20200101-0150.asc"]
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+
+import os
+import tempfile
+
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+from raddo.cache import ProductCache, copy_product, same_product
+
+__author__ = "Thomas Ramsauer"
+__copyright__ = "Thomas Ramsauer"
+__license__ = "gpl3"
+
+
+def _file(path, size):
+    with open(path, "wb") as fp:
+        fp.write(b"x" * size)
+    return path
+
+
+def test_cache_key_and_checksum():
+    with tempfile.TemporaryDirectory() as tdir:
+        cache = ProductCache(os.path.join(tdir, "cache"))
+        archive = _file(os.path.join(tdir, "RW-20200101.tar.gz"), 10)
+        assert cache.checksum(archive) == cache.checksum(archive)
+        key = cache.key({"archives": [cache.checksum(archive)], "buffer": 1})
+        assert key == cache.key({"buffer": 1,
+                                 "archives": [cache.checksum(archive)]})
+        assert key != cache.key({"archives": [cache.checksum(archive)],
+                                 "buffer": 2})
+
+        # checksums are written once, when saved
+        memo = os.path.join(cache.cache_dir, cache.CHECKSUMS)
+        assert not os.path.exists(memo)
+        cache.save_checksums()
+        assert ProductCache(cache.cache_dir).checksum(archive) == \
+            cache.checksum(archive)
+        assert os.path.getsize(memo) > 0
+
+
+def test_cache_products_are_copies():
+    with tempfile.TemporaryDirectory() as tdir:
+        cache = ProductCache(os.path.join(tdir, "cache"))
+        product = _file(os.path.join(tdir, "a.nc"), 10)
+        cached = cache.put("a", product)
+        # appending to the output in place leaves the cached product intact
+        with open(product, "ab") as fp:
+            fp.write(b"y")
+        assert os.path.getsize(cached) == 10
+        served = copy_product(cached, os.path.join(tdir, "b.nc"))
+        assert same_product(served, cached)
+        assert not os.path.samefile(served, cached)
+
+
+def test_cache_lru_eviction():
+    with tempfile.TemporaryDirectory() as tdir:
+        cache = ProductCache(os.path.join(tdir, "cache"), max_bytes=250)
+        for name in "abc":
+            cache.put(name, _file(os.path.join(tdir, f"{name}.nc"), 100))
+            if name == "b":
+                # a is used again, b is now least recently used
+                assert cache.get("a") is not None
+        assert cache.get("b") is None
+        assert cache.get("a").endswith("a.nc")
+        assert cache.get("c") is not None
+        assert cache.size() == 200
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+
+import datetime
+import os
+
+import numpy as np
+
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+from raddo.catalog import Catalog, to_datetime
+
+__author__ = "Thomas Ramsauer"
+__copyright__ = "Thomas Ramsauer"
+__license__ = "gpl3"
+
+PATHS = ["b/RW-20200101-0250.asc", "a/RW-20200101-0050.asc",
+         "a/RW-20200101-0250.asc", "a/RW-20200101-0550.asc"]
+
+
+def test_catalog_sorted_unique():
+    cat = Catalog.from_paths(PATHS)
+    assert len(cat) == 3
+    assert list(cat.paths) == ["a/RW-20200101-0050.asc",
+                               "a/RW-20200101-0250.asc",
+                               "a/RW-20200101-0550.asc"]
+    assert to_datetime(cat.times)[0] == datetime.datetime(2020, 1, 1, 0)
+
+
+def test_catalog_queries():
+    cat = Catalog.from_paths(PATHS)
+    hours = np.arange(np.datetime64("2020-01-01T00"),
+                      np.datetime64("2020-01-01T06"), np.timedelta64(1, "h"))
+    assert cat.contains(hours).tolist() == [True, False, True, False, False,
+                                            True]
+    assert cat.completeness(hours) == .5
+    assert len(cat.range("2020-01-01T01", "2020-01-01T05")) == 2
+    assert list(cat.select(hours[:3]).paths) == ["a/RW-20200101-0050.asc",
+                                                 "a/RW-20200101-0250.asc"]
+    assert [(str(a), str(b)) for a, b in
+            cat.gaps("2020-01-01T00", "2020-01-01T06")] == \
+        [("2020-01-01T01", "2020-01-01T01"),
+         ("2020-01-01T03", "2020-01-01T04"),
+         ("2020-01-01T06", "2020-01-01T06")]
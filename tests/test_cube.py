@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+
+import os
+import tempfile
+
+import numpy as np
+
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+from raddo.cube import CubeStore, NODATA
+
+__author__ = "Thomas Ramsauer"
+__copyright__ = "Thomas Ramsauer"
+__license__ = "gpl3"
+
+GT = (-523462., 1000., 0., -3758645., 0., -1000.)
+
+
+def test_append_and_slice():
+    with tempfile.TemporaryDirectory() as tdir:
+        path = os.path.join(tdir, "test.cube")
+        store = CubeStore.create(path, GT, (3, 4))
+        t0 = np.datetime64("2019-01-01T00", "h")
+        grids = [np.full((3, 4), i / 10) for i in range(3)]
+        grids[1][0, 0] = -9999
+        assert store.append([t0, t0 + 1, t0 + 2], grids) == 3
+        # the hour in between is filled with NODATA
+        assert store.append([t0 + 4], [np.full((3, 4), 1.5)]) == 2
+
+        store = CubeStore(path)
+        assert len(store) == 5 and store.geotransform == GT
+        raw, times = store.slice(t0 + 1, t0 + 3)
+        assert list(times) == [t0 + 1, t0 + 2, t0 + 3]
+        assert isinstance(raw, np.memmap) and not raw.flags.writeable
+        assert raw[0, 0, 0] == NODATA and raw[0, 0, 1] == 1
+        assert (raw[2] == NODATA).all()
+
+        prc, times = store.precipitation(t0 + 4, t0 + 4)
+        assert np.allclose(prc, 1.5)
+        prc, _ = store.precipitation(t0 + 1, t0 + 1)
+        assert np.isnan(prc[0, 0, 0]) and np.isclose(prc[0, 0, 1], .1)
+
+        try:
+            store.append([t0 + 4], [grids[0]])
+            assert False, "hours are only appended"
+        except AssertionError as e:
+            assert "already" in str(e)
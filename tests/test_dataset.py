@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+import io
+import os
+import tarfile
+import tempfile
+
+import numpy as np
+import pytest
+
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+from raddo.dataset import open_radolan
+
+__author__ = "Thomas Ramsauer"
+__copyright__ = "Thomas Ramsauer"
+__license__ = "gpl3"
+
+pytest.importorskip("dask")
+
+
+def _asc(value):
+    return (b"ncols 3\nnrows 2\nxllcorner -10\nyllcorner 20\ncellsize 5\n"
+            b"NODATA_value -1\n" + (b"%d %d -1\n" % (value, value)) * 2)
+
+
+def _add(tar, name, data):
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    tar.addfile(info, io.BytesIO(data))
+
+
+def test_open_archives_and_asc():
+    with tempfile.TemporaryDirectory() as tdir:
+        # day 1 as daily archive (hours 0 and 2), day 2 extracted (hour 1)
+        with tarfile.open(os.path.join(tdir, "RW-20200101.tar.gz"),
+                          "w:gz") as tar:
+            _add(tar, "RW-20200101-0050.asc", _asc(10))
+            _add(tar, "RW-20200101-0250.asc", _asc(30))
+        os.makedirs(os.path.join(tdir, "RW-20200102"))
+        with open(os.path.join(tdir, "RW-20200102",
+                               "RW-20200102-0150.asc"), "wb") as fp:
+            fp.write(_asc(20))
+
+        # archives cover complete days, *.asc files single hours
+        ds = open_radolan(tdir)
+        assert ds.prc.shape == (26, 2, 3)
+        assert ds.prc.data.numblocks == (2, 1, 1)
+        a = ds.prc.sel(time="2020-01-01T02").values
+        assert np.allclose(a[:, :2], 3.) and np.isnan(a[:, 2]).all()
+        daily = ds.prc.resample(time="1D").sum().values[:, 0, 0]
+        assert daily.tolist() == [4., 2.]
+        assert ds.attrs["missing_dates"] == ["2020-01-02T00"]
+
+        ds = open_radolan(tdir, start="2020-01-02", end="2020-01-02T05",
+                          chunks="hour")
+        assert ds.prc.data.numblocks[0] == 6
+        assert float(ds.prc[1, 0, 0]) == 2.
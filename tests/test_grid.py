@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+
+import os
+
+import numpy as np
+
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+from raddo.grid import GridIndex
+
+__author__ = "Thomas Ramsauer"
+__copyright__ = "Thomas Ramsauer"
+__license__ = "gpl3"
+
+# 4 x 5 grid of 10 x 10 cells, upper left corner at (0, 40)
+INDEX = GridIndex((0., 10., 0., 40., 0., -10.), (4, 5))
+
+
+def test_nearest():
+    rows, cols = INDEX.nearest([5., 49., 60.], [35., 1., 20.])
+    assert rows.tolist() == [0, 3, -1]
+    assert cols.tolist() == [0, 4, -1]
+
+
+def test_knearest():
+    rows, cols, dist = INDEX.knearest([10.], [30.], 4)
+    assert sorted(zip(rows[0].tolist(), cols[0].tolist())) == \
+        [(0, 0), (0, 1), (1, 0), (1, 1)]
+    assert np.allclose(dist, np.hypot(5, 5))
+    # just outside the upper left corner
+    rows, cols, dist = INDEX.knearest([-1.], [41.], 1)
+    assert (rows[0][0], cols[0][0]) == (0, 0)
+
+
+def test_radius():
+    (rows, cols), = INDEX.radius([25.], [25.], 10.)
+    assert sorted(zip(rows.tolist(), cols.tolist())) == \
+        [(0, 2), (1, 1), (1, 2), (1, 3), (2, 2)]
+
+
+def test_key():
+    assert INDEX.key == GridIndex((0, 10, 0, 40, 0, -10), (4, 5)).key
+    assert INDEX.key != GridIndex((0, 10, 0, 40, 0, -10), (5, 5)).key
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+
+import os
+import subprocess
+import sys
+
+__author__ = "Thomas Ramsauer"
+__copyright__ = "Thomas Ramsauer"
+__license__ = "gpl3"
+
+SRC = os.path.join(os.path.dirname(__file__), os.pardir, "src")
+HEAVY = ["osgeo", "geopandas", "xarray", "netCDF4", "pandas",
+         "pkg_resources"]
+
+
+def test_no_heavy_imports():
+    # heavy dependencies are only imported by the stages needing them
+    code = ("import sys; import raddo.raddo, raddo.sort_tars, raddo.untar; "
+            f"print(','.join(m for m in {HEAVY!r} if m in sys.modules))")
+    env = dict(os.environ, PYTHONPATH=SRC)
+    res = subprocess.run([sys.executable, "-c", code], env=env,
+                         stdout=subprocess.PIPE, universal_newlines=True,
+                         check=True)
+    assert res.stdout.strip() == ""
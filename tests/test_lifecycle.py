@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+
+import datetime
+import os
+import tarfile
+import tempfile
+
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+from raddo.lifecycle import LifecyclePolicy
+
+__author__ = "Thomas Ramsauer"
+__copyright__ = "Thomas Ramsauer"
+__license__ = "gpl3"
+
+
+def test_prune_and_restore():
+    with tempfile.TemporaryDirectory() as rad_dir:
+        month_dir = os.path.join(rad_dir, "2020", "RW-202001")
+        day_dir = os.path.join(month_dir, "RW-20200101")
+        os.makedirs(day_dir)
+        names = ["RW-20200101-0050.asc", "RW-20200101-0150.asc"]
+        for name in names:
+            with open(os.path.join(day_dir, name), "w") as fp:
+                fp.write("ncols 1\n")
+        with tarfile.open(day_dir + ".tar.gz", "w:gz") as tar:
+            for name in names:
+                tar.add(os.path.join(day_dir, name), arcname=name)
+        output = os.path.join(rad_dir, "RADOLAN.nc")
+        open(output, "w").close()
+
+        policy = LifecyclePolicy(rad_dir)
+        # only one hour of the day in the output: nothing to prune
+        policy.record_output(output, [datetime.datetime(2020, 1, 1, 0)])
+        assert policy.run() == []
+        policy.record_output(output, [datetime.datetime(2020, 1, 1, 1)])
+        assert policy.run() == [day_dir]
+        assert not os.path.exists(day_dir)
+
+        policy.restore()
+        assert sorted(os.listdir(day_dir)) == names
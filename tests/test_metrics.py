@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+import csv
+import json
+import os
+import tempfile
+
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+from raddo.metrics import Metrics, timed
+
+__author__ = "Thomas Ramsauer"
+__copyright__ = "Thomas Ramsauer"
+__license__ = "gpl3"
+
+
+class Worker(object):
+
+    def __init__(self):
+        self.metrics = Metrics()
+
+    @timed("warp")
+    def warp(self, files):
+        for f in files:
+            with self.metrics.item("warp", nbytes=100):
+                pass
+        return len(files)
+
+
+def test_stages_and_items():
+    w = Worker()
+    assert w.warp(["a", "b", "c"]) == 3
+    w.warp(["d"])
+    w.metrics["download"].observe(.3, 1000)
+    w.metrics["download"].observe(3., 2000)
+
+    stages = {s["stage"]: s for s in w.metrics.report()["stages"]}
+    assert stages["warp"]["calls"] == 2
+    assert stages["warp"]["items"] == 4 and stages["warp"]["bytes"] == 400
+    assert stages["warp"]["latency_p95_s"] <= .001
+    assert stages["download"]["calls"] == 0
+    assert stages["download"]["latency_p50_s"] == .5
+    assert stages["download"]["latency_max_s"] == 3.
+    assert sum(stages["download"]["histogram"].values()) == 2
+
+
+def test_write():
+    w = Worker()
+    w.warp(["a"])
+    with tempfile.TemporaryDirectory() as tdir:
+        with open(w.metrics.write(os.path.join(tdir, "m.json"))) as fp:
+            assert json.load(fp)["stages"][0]["stage"] == "warp"
+        with open(w.metrics.write(os.path.join(tdir, "m.csv"))) as fp:
+            rows = list(csv.DictReader(fp))
+        assert rows[0]["stage"] == "warp" and rows[0]["items"] == "1"
+
+
+def test_raddo_stages_wrapped():
+    from raddo.raddo import Raddo
+    # stage decorators sit on the methods doing the work
+    for method in ("create_geotiffs", "create_netcdf", "create_zarr",
+                   "create_cube", "repack_archives", "extract_points"):
+        assert hasattr(getattr(Raddo, method), "__wrapped__"), method
+    assert not hasattr(Raddo._repacked_hours, "__wrapped__")
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+
+import datetime
+import json
+import os
+import tempfile
+
+import netCDF4
+import numpy as np
+import pytest
+
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+from raddo import parallel
+from raddo.aggregate import StreamingAggregator
+from raddo.parallel import BASEDATE, NODATA, months, run_partitions
+
+__author__ = "Thomas Ramsauer"
+__copyright__ = "Thomas Ramsauer"
+__license__ = "gpl3"
+
+
+def _square(x, offset=0):
+    return x * x + offset
+
+
+def _part(path, hours, values, rolling=(3,)):
+    "part like `create_netcdf` writes it (2 x 1 grid, rolling maxima)."
+    with netCDF4.Dataset(path, "w") as nco:
+        nco.createDimension("lat", 2)
+        nco.createDimension("lon", 1)
+        nco.createDimension("time", None)
+        nco.createDimension("day", None)
+        nco.createVariable("lat", "f4", ("lat",))[:] = [50, 51]
+        nco.createVariable("lon", "f4", ("lon",))[:] = [10]
+        timeo = nco.createVariable("time", "f4", ("time",))
+        timeo.units = "hours since 2000-01-01 00:00:00"
+        dayo = nco.createVariable("day", "f4", ("day",))
+        dayo.units = "days since 2000-01-01 00:00:00"
+        prc = nco.createVariable("prc", "f4", ("time", "lat", "lon"),
+                                 fill_value=NODATA)
+        for n in rolling:
+            nco.createVariable(f"prc_max_{n}h", "f4", ("day", "lat", "lon"),
+                               fill_value=NODATA)
+        timeo[:] = [(t - BASEDATE).total_seconds() / 3600. for t in hours]
+        prc[:] = values
+        agg = StreamingAggregator((2, 1), rolling=rolling, nodata=NODATA)
+        for t, v in zip(hours, values):
+            parallel._write_aggregates(nco, agg.add(t, v))
+        parallel._write_aggregates(nco, agg.flush())
+        nco.missing_dates = "[]"
+
+
+def _hours(first, n):
+    return [first + datetime.timedelta(hours=h) for h in range(n)]
+
+
+def test_months():
+    res = months(datetime.datetime(2019, 12, 20),
+                 datetime.datetime(2020, 2, 3))
+    assert [(f.date().isoformat(), la.day) for f, la in res] == \
+        [("2019-12-20", 31), ("2020-01-01", 31), ("2020-02-01", 3)]
+
+
+def test_run_partitions_processes():
+    assert run_partitions(_square, [1, 2, 3], jobs=2, offset=1) == [2, 5, 10]
+
+
+def test_parts_continue_rolling_and_fill_gaps():
+    with tempfile.TemporaryDirectory() as tdir:
+        jan = _hours(datetime.datetime(2020, 1, 31), 24)
+        mar = _hours(datetime.datetime(2020, 3, 1), 48)
+        values = np.arange(72.).reshape(72, 1, 1) * np.ones((1, 2, 1))
+        values[0, 1] = NODATA
+        parts = [os.path.join(tdir, f"part_{m}.nc") for m in (1, 2, 3)]
+        _part(parts[0], jan, values[:24])
+        _part(parts[2], mar, values[24:])
+        parallel.write_gap(parts[0], datetime.datetime(2020, 2, 1),
+                           datetime.datetime(2020, 2, 29), parts[1])
+        parallel.continue_rolling(parts[0], parts[1])
+        parallel.continue_rolling(parts[1], parts[2])
+
+        # the same as one pass over all hours (NODATA in February)
+        hours = jan + _hours(datetime.datetime(2020, 2, 1), 29 * 24) + mar
+        serial = os.path.join(tdir, "serial.nc")
+        _part(serial, hours, np.concatenate(
+            [values[:24], np.full((29 * 24, 2, 1), NODATA), values[24:]]))
+        with netCDF4.Dataset(serial) as nco:
+            expected = nco["prc_max_3h"][:]
+        with netCDF4.Dataset(parts[1]) as nco:
+            assert nco["prc"].shape[0] == 29 * 24
+            assert nco["prc"][:].mask.all()
+            assert len(parallel._parse_dates(nco.missing_dates)) == 29 * 24
+            feb = nco["prc_max_3h"][:]
+        with netCDF4.Dataset(parts[2]) as nco:
+            got = np.concatenate([expected[:1], feb, nco["prc_max_3h"][:]])
+        assert np.allclose(got, expected)
+        assert got[1, 0, 0] == 23 + 22  # Feb 1st: windows from January
+
+        index = parallel.write_index(parts, os.path.join(tdir, "index.json"))
+        with open(index) as fp:
+            info = json.load(fp)
+        assert info["parts"] == ["part_1.nc", "part_2.nc", "part_3.nc"]
+        assert info["missing_dates"][0] == "2020-02-01T00:00:00"
+        xr = pytest.importorskip("xarray")
+        ds = parallel.open_parts(index)
+        assert isinstance(ds, xr.Dataset)
+        assert ds["prc"].shape == (len(hours), 2, 1)
+        assert ds["prc_max_3h"].shape == (32, 2, 1)
+        assert np.allclose(ds["prc"][-1].values, 71)
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+
+import os
+import time
+
+import pytest
+
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+from raddo.pipeline import Pipeline, Stage
+
+__author__ = "Thomas Ramsauer"
+__copyright__ = "Thomas Ramsauer"
+__license__ = "gpl3"
+
+
+def test_stages_keep_order():
+    def slow(x):
+        time.sleep(.01)
+        return [x, x]
+
+    pipeline = Pipeline([Stage("double", slow),
+                         Stage("odd", lambda x: [x] if x % 2 else [])],
+                        queue_size=1)
+    assert list(pipeline.run(range(6))) == [1, 1, 3, 3, 5, 5]
+    assert [s.items_out for s in pipeline.stages] == [12, 6]
+    assert "double" in pipeline.report()
+
+
+def test_stage_error_is_raised():
+    def fail(x):
+        if x == 3:
+            raise ValueError("bad item")
+        return [x]
+
+    pipeline = Pipeline([Stage("fail", fail)])
+    with pytest.raises(ValueError):
+        list(pipeline.run(range(100)))
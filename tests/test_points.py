@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+
+import os
+import tempfile
+
+import numpy as np
+
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+from raddo import points
+
+__author__ = "Thomas Ramsauer"
+__copyright__ = "Thomas Ramsauer"
+__license__ = "gpl3"
+
+# 3 x 3 grid of 1 x 1 cells, upper left corner at (0, 3)
+GT = (0., 1., 0., 3., 0., -1.)
+GRID = np.arange(9, dtype=float).reshape(3, 3)
+
+
+def test_read_points_csv():
+    with tempfile.TemporaryDirectory() as tdir:
+        pointfile = os.path.join(tdir, "pts.csv")
+        with open(pointfile, "w") as fp:
+            fp.write("id,lon,lat\nA,12.3,48.4\nB,11.5,48.1\n")
+        ids, lons, lats = points.read_points(pointfile)
+    assert ids == ["A", "B"]
+    assert lons.tolist() == [12.3, 11.5]
+    assert lats.tolist() == [48.4, 48.1]
+
+
+def test_sample_nearest():
+    sampler = points.PointSampler([0.5, 2.9, 5.], [2.5, 0.1, 1.], GT, (3, 3))
+    res = sampler.sample(GRID)
+    assert res[:2].tolist() == [0., 8.]
+    assert np.isnan(res[2])
+
+
+def test_sample_bilinear():
+    sampler = points.PointSampler([1.], [2.], GT, (3, 3),
+                                  method="bilinear")
+    assert sampler.sample(GRID).tolist() == [2.]
+    grid = GRID.copy()
+    grid[0, 0] = -9999
+    assert sampler.sample(grid).tolist() == [(1 + 3 + 4) / 3.]
+
+
+def test_sample_window():
+    sampler = points.PointSampler([1.5, 2.5], [2.5, 2.5], GT, (3, 3))
+    assert sampler.rows.tolist() == [0] and sampler.cols == slice(1, 3)
+    window = GRID[sampler.rows][:, sampler.cols]
+    assert sampler.sample_rows(window).tolist() == \
+        sampler.sample(GRID).tolist() == [1., 2.]
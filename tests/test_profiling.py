@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+
+import os
+import pstats
+import tempfile
+import threading
+
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+from raddo.profiling import Profiler, profiled
+
+__author__ = "Thomas Ramsauer"
+__copyright__ = "Thomas Ramsauer"
+__license__ = "gpl3"
+
+
+class Worker(object):
+
+    def __init__(self, profiler=None):
+        self.profiler = profiler
+
+    @profiled("outer")
+    def outer(self):
+        return self.inner() + [0] * 1000
+
+    @profiled("inner")
+    def inner(self):
+        return [bytes(1000) for _ in range(100)]
+
+
+def test_off():
+    assert len(Worker().outer()) == 1100
+
+
+def test_profile():
+    with tempfile.TemporaryDirectory() as tdir:
+        w = Worker(Profiler(tdir, top=5))
+        w.outer()
+        w.outer()
+        w.inner()
+        # nested stages are part of the active one
+        assert sorted(w.profiler.profiles) == ["inner", "outer"]
+        summary = w.profiler.write()
+        stats = pstats.Stats(os.path.join(tdir, "raddo_profile_outer.pstats"))
+        calls = {f[2]: v[0] for f, v in stats.stats.items()}
+        assert calls["inner"] == 2
+        with open(summary) as fp:
+            text = fp.read()
+        assert "peak traced memory" in text and "allocation sites" in text
+
+
+def test_other_thread_skipped():
+    with tempfile.TemporaryDirectory() as tdir:
+        w = Worker(Profiler(tdir))
+        with w.profiler.stage("outer"):
+            thread = threading.Thread(target=w.inner)
+            thread.start()
+            thread.join()
+        assert "inner" not in w.profiler.profiles
+        assert w.profiler.skipped == {"inner": 1}
+        assert "inner: 1 call(s)" in w.profiler.summary()
@@ -279,3 +279,25 @@ def test_raddo_complete_download_with_mask_poly_multi():
         # asc_files = rd.get_asc_files(untarred_dirs)
         # gtiff_files = rd.create_geotiffs(asc_files, tiff_dir)
         # rd.create_netcdf(gtiff_files, RAD_DIR)
+
+
+def test_sorted_historical_archive_not_fetched_again(monkeypatch):
+    import raddo.raddo
+    from urllib.error import HTTPError
+    requested = []
+
+    def urlretrieve(url, path):
+        requested.append(url)
+        raise HTTPError(url, 404, "Not Found", None, None)
+
+    monkeypatch.setattr(raddo.raddo, "urlretrieve", urlretrieve)
+    with tempfile.TemporaryDirectory() as tdir:
+        rd = Raddo()
+        rd.rad_dir = tdir
+        rd.quiet = True
+        # monthly archive already moved to its year directory
+        os.makedirs(os.path.join(tdir, "2005"))
+        open(os.path.join(tdir, "2005", "RW-200501.tar"), 'wb').close()
+        got = rd.download_file("RW-20050102.tar.gz", RAD_DIR_DWD,
+                               RAD_DIR_DWD_HIST, 0)
+        assert got == ["RW-200501.tar"] and len(requested) == 1
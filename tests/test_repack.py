@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+import io
+import os
+import tarfile
+import tempfile
+
+import numpy as np
+import pytest
+
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+from raddo import repack
+from raddo.dataset import _read_block, find_sources
+
+__author__ = "Thomas Ramsauer"
+__copyright__ = "Thomas Ramsauer"
+__license__ = "gpl3"
+
+
+def _asc(value):
+    return (b"ncols 3\nnrows 2\nxllcorner -10\nyllcorner 20\ncellsize 5\n"
+            b"NODATA_value -1\n" + (b"%d %d -1\n" % (value, value)) * 2)
+
+
+def _add(tar, name, data):
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    tar.addfile(info, io.BytesIO(data))
+
+
+def _day(day, hours):
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w:gz") as tar:
+        for h in hours:
+            _add(tar, f"RW-{day}-{h:02d}50.asc", _asc(10 * (h + 1)))
+    return buf.getvalue()
+
+
+def test_repack_monthly_archive():
+    with tempfile.TemporaryDirectory() as tdir:
+        archive = os.path.join(tdir, "RW-202001.tar")
+        with tarfile.open(archive, "w") as tar:
+            _add(tar, "RW-20200101.tar.gz", _day("20200101", [2, 0, 1]))
+            _add(tar, "RW-20200102.tar.gz", _day("20200102", [0]))
+        days = repack.repack_archive(archive, tdir)
+        assert [os.path.basename(d) for d in days] == \
+            ["RW-20200101.rwp", "RW-20200102.rwp"]
+
+        header, names, grids = repack.read_day(days[0])
+        assert names == [f"RW-20200101-{h}50.asc" for h in ("00", "01", "02")]
+        assert grids.dtype == np.int16 and grids.shape == (3, 2, 3)
+        assert grids[2].tolist() == [[30, 30, -1]] * 2
+        name, header, a = list(repack.iter_grids(days[0], rows=[1]))[0]
+        assert np.allclose(a, [[1., 1., -9999]])
+
+        catalog = repack.catalog(days)
+        assert len(catalog) == 4 and list(catalog.paths[-2:]) == days
+
+        # repacked days are preferred to the archive
+        catalog, daily, monthly = find_sources(tdir)
+        assert daily["20200101"] == days[0]
+        out = _read_block(np.array(["2020-01-01T01"], dtype="datetime64[h]"),
+                          [days[0]], (2, 3))
+        assert np.allclose(out[0, :, :2], 2.) and np.isnan(out[0, :, 2]).all()
+
+        # corrupted data is detected by the checksum
+        crc = str(repack.read_meta(days[1])["crc32"]).encode()
+        with open(days[1], 'rb') as fp:
+            data = fp.read()
+        with open(days[1], 'wb') as fp:
+            fp.write(data.replace(crc, crc[:-1] + (b"1" if crc[-1:] != b"1"
+                                                   else b"2"), 1))
+        with pytest.raises(ValueError):
+            repack.read_day(days[1])
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+
+import io
+import json
+import os
+import tarfile
+import tempfile
+import threading
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+import numpy as np
+import pytest
+
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+from raddo.cube import CubeStore
+from raddo.service import LRU, QueryEngine, QueryServer
+
+__author__ = "Thomas Ramsauer"
+__copyright__ = "Thomas Ramsauer"
+__license__ = "gpl3"
+
+
+def _asc(value):
+    return (b"ncols 3\nnrows 2\nxllcorner 0\nyllcorner 0\ncellsize 10\n"
+            b"NODATA_value -1\n" + (b"%d %d -1\n" % (value, 2 * value)) * 2)
+
+
+def _archive(tdir):
+    with tarfile.open(os.path.join(tdir, "RW-20200101.tar.gz"),
+                      "w:gz") as tar:
+        for hour, value in [(0, 10), (1, 20), (2, 30)]:
+            data = _asc(value)
+            info = tarfile.TarInfo(f"RW-20200101-{hour:02d}50.asc")
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+
+
+def test_lru():
+    lru = LRU(2)
+    lru.put("a", 1)
+    lru.put("b", 2)
+    assert lru.get("a") == 1
+    lru.put("c", 3)
+    assert lru.get("b") is None
+    assert lru.stats()["hits"] == 1 and lru.stats()["hit_rate"] == .5
+
+
+def test_series_cached():
+    with tempfile.TemporaryDirectory() as tdir:
+        _archive(tdir)
+        engine = QueryEngine(tdir)
+        times, values = engine.series("point", [5, 15], crs="grid",
+                                      start="2020-01-01T00",
+                                      end="2020-01-01T03")
+        assert [str(t) for t in times][-1] == "2020-01-01T03"
+        assert np.allclose(values[:3], [1, 2, 3]) and np.isnan(values[3])
+        assert engine.stats()["grids"]["hits"] == 0
+
+        # all cells of the bbox; invalid cells are left out
+        times, values = engine.series("bbox", [0, 0, 30, 20], crs="grid",
+                                      start="2020-01-01T00",
+                                      end="2020-01-01T02", stat="max")
+        assert np.allclose(values, [2, 4, 6])
+        assert engine.stats()["grids"]["hits"] == 3
+        times, values = engine.series("bbox", [0, 0, 30, 20], crs="grid",
+                                      start="2020-01-01T00",
+                                      end="2020-01-01T02")
+        assert np.allclose(values, [1.5, 3, 4.5])
+        assert engine.stats()["lookups"]["hits"] == 1
+
+        # ranges are bounded and read in day-sized chunks
+        engine = QueryEngine(tdir, max_hours=48)
+        times, values = engine.series("point", [5, 15], crs="grid",
+                                      start="2019-12-31T00",
+                                      end="2020-01-01T23")
+        assert len(times) == 48 and np.allclose(values[24:27], [1, 2, 3])
+        with pytest.raises(ValueError):
+            engine.series("point", [5, 15], crs="grid",
+                          start="2019-12-31T00", end="2020-01-02T00")
+
+
+def test_series_from_cube():
+    with tempfile.TemporaryDirectory() as tdir:
+        _archive(tdir)
+        cube = CubeStore.create(os.path.join(tdir, "RADOLAN.cube"),
+                                (0, 10, 0, 20, 0, -10), (2, 3))
+        grids = np.array([[[4, 8, np.nan]] * 2, [[5, 10, np.nan]] * 2])
+        cube.append(["2020-01-01T03", "2020-01-01T04"], grids)
+        engine = QueryEngine(tdir)
+        times, values = engine.series("point", [15, 5], crs="grid",
+                                      start="2020-01-01T00",
+                                      end="2020-01-01T04")
+        assert np.allclose(values, [2, 4, 6, 8, 10])
+        assert len(engine.cubes) == 1
+
+        # a cube store alone is a source, too
+        engine = QueryEngine(cube.path)
+        times, values = engine.series("bbox", [0, 0, 30, 20], crs="grid",
+                                      start="2020-01-01T03",
+                                      end="2020-01-01T04", stat="max")
+        assert np.allclose(values, [8, 10])
+        assert str(engine.last) == "2020-01-01T04"
+
+
+def test_server():
+    pytest.importorskip("scipy")
+    pytest.importorskip("shapely")
+    with tempfile.TemporaryDirectory() as tdir:
+        _archive(tdir)
+        server = QueryServer(QueryEngine(tdir), port=0)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        try:
+            # left half of the two left cells
+            with urlopen(url + "/series?polygon=0,0,15,0,15,20,0,20"
+                         "&crs=grid&start=2020-01-01T01"
+                         "&end=2020-01-01T01&stat=sum") as r:
+                res = json.load(r)
+            assert res["times"] == ["2020-01-01T01"]
+            assert res["values"] == [2 * 2 + 2 * 4 * .5]
+            with urlopen(url + "/stats") as r:
+                assert json.load(r)["queries"] == 1
+            with pytest.raises(HTTPError):
+                urlopen(url + "/series?start=2020-01-01")
+
+            # sources removed since the last search: an error, no hang
+            os.remove(os.path.join(tdir, "RW-20200101.tar.gz"))
+            with pytest.raises(HTTPError) as e:
+                urlopen(url + "/series?point=5,15&crs=grid"
+                        "&start=2020-01-01T00&end=2020-01-01T00")
+            assert e.value.code == 404
+        finally:
+            server.shutdown()
+            server.server_close()
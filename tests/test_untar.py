@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+import io
+import os
+import shutil
+import tarfile
+import tempfile
+
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+from raddo import sort_tars
+from raddo import untar
+
+__author__ = "Thomas Ramsauer"
+__copyright__ = "Thomas Ramsauer"
+__license__ = "gpl3"
+
+
+def _add(tar, name, data):
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    tar.addfile(info, io.BytesIO(data))
+
+
+def test_sort_and_untar_keep_working_directory():
+    with tempfile.TemporaryDirectory() as cwd, \
+            tempfile.TemporaryDirectory() as tdir:
+        # the working directory left by other tests may not exist any more
+        os.chdir(cwd)
+        daily = os.path.join(tdir, "RW-20200101.tar.gz")
+        with tarfile.open(daily, "w:gz") as tar:
+            _add(tar, "RW-20200101-0050.asc", b"ncols 1\n")
+        monthly = os.path.join(tdir, "RW-201912.tar")
+        inner = io.BytesIO()
+        with tarfile.open(fileobj=inner, mode="w:gz") as tar:
+            _add(tar, "RW-20191231-2350.asc", b"ncols 1\n")
+        with tarfile.open(monthly, "w") as tar:
+            _add(tar, "RW-20191231.tar.gz", inner.getvalue())
+
+        paths = sort_tars.sort_tars(files=[daily, monthly])
+        assert paths == [
+            os.path.join(tdir, "2020", "RW-202001", "RW-20200101.tar.gz"),
+            os.path.join(tdir, "2019", "RW-201912.tar")]
+        assert all(os.path.isfile(p) for p in paths)
+        # archives already sorted are only listed
+        assert sort_tars.sort_tars(files=[daily, monthly]) == paths
+
+        dirs = untar.untar(files=paths)
+        assert os.path.isfile(os.path.join(
+            tdir, "2020", "RW-202001", "RW-20200101", "RW-20200101-0050.asc"))
+        assert os.path.isfile(os.path.join(
+            tdir, "2019", "RW-201912", "RW-20191231", "RW-20191231-2350.asc"))
+        assert len(dirs) == 3
+        # nested daily archives are not written to disk
+        assert not os.path.exists(os.path.join(
+            tdir, "2019", "RW-201912", "RW-20191231.tar.gz"))
+
+        # removed days of monthly archives are extracted again
+        day_dir = os.path.join(tdir, "2019", "RW-201912", "RW-20191231")
+        shutil.rmtree(day_dir)
+        assert day_dir in untar.untar(files=paths[1:], quiet=True)
+        assert os.listdir(day_dir) == ["RW-20191231-2350.asc"]
+        assert os.getcwd() == cwd
+        os.chdir(os.path.dirname(os.path.abspath(__file__)))
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+
+import csv
+import datetime
+import io
+import os
+import tarfile
+import tempfile
+from urllib.error import URLError
+
+import netCDF4
+import numpy as np
+import pytest
+from dateutil.parser import parse
+
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+from raddo.catalog import to_datetime
+from raddo.watch import Watcher
+
+__author__ = "Thomas Ramsauer"
+__copyright__ = "Thomas Ramsauer"
+__license__ = "gpl3"
+
+
+class _Raddo(object):
+    START_DATE = "2020-01-01"
+
+
+def test_resume_after_last_hour():
+    with tempfile.TemporaryDirectory() as tdir:
+        with netCDF4.Dataset(os.path.join(tdir, "RADOLAN.nc"), "w") as nco:
+            nco.createDimension("time", None)
+            timeo = nco.createVariable("time", "f4", ("time",))
+            # 2020-01-02 23:00
+            timeo[:] = [(datetime.datetime(2020, 1, 2, 23) -
+                         datetime.datetime(2000, 1, 1)).total_seconds() / 3600]
+        watcher = Watcher(_Raddo(), tdir, netcdf="RADOLAN.nc")
+        assert watcher._resume_day() == datetime.datetime(2020, 1, 3)
+        assert Watcher(_Raddo(), tdir)._resume_day() is None
+
+
+def test_nothing_new():
+    with tempfile.TemporaryDirectory() as tdir:
+        watcher = Watcher(_Raddo(), tdir, interval=0)
+        watcher.next_day = datetime.datetime.today()
+        assert watcher.cycle() == 0
+
+
+def test_failed_cycle_keeps_polling(capsys):
+    with tempfile.TemporaryDirectory() as tdir:
+        watcher = Watcher(_Raddo(), tdir, interval=0)
+        results = [URLError("temporary failure"), 24]
+
+        def cycle():
+            res = results.pop(0)
+            if isinstance(res, Exception):
+                raise res
+            return res
+
+        watcher.cycle = cycle
+        watcher.run(cycles=2)
+        assert "Watch cycle 1 failed: URLError" in capsys.readouterr().err
+        assert results == []
+
+
+def _asc(value):
+    # 2 x 3 cells on the RADOLAN grid
+    return (b"ncols 3\nnrows 2\nxllcorner -523462\nyllcorner -4658645\n"
+            b"cellsize 1000\nNODATA_value -1\n" +
+            (b"%d %d -1\n" % (value, value)) * 2)
+
+
+def _publish(rd, rad_dir, days):
+    "stand-in for `Raddo.radolan_down` fetching the daily archives `days`."
+    def radolan_down(rad_dir=None, start_date=None, end_date=None, **kwargs):
+        start = parse(start_date)
+        todo = [d for d in days if d >= start]
+        if len(todo) == 0:
+            return []
+        rd.start_datetime, rd.end_datetime = start, todo[-1]
+        rd.timestamps64 = np.arange(
+            np.datetime64(start, 'h'),
+            np.datetime64(todo[-1] + datetime.timedelta(days=1), 'h'),
+            np.timedelta64(1, 'h'))
+        rd.timestamps = to_datetime(rd.timestamps64)
+        names = []
+        for day in todo:
+            name = day.strftime("RW-%Y%m%d.tar.gz")
+            with tarfile.open(os.path.join(rad_dir, name), "w:gz") as tar:
+                for h in range(24):
+                    data = _asc(h + 1)
+                    info = tarfile.TarInfo(
+                        day.strftime(f"RW-%Y%m%d-{h:02d}50.asc"))
+                    info.size = len(data)
+                    tar.addfile(info, io.BytesIO(data))
+            names.append(name)
+        return names
+    rd.radolan_down = radolan_down
+
+
+def test_cycle_appends_to_products():
+    pytest.importorskip("osgeo")
+    pyproj = pytest.importorskip("pyproj")
+    from raddo.grid import DWD_PROJ
+    from raddo.raddo import Raddo
+    lon, lat = pyproj.Transformer.from_crs(
+        DWD_PROJ, "EPSG:4326", always_xy=True).transform(
+            -523462. + 500., -4658645. + 1500.)
+    with tempfile.TemporaryDirectory() as tdir:
+        rd = Raddo()
+        rd.quiet = True
+        watcher = Watcher(rd, tdir, interval=0, start_date="2020-01-01",
+                          netcdf="RADOLAN.nc", point=f"({lon},{lat})")
+        _publish(rd, tdir, [datetime.datetime(2020, 1, 1)])
+        assert watcher.cycle() == 24
+        assert watcher.next_day == datetime.datetime(2020, 1, 2)
+
+        # the next day is appended to the existing outputs
+        _publish(rd, tdir, [datetime.datetime(2020, 1, d) for d in (1, 2)])
+        assert watcher.cycle() == 24
+        with netCDF4.Dataset(os.path.join(tdir, "RADOLAN.nc")) as nco:
+            assert nco["time"].shape[0] == 48
+            assert nco.missing_dates == "[]"
+        with open(os.path.join(tdir, watcher.point_file)) as fp:
+            rows = list(csv.reader(fp))
+        assert len(rows) == 1 + 48 and float(rows[-1][1]) == 2.4
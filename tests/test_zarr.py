@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+import datetime
+import io
+import os
+import tarfile
+
+import numpy as np
+import pytest
+
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+from raddo import api
+from raddo.catalog import to_datetime
+
+__author__ = "Thomas Ramsauer"
+__copyright__ = "Thomas Ramsauer"
+__license__ = "gpl3"
+
+
+def _asc(value):
+    # 2 x 3 cells on the RADOLAN grid
+    return (b"ncols 3\nnrows 2\nxllcorner -523462\nyllcorner -4658645\n"
+            b"cellsize 1000\nNODATA_value -1\n" +
+            (b"%d %d -1\n" % (value, value)) * 2)
+
+
+def _hours(rd, first, last):
+    "set the hours processed by `rd` to `first` ... `last`."
+    rd.timestamps64 = np.arange(np.datetime64(first, 'h'),
+                                np.datetime64(last, 'h') + 1,
+                                np.timedelta64(1, 'h'))
+    rd.timestamps = to_datetime(rd.timestamps64)
+
+
+def test_create_and_append(tmp_path):
+    pytest.importorskip("osgeo")
+    zarr = pytest.importorskip("zarr")
+    rad_dir = tmp_path / "radolan"
+    rad_dir.mkdir()
+    for day in ("20200101", "20200102"):
+        with tarfile.open(rad_dir / f"RW-{day}.tar.gz", "w:gz") as tar:
+            for h in range(3):
+                data = _asc(10 * (h + 1))
+                info = tarfile.TarInfo(f"RW-{day}-{h:02d}50.asc")
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+    request = api.RaddoRequest(str(rad_dir), start="2020-01-01",
+                               end="2020-01-02")
+    rd, paths, asc_files = api.fetch(request)
+    gtiff_files = sorted(rd.create_geotiffs(asc_files, str(tmp_path)))
+
+    first = datetime.datetime(2020, 1, 1)
+    _hours(rd, first, first + datetime.timedelta(hours=2))
+    outf = rd.create_zarr(gtiff_files[:3], str(tmp_path), "test.zarr")
+    root = zarr.open_group(outf, mode='r')
+    assert root["prc"].shape[0] == 3
+    assert root["time"][0] == \
+        (first - datetime.datetime(2000, 1, 1)).total_seconds() / 3600
+    assert np.allclose(root["prc"][2][np.isfinite(root["prc"][2]) &
+                                      (root["prc"][2] != -9999)], 3.)
+    assert list(root.attrs["missing_dates"]) == []
+
+    # hours after the last one in the store are appended
+    _hours(rd, first, first + datetime.timedelta(hours=26))
+    rd.create_zarr(gtiff_files, str(tmp_path), "test.zarr", append=True)
+    root = zarr.open_group(outf, mode='r')
+    assert root["prc"].shape[0] == 27
+    assert np.allclose(np.diff(root["time"][:]), 1.)
+    missing = list(root.attrs["missing_dates"])
+    assert len(missing) == 21 and missing[0] == "2020-01-01 03:00:00"
+
+    xr = pytest.importorskip("xarray")
+    ds = xr.open_zarr(outf)
+    assert ds["prc"].dims == ("time", "lat", "lon")
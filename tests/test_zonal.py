@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+
+import os
+
+import numpy as np
+from shapely.geometry import Point, box
+
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+from raddo.zonal import ZonalStats, rasterize
+
+__author__ = "Thomas Ramsauer"
+__copyright__ = "Thomas Ramsauer"
+__license__ = "gpl3"
+
+# 3 x 3 grid of 1 x 1 cells, upper left corner at (0, 3)
+GT = (0., 1., 0., 3., 0., -1.)
+
+
+def test_zonal_stats_weights():
+    # left column (full cells) and half of the upper right cell
+    zs = ZonalStats([box(0, 0, 1, 3), box(2, 2.5, 3, 3)], ["a", "b"],
+                    GT, (3, 3))
+    assert zs.weights.sum(axis=1).tolist() == [[3.], [.5]]
+
+    a = np.arange(9, dtype=float).reshape(3, 3)
+    a[2, 0] = -9999
+    mean, total, mx = zs.compute(a)
+    assert mean.tolist() == [1.5, 2.]
+    assert total.tolist() == [3., 1.]
+    assert mx.tolist() == [3., 2.]
+
+
+def test_rasterize():
+    # cell centers inside the polygon; cells touched by the point
+    inside = rasterize([box(0, 1.2, 1.8, 3), Point(2.5, .5)], GT, (3, 3))
+    assert inside.astype(int).tolist() == [[1, 1, 0], [1, 1, 0], [0, 0, 1]]